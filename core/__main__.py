@@ -45,8 +45,10 @@ group.add_argument('-cg', '--callgraph', action='store_true',
         help='display dependencies between the methods/modules')
 parser.add_argument('-m', '--manhole', action='store_true',
         help='manhole for debugging purposes')
-parser.add_argument('-g', '--no-gui', action='store_true',
-        help='does not load the manager gui module')
+parser.add_argument('-g', '--no-gui', '--headless', action='store_true',
+        help='headless mode: no Qt widgets, only hardware and logic modules are loaded. '
+             'Control them through the remote module server or a script '
+             '(see tools/headless_session.py)')
 parser.add_argument('-c', '--config', default='', help='configuration file')
 args = parser.parse_args()
 
@@ -203,6 +203,8 @@ class Manager(QtCore.QObject):
                     elif self.hasGui and key in self.tree['defined']['gui']:
                         self.startModule('gui', key)
                         self.sigModulesChanged.emit()
+                    elif not self.hasGui and key in self.tree['config'].get('gui', {}):
+                        logger.info('Headless mode, not loading the GUI module {}.'.format(key))
                     else:
                         logger.error('Loading startup module {} failed, not '
                                      'defined anywhere.'.format(key))
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Fixed capacity numpy ring buffer for live data.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    """ Ring buffer of the last capacity records in a preallocated numpy array.
+
+    Appending is O(1) (O(k) for k records) and never allocates; when the buffer is full the
+    oldest records are overwritten. The getters return copies in chronological order, so they can
+    be used on other threads while appending continues. The dtype can be a plain or a structured
+    (record) type.
+    """
+
+    def __init__(self, capacity, dtype=float):
+        """
+        @param int capacity: maximum number of records
+        @param numpy.dtype dtype: record type
+        """
+        if capacity < 1:
+            raise ValueError('The capacity of a ring buffer must be at least 1.')
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros(self.capacity, dtype=self.dtype)
+        self._lock = threading.Lock()
+        self._head = 0      # index of the next write
+        self._count = 0     # number of valid records
+        self.total = 0      # number of records appended since the last clear()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def full(self):
+        """ Whether the oldest records are being overwritten. """
+        return self._count == self.capacity
+
+    def clear(self):
+        """ Forget all records. """
+        with self._lock:
+            self._head = 0
+            self._count = 0
+            self.total = 0
+
+    def append(self, record):
+        """ Append one record (a value or a tuple of the fields of a structured dtype). """
+        with self._lock:
+            self._data[self._head] = record
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self.total += 1
+
+    def extend(self, records):
+        """ Append an array of records. """
+        records = np.asarray(records, dtype=self.dtype)
+        n = len(records)
+        if n == 0:
+            return
+        with self._lock:
+            self.total += n
+            if n >= self.capacity:
+                self._data[:] = records[-self.capacity:]
+                self._head = 0
+                self._count = self.capacity
+                return
+            first = min(n, self.capacity - self._head)
+            self._data[self._head:self._head + first] = records[:first]
+            self._data[:n - first] = records[first:]
+            self._head = (self._head + n) % self.capacity
+            self._count = min(self._count + n, self.capacity)
+
+    def _segments(self):
+        """ The valid records as (older, newer) views in chronological order. """
+        if self._count < self.capacity:
+            return self._data[:0], self._data[:self._count]
+        return self._data[self._head:], self._data[:self._head]
+
+    def get(self, last=None):
+        """ Copy of the records in chronological order.
+
+        @param int last: number of the newest records, None for all
+
+        @return numpy.ndarray: records
+        """
+        with self._lock:
+            older, newer = self._segments()
+            if last is not None:
+                last = min(last, self._count)
+                if last <= len(newer):
+                    return newer[len(newer) - last:].copy()
+                older = older[len(older) + len(newer) - last:]
+            return np.concatenate((older, newer))
+
+    def get_range(self, start, stop, field=None):
+        """ Copy of the records with start <= key < stop, for records appended in increasing
+        order of the key (e.g. the time). Found by bisection, so it does not scan the buffer.
+
+        @param float start: lower limit of the key, None for no limit
+        @param float stop: upper limit of the key (exclusive), None for no limit
+        @param str field: field of a structured dtype that is the key, None for the values
+
+        @return numpy.ndarray: records
+        """
+        with self._lock:
+            parts = []
+            for segment in self._segments():
+                key = segment if field is None else segment[field]
+                first = 0 if start is None else np.searchsorted(key, start, side='left')
+                last = len(key) if stop is None else np.searchsorted(key, stop, side='left')
+                parts.append(segment[first:last])
+            return np.concatenate(parts)
+
+    def oldest(self):
+        """ The oldest record (a copy), None if the buffer is empty. """
+        with self._lock:
+            if self._count == 0:
+                return None
+            older, newer = self._segments()
+            return (older if len(older) else newer)[0].copy()
+
+    def latest(self):
+        """ The newest record (a copy), None if the buffer is empty. """
+        with self._lock:
+            if self._count == 0:
+                return None
+            return self._data[self._head - 1].copy()
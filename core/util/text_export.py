@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Fast, vectorized writing of numeric arrays as text, byte-identical to numpy.savetxt.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import functools
+import itertools
+import re
+from fractions import Fraction
+
+import numpy as np
+
+# Scientific format specifiers that are formatted by format_scientific
+_SCIENTIFIC_FORMAT = re.compile(r'^%(?:\.(\d+))?e$')
+# Largest precision, the scaled mantissa has to fit into an int64
+_MAX_PRECISION = 17
+# Magnitudes outside of this range are formatted by Python (the power of ten of the scaling would
+# lose precision or overflow)
+_MIN_MAGNITUDE = 1e-280
+_MAX_MAGNITUDE = 1e280
+# Scaled mantissas closer to a rounding tie than this are formatted by Python
+_TIE_MARGIN = 1e-7
+
+
+@functools.lru_cache(maxsize=None)
+def _powers_of_ten(precision):
+    """ 10**k as double-double (hi + lo, exact to about 106 bits) for the exponents k needed to
+    scale the magnitudes between _MIN_MAGNITUDE and _MAX_MAGNITUDE to precision + 1 digits.
+
+    @return (int, array, array): smallest exponent k, hi and lo parts for k = k_min, k_min + 1, ...
+    """
+    k_min = precision - 281
+    k_max = precision + 281
+    hi = np.empty(k_max - k_min + 1)
+    lo = np.empty(k_max - k_min + 1)
+    for i, k in enumerate(range(k_min, k_max + 1)):
+        exact = Fraction(10) ** k
+        hi[i] = float(exact)
+        lo[i] = float(exact - Fraction(hi[i]))
+    return k_min, hi, lo
+
+
+def _split(a):
+    """ Dekker split of a into two halves of 26 bits, a = high + low exactly. """
+    c = 134217729. * a
+    high = c - (c - a)
+    return high, a - high
+
+
+def _scaled_mantissa(x, k, precision):
+    """ x * 10**k rounded to an integer, exactly as the decimal conversion of Python rounds.
+
+    @return (array, array, array): the rounded integers (int64), the integer parts (int64, values
+                                   within 1e-7 below an integer count as that integer) and whether
+                                   the rounding is uncertain (too close to a tie), these have to
+                                   be formatted by Python
+    """
+    k_min, hi_table, lo_table = _powers_of_ten(precision)
+    hi = hi_table[k - k_min]
+    lo = lo_table[k - k_min]
+    # error free product x * hi = p + err (Dekker), plus x * lo
+    p = x * hi
+    x_hi, x_lo = _split(x)
+    h_hi, h_lo = _split(hi)
+    err = ((x_hi * h_hi - p) + x_hi * h_lo + x_lo * h_hi) + x_lo * h_lo
+    err += x * lo
+    # renormalise, y = s + t exactly
+    s = p + err
+    t = err - (s - p)
+    whole = np.floor(s)
+    fraction = (s - whole) + t
+    rounded = np.floor(fraction + 0.5)
+    uncertain = np.abs(fraction - np.floor(fraction) - 0.5) < _TIE_MARGIN
+    near_integer = np.abs(fraction - rounded) < _TIE_MARGIN
+    integer_part = np.where(near_integer, rounded, np.floor(fraction))
+    whole = whole.astype(np.int64)
+    return whole + rounded.astype(np.int64), whole + integer_part.astype(np.int64), uncertain
+
+
+@functools.lru_cache(maxsize=None)
+def _digit_table():
+    """ ASCII digits of 0000 to 9999, the four bytes of each packed into a uint32. """
+    numbers = np.arange(10000)
+    table = np.stack([numbers // 1000, numbers // 100 % 10, numbers // 10 % 10, numbers % 10],
+                     axis=1).astype(np.uint8) + ord('0')
+    return np.ascontiguousarray(table).view(np.uint32).ravel()
+
+
+def _digits(numbers, count):
+    """ The last count decimal digits of non-negative int64 numbers as ASCII, (n, count) uint8. """
+    table = _digit_table()
+    groups = -(-count // 4)
+    packed = np.empty((len(numbers), groups), dtype=np.uint32)
+    for i in range(groups - 1, -1, -1):
+        numbers, group = np.divmod(numbers, 10000)
+        packed[:, i] = table.take(group)
+    return packed.view(np.uint8)[:, 4 * groups - count:]
+
+
+def scientific_width(precision):
+    """ Maximum number of characters of a float formatted with '%.<precision>e'. """
+    return 1 + 1 + (1 + precision if precision else 0) + 2 + 3
+
+
+def format_scientific(values, precision, out=None):
+    """ Format floats like '%.<precision>e' % value, vectorized.
+
+    The decimal mantissa is computed exactly with double-double arithmetic. The rare values that
+    can not be decided that way (within 1e-7 of a rounding tie, magnitudes beyond 1e+-280, nan
+    and inf) are formatted by Python.
+
+    @param array values: float values (1D)
+    @param int precision: number of digits after the decimal point, at most 17
+    @param numpy.ndarray out: optional, zeroed uint8 array (len(values), scientific_width) to
+                              write the characters into, e.g. a view of a line buffer
+
+    @return numpy.ndarray: uint8 array (len(values), scientific_width) with the ASCII characters
+                           of the formatted values, left-aligned and padded with zero bytes
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    magnitude = np.abs(x)
+    fast = (magnitude >= _MIN_MAGNITUDE) & (magnitude <= _MAX_MAGNITUDE)
+
+    # Mantissa and exponent, zero (also for the values that are not fast)
+    mantissa = np.zeros(n, dtype=np.int64)
+    exponent = np.zeros(n, dtype=np.int64)
+    valid = fast | (magnitude == 0)
+    all_fast = fast.all()
+    index = slice(None) if all_fast else np.flatnonzero(fast)
+    exponent[index] = np.floor(np.log10(magnitude[index])).astype(np.int64)
+    lower = 10 ** precision
+    upper = 10 ** (precision + 1)
+    # The exponent from log10 can be one off near powers of ten, correct it and compute the
+    # mantissa again
+    for _ in range(3):
+        m, integer_part, uncertain = _scaled_mantissa(magnitude[index],
+                                                      precision - exponent[index], precision)
+        # rounding up to the next power of ten carries into the exponent
+        carry = (m == upper) & (integer_part < upper)
+        m[carry] = lower
+        exponent[index] += carry
+        mantissa[index] = m
+        high = integer_part >= upper
+        low = integer_part < lower
+        exponent[index] += high
+        exponent[index] -= low
+        valid[index] = ~(uncertain | high | low)
+        retry = (high | low) & ~uncertain
+        if not retry.any():
+            break
+        index = (np.arange(n) if isinstance(index, slice) else index)[retry]
+    else:
+        valid[index] = False
+
+    # Characters: [-]d[.ddd]e+XX or e+XXX
+    if out is None:
+        out = np.zeros((n, scientific_width(precision)), dtype=np.uint8)
+    np.copyto(out[:, 0], ord('-'), where=np.signbit(x))
+    digits = _digits(mantissa, precision + 1)
+    out[:, 1] = digits[:, 0]
+    column = 2
+    if precision:
+        out[:, 2] = ord('.')
+        out[:, 3:3 + precision] = digits[:, 1:]
+        column = 3 + precision
+    out[:, column] = ord('e')
+    out[:, column + 1] = np.where(exponent < 0, ord('-'), ord('+'))
+    exponent = np.abs(exponent)
+    exponent_digits = _digits(exponent, 3)
+    np.copyto(out[:, column + 2], exponent_digits[:, 0], where=exponent >= 100)
+    out[:, column + 3:column + 5] = exponent_digits[:, 1:]
+
+    # Everything else by Python
+    specifier = '%.{0:d}e'.format(precision)
+    for row in np.flatnonzero(~valid):
+        text = (specifier % x[row]).encode('ascii')
+        out[row] = 0
+        out[row, :len(text)] = np.frombuffer(text, dtype=np.uint8)
+    return out
+
+
+def _row_format(fmt, ncol, delimiter):
+    """ Format of a row as numpy.savetxt builds it, None if numpy.savetxt would raise. """
+    if isinstance(fmt, (list, tuple)):
+        if len(fmt) != ncol:
+            return None
+        return delimiter.join(fmt)
+    if isinstance(fmt, str):
+        count = fmt.count('%')
+        if count == 1:
+            return delimiter.join([fmt] * ncol)
+        if count == ncol:
+            return fmt
+    return None
+
+
+def _scientific_precision(fmt, ncol):
+    """ Precision if every column has the same plain '%.<precision>e' specifier, else None. """
+    specifiers = fmt if isinstance(fmt, (list, tuple)) else [fmt] * ncol
+    if not specifiers or any(spec != specifiers[0] for spec in specifiers):
+        return None
+    match = _SCIENTIFIC_FORMAT.match(specifiers[0])
+    if match is None:
+        return None
+    precision = 6 if match.group(1) is None else int(match.group(1))
+    return precision if precision <= _MAX_PRECISION else None
+
+
+def _encode(text):
+    return text.encode('latin1')
+
+
+def savetxt(file, X, fmt='%.18e', delimiter=' ', newline='\n', header='', footer='',
+            comments='# ', chunk_rows=65536):
+    """
+    numpy.savetxt to a binary file, formatting chunk_rows rows at once and writing each chunk
+    with a single write. The output is byte-identical to numpy.savetxt.
+
+    Float arrays with the same '%.<precision>e' specifier for every column are formatted
+    vectorized (format_scientific) into one character array per chunk, from which the padding is
+    removed. Everything else (other specifiers, integers, structured arrays) is formatted with
+    one string formatting operation per chunk. Complex data and specifiers numpy.savetxt rejects
+    are passed to numpy.savetxt.
+
+    @param file: file object opened in binary mode
+    @param array X: 1D or 2D data, or a 1D structured array
+    @param str or list fmt: format specifier, or one per column, as for numpy.savetxt
+    @param str delimiter: column delimiter
+    @param str newline: line separator
+    @param str header: header, written with comments before every line
+    @param str footer: footer, written with comments before every line
+    @param str comments: comment characters
+    @param int chunk_rows: number of rows formatted at once
+    """
+    X = np.asarray(X)
+    if X.ndim == 1 and X.dtype.names is None:
+        X = np.atleast_2d(X).T
+    if X.ndim == 1:
+        ncol = len(X.dtype.names)
+    elif X.ndim == 2:
+        ncol = X.shape[1]
+    else:
+        ncol = None
+    row_format = None if ncol is None else _row_format(fmt, ncol, delimiter)
+    if row_format is None or np.iscomplexobj(X) or '\0' in delimiter + newline:
+        np.savetxt(file, X, fmt=fmt, delimiter=delimiter, newline=newline, header=header,
+                   footer=footer, comments=comments)
+        return
+
+    if header:
+        file.write(_encode(comments + header.replace('\n', '\n' + comments) + newline))
+
+    precision = None
+    if X.dtype.names is None and X.dtype.kind == 'f':
+        precision = _scientific_precision(fmt, ncol)
+    if precision is not None:
+        separators = [delimiter] * (ncol - 1) + [newline]
+        separator_width = max(len(_encode(sep)) for sep in separators)
+    for start in range(0, len(X), chunk_rows):
+        chunk = X[start:start + chunk_rows]
+        if precision is None:
+            if chunk.dtype.names is None:
+                values = chunk.ravel().tolist()
+            else:
+                values = list(itertools.chain.from_iterable(chunk.tolist()))
+            file.write(_encode((row_format + newline) * len(chunk) % tuple(values)))
+            continue
+        width = scientific_width(precision)
+        rows = np.zeros((len(chunk), ncol, width + separator_width), dtype=np.uint8)
+        format_scientific(chunk.ravel(), precision,
+                          out=rows[:, :, :width].reshape(len(chunk) * ncol, width))
+        for i, separator in enumerate(separators):
+            encoded = np.frombuffer(_encode(separator), dtype=np.uint8)
+            rows[:, i, width:width + len(encoded)] = encoded
+        rows = rows.ravel()
+        file.write(rows[rows != 0].tobytes())
+
+    if footer:
+        file.write(_encode(comments + footer.replace('\n', '\n' + comments) + newline))
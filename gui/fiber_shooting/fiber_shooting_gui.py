@@ -2,7 +2,9 @@
 
 import os
 import time
-from core.module import Connector
+import numpy as np
+from core.module import Connector, ConfigOption
+from core.util.ring_buffer import RingBuffer
 from gui.guibase import GUIBase
 from gui.colordefs import QudiPalettePale as Palette
 from qtpy import QtWidgets
@@ -41,6 +43,11 @@ class FiberShootingGui(GUIBase):
     # declare connectors
     fiber_shooting_logic = Connector(interface='EmptyInterface')
 
+    # Power plot: redraw rate (Hz), independent of the control loop rate, and number of samples
+    # kept for the plot (about 10 min at 100 Hz)
+    _plot_refresh_rate = ConfigOption('plot_refresh_rate', 20.)
+    _plot_buffer_size = ConfigOption('plot_buffer_size', 65536)
+
     def show(self):
         """Make main window visible and put it above all other windows. """
         # Show the Main Confocal GUI:
@@ -69,8 +76,9 @@ class FiberShootingGui(GUIBase):
         self.laser_status = False  # Laser OFF
         self.setpoint = 0
 
-        self.power_data = []
-        self.time_data = []
+        self._plot_buffer = RingBuffer(self._plot_buffer_size,
+                                       self._fiber_shooting_logic.live_data_dtype)
+        self._plot_drawn = 0    # number of samples appended at the last redraw
         self._pw = None
         self.curve = []
 
@@ -107,6 +115,7 @@ class FiberShootingGui(GUIBase):
         self._mw.duty_cycle_doubleSpinBox.setValue(self._fiber_shooting_logic.get_duty_cycle())
 
         self._mw.acquisition_time_spinBox.setValue(10)
+        self.acquisition_time = self._mw.acquisition_time_spinBox.value()
 
         # graph
 
@@ -116,10 +125,22 @@ class FiberShootingGui(GUIBase):
         self._pw.showGrid(x=True, y=True)
 
         self.curve.append(pg.PlotDataItem(pen=pg.mkPen(Palette.c1), symbol=None))
+        # Only draw the visible samples, at most about one (min, max) pair per pixel
+        self.curve[-1].setClipToView(True)
+        self.curve[-1].setDownsampling(auto=True, method='peak')
         self._pw.addItem(self.curve[-1])
         self.curve.append(pg.InfiniteLine(pos=0, angle=0, pen=pg.mkPen(Palette.c2)))
         self._pw.addItem(self.curve[-1])
 
+        # Session export
+        file_menu = self._mw.menuBar().addMenu('File')
+        self._mw.export_session_Action = file_menu.addAction('Export session')
+        self._mw.export_session_Action.setToolTip('Save the power trace, duty cycle, setpoint and '
+                                                  'PID terms of the session')
+
+        # Control loop dashboard
+        self.init_dashboard()
+
         # Camera's connectors
         self._mw.start_video_pushButton.clicked.connect(self.start_video)
         self._mw.stop_video_pushButton.clicked.connect(self.stop_video)
@@ -149,10 +170,138 @@ class FiberShootingGui(GUIBase):
         # Graph's connectors
         self._mw.acquisition_time_spinBox.editingFinished.connect(self.set_acquisition_time)
         # Handling signals from the logic
-        self._fiber_shooting_logic.sigPowerUpdated.connect(self.update_data)
+        self._fiber_shooting_logic.sigLiveData.connect(self.update_data)
+        self._mw.export_session_Action.triggered.connect(self.export_session)
+        self._fiber_shooting_logic.sigExportProgress.connect(self.export_progress)
+        self._fiber_shooting_logic.sigExportFinished.connect(self.export_finished)
+
+        # The plot is redrawn by a timer at a fixed rate, not per sample
+        self._plot_timer = QtCore.QTimer()
+        self._plot_timer.setInterval(int(1000 / self._plot_refresh_rate))
+        self._plot_timer.timeout.connect(self.refresh_plot)
+        self._plot_timer.start()
+
+    def init_dashboard(self):
+        """ Create the dock with the linked plots of the power, the duty cycle, the error and the
+        PID terms. They are drawn by the timer of the power plot from the live history of the
+        logic (get_live_history), which returns the raw samples or, for longer time ranges, the
+        min/mean/max bins of 1 s, 10 s or 1 min (the mean is drawn). The dashboard shows the
+        newest part of the history; its length follows the zoom of the plots, so it can be zoomed
+        out to hours and in to single samples.
+        """
+        self._dashboard_frozen = False
+        self._dashboard_stale = True    # redraw even if there is no new sample
+        self._dashboard_span = self.acquisition_time    # length (s) of the shown time range
+        self._dashboard_range = None    # x range (s) set by the GUI, not by the user
+        # A frozen dashboard requests the data of a new zoom once the zooming stopped
+        self._dashboard_fetch_timer = QtCore.QTimer()
+        self._dashboard_fetch_timer.setSingleShot(True)
+        self._dashboard_fetch_timer.setInterval(100)
+        self._dashboard_fetch_timer.timeout.connect(self._fetch_dashboard_range)
+
+        dock = QtWidgets.QDockWidget('Control loop dashboard', self._mw)
+        dock.setObjectName('dashboard_DockWidget')
+        widget = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(widget)
+        self._mw.dashboard_freeze_pushButton = QtWidgets.QPushButton('Freeze')
+        self._mw.dashboard_freeze_pushButton.setCheckable(True)
+        self._mw.dashboard_freeze_pushButton.setToolTip(
+            'Stop redrawing the dashboard to inspect a transient. The data keeps being recorded.')
+        layout.addWidget(self._mw.dashboard_freeze_pushButton)
+        self._mw.dashboard_GraphicsLayoutWidget = pg.GraphicsLayoutWidget()
+        layout.addWidget(self._mw.dashboard_GraphicsLayoutWidget)
+        dock.setWidget(widget)
+        self._mw.addDockWidget(QtCore.Qt.RightDockWidgetArea, dock)
+        dock.hide()
+        self._mw.dashboard_DockWidget = dock
+        view_menu = self._mw.menuBar().addMenu('View')
+        view_menu.addAction(dock.toggleViewAction())
+
+        # (title, units, [(field, label, color)]) per plot
+        plots = [('Power', 'W', [('power', 'power', Palette.c1),
+                                 ('effective_setpoint', 'setpoint', Palette.c2)]),
+                 ('Duty cycle', '', [('duty_cycle', 'duty cycle', Palette.c1)]),
+                 ('Error', 'W', [('error', 'error', Palette.c1)]),
+                 ('PID terms', '', [('p', 'P', Palette.c1), ('i', 'I', Palette.c2),
+                                    ('d', 'D', Palette.c3)])]
+        self._dashboard_curves = dict()
+        first_plot = None
+        for row, (title, units, traces) in enumerate(plots):
+            plot = self._mw.dashboard_GraphicsLayoutWidget.addPlot(row=row, col=0)
+            plot.setLabel('left', title, units=units)
+            plot.showGrid(x=True, y=True)
+            if len(traces) > 1:
+                plot.addLegend()
+            for field, label, color in traces:
+                curve = plot.plot(pen=pg.mkPen(color), name=label)
+                curve.setClipToView(True)
+                curve.setDownsampling(auto=True, method='peak')
+                self._dashboard_curves[field] = curve
+            if first_plot is None:
+                first_plot = plot
+                plot.enableAutoRange(x=False)
+            else:
+                plot.setXLink(first_plot)
+        plot.setLabel('bottom', 'Time', units='s')
+        self._dashboard_plot = first_plot
+
+        first_plot.sigXRangeChanged.connect(self._dashboard_range_changed)
+        self._mw.dashboard_freeze_pushButton.toggled.connect(self.freeze_dashboard)
+        dock.visibilityChanged.connect(self._dashboard_visibility_changed)
+
+    def freeze_dashboard(self, frozen):
+        """ Freeze (True) or resume (False) the dashboard. While it is frozen the timer does not
+        request any data for it, the plots keep their data and the logic keeps recording. Zooming
+        or panning a frozen dashboard requests the shown time range once, at the resolution of
+        the new zoom.
+        """
+        self._dashboard_frozen = frozen
+        self._mw.dashboard_freeze_pushButton.setText('Resume' if frozen else 'Freeze')
+        if not frozen:
+            self._dashboard_stale = True
+        return
+
+    def _dashboard_visibility_changed(self, visible):
+        """ The hidden dashboard is not redrawn, so it is redrawn when it is shown again. """
+        if visible:
+            self._dashboard_stale = True
+
+    def _dashboard_range_changed(self, view_box, x_range):
+        """ The user zoomed or panned the dashboard: keep the length of the time range for the
+        live dashboard, request the data of the new range for the frozen dashboard. """
+        if self._dashboard_range is not None and np.allclose(
+                x_range, self._dashboard_range, rtol=0, atol=1e-6 * self._dashboard_span):
+            return
+        self._dashboard_span = x_range[1] - x_range[0]
+        if self._dashboard_frozen:
+            self._dashboard_fetch_timer.start()
+        else:
+            self._dashboard_stale = True
+
+    def _fetch_dashboard_range(self):
+        """ Draw the time range shown by the frozen dashboard. """
+        start, stop = self._dashboard_plot.getViewBox().viewRange()[0]
+        self._draw_dashboard(start + self.time_start, stop + self.time_start)
+
+    def _draw_dashboard(self, start, stop=None):
+        """ Draw the live history from start to stop (time.time(), s, None for the newest
+        sample), with at most about two points per pixel. """
+        max_points = max(2 * int(self._dashboard_plot.getViewBox().width()), 1000)
+        history = self._fiber_shooting_logic.get_live_history(start, stop, max_points)
+        if history is None:
+            return
+        times = history['time'] - self.time_start
+        for field, curve in self._dashboard_curves.items():
+            curve.setData(x=times, y=history[field + '_mean'])
 
     def on_deactivate(self):
         """ Reverse steps of activation """
+        self._plot_timer.stop()
+        self._plot_timer.timeout.disconnect()
+        self._dashboard_fetch_timer.stop()
+        self._fiber_shooting_logic.sigLiveData.disconnect(self.update_data)
+        self._fiber_shooting_logic.sigExportProgress.disconnect(self.export_progress)
+        self._fiber_shooting_logic.sigExportFinished.disconnect(self.export_finished)
         self._mw.close()
         return
 
@@ -273,8 +422,8 @@ class FiberShootingGui(GUIBase):
             self.time_start = time.time()
             self._fiber_shooting_logic.set_duty_cycle(self._mw.duty_cycle_doubleSpinBox.value())
             self._fiber_shooting_logic.set_laser_status(True)  # Start reading data from PowerMeter
-            self.power_data = []
-            self.time_data = []
+            self._plot_buffer.clear()
+            self._plot_drawn = 0
             self._fiber_shooting_logic.set_power()
             self.laser_status = True
         else:
@@ -347,16 +496,60 @@ class FiberShootingGui(GUIBase):
 
     # Graph's methods
 
-    def update_data(self):
-        """ Get the data from the logic and update the graph on the gui """
-        self.time_data.append(self._fiber_shooting_logic.time_loop[-1] - self.time_start)
-        self.power_data.append(self._fiber_shooting_logic.power)
-        self._mw.duty_cycle_doubleSpinBox.setValue(self._fiber_shooting_logic.get_duty_cycle())
-        if self.time_data[-1] > int(self._mw.acquisition_time_spinBox.value()):
-            # If the len of the data is over a define value
-            del self.time_data[0]
-            del self.power_data[0]
-        self.curve[0].setData(y=self.power_data, x=self.time_data)
+    def update_data(self, batch):
+        """ Store a batch of new samples from the logic, refresh_plot() draws them.
+
+        @param numpy.ndarray batch: samples, see FiberShootingLogic.sigLiveData
+        """
+        self._plot_buffer.extend(batch)
+        return
+
+    def refresh_plot(self):
+        """ Redraw the last acquisition time of the power plot, the live dashboard and show the
+        duty cycle (timer). Nothing is requested for a frozen or hidden dashboard. """
+        new_data = self._plot_buffer.total != self._plot_drawn
+        draw_dashboard = (self._mw.dashboard_DockWidget.isVisible() and not self._dashboard_frozen
+                          and (new_data or self._dashboard_stale))
+        if not new_data and not draw_dashboard:
+            return
+        self._plot_drawn = self._plot_buffer.total
+        latest = self._plot_buffer.latest()
+        if latest is None:
+            return
+        if new_data:
+            data = self._plot_buffer.get_range(latest['time'] - self.acquisition_time, None,
+                                               'time')
+            self.curve[0].setData(x=data['time'] - self.time_start, y=data['power'])
+        if draw_dashboard:
+            stop = latest['time'] - self.time_start
+            self._dashboard_range = (stop - self._dashboard_span, stop)
+            self._draw_dashboard(latest['time'] - self._dashboard_span)
+            self._dashboard_plot.setXRange(*self._dashboard_range, padding=0)
+            self._dashboard_stale = False
+        duty_cycle = round(self._fiber_shooting_logic.get_duty_cycle(),
+                           self._mw.duty_cycle_doubleSpinBox.decimals())
+        if duty_cycle != self._mw.duty_cycle_doubleSpinBox.value():
+            # Display only, do not send the value back to the logic
+            self._mw.duty_cycle_doubleSpinBox.blockSignals(True)
+            self._mw.duty_cycle_doubleSpinBox.setValue(duty_cycle)
+            self._mw.duty_cycle_doubleSpinBox.blockSignals(False)
+        return
+
+    # Session export
+
+    def export_session(self):
+        """ Save the session history in the background. """
+        self._fiber_shooting_logic.export_session()
+        return
+
+    def export_progress(self, progress):
+        """ Show the progress of the session export in the status bar. """
+        self._mw.statusBar().showMessage('Exporting session... {0:.0f} %'.format(100 * progress))
+        return
+
+    def export_finished(self, path):
+        """ Show the path of the exported session in the status bar. """
+        self._mw.statusBar().showMessage('Session exported to {0}'.format(path))
         return
 
     def set_acquisition_time(self):
@@ -1,36 +1,101 @@
-#define SERIAL_TIMEOUT 10 // serial communication timeout in ms
+// Protocol description: see PROTOCOL.md
+
+#define PROTOCOL_VERSION 1  // highest supported version: 0 = ASCII, 1 = ASCII and binary frames
+#define FRAME_SYNC 0xA5
+#define FRAME_LENGTH 6
+#define FRAME_ACK_FLAG 0x80
 
 char command[2];
+// Command characters of the binary opcodes (index = command id, 0 is unused)
+const char binary_commands[] = {0, 'f', 'd', 's', 'S', 't'};
 
 void parameter_update() {
   if (Serial.available() > 0) {
-    // First 2 bytes are command + option, rest of string is a value
-    Serial.readBytes(command, 2);
-    unsigned long val = Serial.parseInt();
-    while(Serial.available())
-      Serial.read();
-    
-    switch (command[0]) {
-      case 'f':  // set TOP (PWM frequency)
-        setTOP(val);
-        break;
-      
-      case 'd':  // set CM (duty cycle)
-        setCM(val);
-        break;
-        
-      case 's':  // millisecond pulse
-        open_shutter(command[1] - 48, val);
-        break;
-        
-      case 'S':  // microsecond pulse
-        open_shutter_micro(command[1] - 48, val);
-        break;
-        
-      case 't':  // toggle shutter
-        toggle_shutter(command[1] - 48);
-        break;
-    }
+    int first = Serial.peek();
+    if (first == FRAME_SYNC)
+      binary_update();
+    else if (first == 'f' || first == 'd' || first == 's' || first == 'S' || first == 't' || first == 'v')
+      ascii_update();
+    else
+      Serial.read();  // Stray byte (e.g. rest of a broken frame): drop it to resynchronize
+  }
+}
+
+void ascii_update() {
+  // First 2 bytes are command + option, rest of string is a value terminated by ';'.
+  // The host batches several commands into one write, so only this command is consumed.
+  Serial.readBytes(command, 2);
+  unsigned long val = Serial.parseInt();
+  // Optional sequence number (acknowledgement mode): '@' followed by the number
+  long seq = -1;
+  if (Serial.peek() == '@') {
+    Serial.read();
+    seq = Serial.parseInt();
   }
+  char c = 0;
+  while (c != ';' && Serial.readBytes(&c, 1) == 1);
+  execute_command(command[0], command[1], val, seq);
 }
 
+void binary_update() {
+  // sync, opcode (ack flag | command id << 4 | option), sequence number, payload (LE), checksum
+  byte frame[FRAME_LENGTH];
+  if (Serial.readBytes(frame, FRAME_LENGTH) < FRAME_LENGTH)
+    return;
+  byte sum = 0;
+  for (int i = 1; i < FRAME_LENGTH; i++)
+    sum += frame[i];
+  if (sum != 0)
+    return;  // Bad checksum: drop the frame. In acknowledgement mode, the host counts it as lost.
+  byte id = (frame[1] >> 4) & 0x07;
+  if (id == 0 || id >= sizeof(binary_commands))
+    return;
+  char cmd = binary_commands[id];
+  char option = (cmd == 'f' || cmd == 'd') ? '_' : '0' + (frame[1] & 0x0F);
+  unsigned long val = frame[3] | ((unsigned int)frame[4] << 8);
+  long seq = (frame[1] & FRAME_ACK_FLAG) ? frame[2] : -1;
+  execute_command(cmd, option, val, seq);
+}
+
+void execute_command(char cmd, char option, unsigned long val, long seq) {
+  boolean known = true;
+  switch (cmd) {
+    case 'f':  // set TOP (PWM frequency)
+      setTOP(val);
+      break;
+
+    case 'd':  // set CM (duty cycle)
+      setCM(val);
+      break;
+
+    case 's':  // millisecond pulse
+      open_shutter(option - 48, val);
+      break;
+
+    case 'S':  // microsecond pulse
+      open_shutter_micro(option - 48, val);
+      break;
+
+    case 't':  // toggle shutter
+      toggle_shutter(option - 48);
+      break;
+
+    case 'v':  // protocol version query
+      Serial.write('V');
+      Serial.println(PROTOCOL_VERSION);
+      break;
+
+    default:
+      known = false;
+  }
+
+  // Acknowledge after execution and echo the command as it was understood
+  if (seq >= 0) {
+    Serial.write(known ? 'A' : 'N');
+    Serial.print(seq);
+    Serial.write(':');
+    Serial.write(cmd);
+    Serial.write(option);
+    Serial.println(val);
+  }
+}
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains an emulator of the Arduino Uno firmware (arduino_uno.ino and
+arduino_communication.ino) on a Linux pseudo-terminal, so ArduinoHardware can be tested through
+the real pyserial path without the board.
+
+Usage as a standalone program (prints the port to put into the config as 'port'):
+
+    python hardware/arduino_uno/arduino_emulator.py [--delay 0.001] [--drop 0.01]
+
+or from python:
+
+    emulator = ArduinoEmulator(delay=1e-3)
+    port = emulator.start()
+    ...
+    emulator.stop()
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import pty
+import random
+import re
+import select
+import threading
+import time
+import tty
+
+
+class ArduinoEmulator:
+    """ Emulated Arduino firmware behind a pseudo-terminal.
+
+    Implements the protocol of PROTOCOL.md (ASCII commands t, s, S, f_, d_ and v_, binary frames
+    and acknowledgement mode) and keeps the emulated PWM and shutter state with time stamps
+    (time.perf_counter). Serial delays and errors can be injected:
+
+    @param float delay: processing delay per command (s), added before execution
+    @param float jitter: uniformly distributed extra delay per command, between 0 and jitter (s)
+    @param float drop_probability: probability that a command is lost (not executed, no reply)
+    @param float corrupt_probability: probability that one byte of a command is corrupted
+    @param int firmware_version: protocol version to emulate (0: ASCII only, 1: with binary frames)
+    @param int seed: optional, seed for reproducible error injection
+    """
+
+    SERIAL_TIMEOUT = 0.01  # s, Serial.setTimeout() of the firmware
+    FRAME_SYNC = 0xA5
+    FRAME_LENGTH = 6
+    FRAME_ACK_FLAG = 0x80
+    BINARY_COMMANDS = {1: 'f', 2: 'd', 3: 's', 4: 'S', 5: 't'}
+    TOP_MIN = 799
+    TOP_MAX = 3199
+    DUTY_MAX = .6
+    SHUTTERS = 2
+    SHUTTER_TOGGLING = (True, False)
+
+    _ascii_pattern = re.compile(rb'^[^-0-9@]*(-?\d+)?(?:@(\d+))?')
+
+    def __init__(self, delay=0., jitter=0., drop_probability=0., corrupt_probability=0.,
+                 firmware_version=1, seed=None):
+        self.delay = delay
+        self.jitter = jitter
+        self.drop_probability = drop_probability
+        self.corrupt_probability = corrupt_probability
+        self.firmware_version = firmware_version
+        self._random = random.Random(seed)
+        self._master_fd = None
+        self._slave_fd = None
+        self._thread = None
+        self._running = False
+        self.port = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Power-on state of the firmware. """
+        with self.lock:
+            self.TOP = 3199
+            self.CM = 0
+            self.pwm_timestamp = time.perf_counter()
+            self.shutter_level = [False] * self.SHUTTERS
+            self.shutter_on = [False] * self.SHUTTERS
+            self.shutter_close_time = [0.] * self.SHUTTERS
+            self.shutter_timestamp = [0.] * self.SHUTTERS
+            # (time stamp, command, option, value) of every executed command
+            self.history = []
+            self.bytes_received = 0
+            self.commands_executed = 0
+            self.commands_dropped = 0
+            self.commands_corrupted = 0
+
+    # Pseudo-terminal
+
+    def start(self):
+        """ Open the pseudo-terminal pair and start emulating.
+
+        @return str: name of the serial port to connect to (e.g. /dev/pts/3)
+        """
+        self._master_fd, self._slave_fd = pty.openpty()
+        # No echo and no line processing, like a real serial port
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='arduino-emulator', daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        """ Stop emulating and close the pseudo-terminal pair. """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        for fd in (self._master_fd, self._slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self._master_fd = self._slave_fd = None
+
+    def get_duty_cycle(self):
+        """ Duty cycle currently output on the PWM pin. """
+        with self.lock:
+            return (self.CM + 1) / (self.TOP + 1)
+
+    def get_frequency(self):
+        """ PWM frequency (Hz). """
+        with self.lock:
+            return 16e6 / (self.TOP + 1)
+
+    def _run(self):
+        """ Thread target: the firmware main loop. """
+        buffer = bytearray()
+        last_receive = time.perf_counter()
+        while self._running:
+            readable, _, _ = select.select([self._master_fd], [], [], self.SERIAL_TIMEOUT)
+            if readable:
+                try:
+                    data = os.read(self._master_fd, 4096)
+                except OSError:
+                    # All slave file descriptors have been closed
+                    data = b''
+                if data:
+                    buffer.extend(data)
+                    self.bytes_received += len(data)
+                    last_receive = time.perf_counter()
+            timed_out = time.perf_counter() - last_receive > self.SERIAL_TIMEOUT
+            self._parse(buffer, timed_out)
+            self._check_shutters()
+
+    def _reply(self, text):
+        """ Send a line to the host. """
+        os.write(self._master_fd, (text + '\r\n').encode())
+
+    # Parser (arduino_communication.ino)
+
+    def _parse(self, buffer, timed_out):
+        """ Consume all complete commands from the buffer.
+
+        @param bytearray buffer: received bytes, consumed in place
+        @param bool timed_out: no new byte arrived within the serial timeout, so an incomplete
+                               ASCII command is executed with what was received (like parseInt)
+        """
+        while buffer:
+            first = buffer[0]
+            if first == self.FRAME_SYNC and self.firmware_version >= 1:
+                if len(buffer) < self.FRAME_LENGTH:
+                    if timed_out:
+                        del buffer[:]
+                    return
+                frame = self._inject_errors(bytes(buffer[:self.FRAME_LENGTH]))
+                del buffer[:self.FRAME_LENGTH]
+                if frame is not None:
+                    self._parse_frame(frame)
+            elif first in b'fdsStv':
+                end = buffer.find(b';')
+                if end < 0:
+                    if not timed_out:
+                        return
+                    end = len(buffer)
+                command = self._inject_errors(bytes(buffer[:end]))
+                del buffer[:end + 1]
+                if command is not None:
+                    self._parse_ascii(command)
+            else:
+                # Stray byte: dropped to resynchronize
+                del buffer[:1]
+
+    def _parse_ascii(self, command):
+        """ <command><option><value>[@<seq>] """
+        if len(command) < 2:
+            return
+        match = self._ascii_pattern.match(command[2:])
+        value = int(match.group(1)) if match.group(1) else 0
+        seq = int(match.group(2)) if match.group(2) else -1
+        # parseInt returns a long, stored into an unsigned long
+        value &= 0xFFFFFFFF
+        self._execute(chr(command[0]), chr(command[1]), value, seq)
+
+    def _parse_frame(self, frame):
+        """ sync, opcode, sequence number, payload (LE), checksum """
+        if sum(frame[1:]) & 0xFF != 0:
+            return
+        command = self.BINARY_COMMANDS.get((frame[1] >> 4) & 0x07)
+        if command is None:
+            return
+        option = '_' if command in 'fd' else chr(ord('0') + (frame[1] & 0x0F))
+        value = frame[3] | frame[4] << 8
+        seq = frame[2] if frame[1] & self.FRAME_ACK_FLAG else -1
+        self._execute(command, option, value, seq)
+
+    def _inject_errors(self, command):
+        """ Apply the configured delay and errors to a received command.
+
+        @return bytes: the (possibly corrupted) command, or None if it is lost
+        """
+        delay = self.delay + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self._random.random() < self.drop_probability:
+            self.commands_dropped += 1
+            return None
+        if command and self._random.random() < self.corrupt_probability:
+            self.commands_corrupted += 1
+            position = self._random.randrange(len(command))
+            command = bytearray(command)
+            command[position] ^= 1 << self._random.randrange(8)
+            command = bytes(command)
+        return command
+
+    # Firmware (arduino_uno.ino)
+
+    def _execute(self, command, option, value, seq):
+        known = True
+        now = time.perf_counter()
+        with self.lock:
+            if command == 'f':
+                self._set_top(self._to_int(value))
+            elif command == 'd':
+                self._set_cm(self._to_int(value))
+            elif command == 's' and option in '01':
+                self._open_shutter(int(option), value * 1000, now)
+            elif command == 'S' and option in '01':
+                self._open_shutter(int(option), value, now)
+            elif command == 't' and option in '01':
+                self._toggle_shutter(int(option), now)
+            elif command == 'v' and self.firmware_version >= 1:
+                self._reply('V{0:d}'.format(self.firmware_version))
+            else:
+                known = False
+            if known:
+                self.history.append((now, command, option, value))
+                self.commands_executed += 1
+        if seq >= 0 and self.firmware_version >= 1:
+            self._reply('{0}{1:d}:{2}{3}{4:d}'.format('A' if known else 'N', seq, command, option,
+                                                     value))
+
+    @staticmethod
+    def _to_int(value):
+        """ unsigned long to the 16 bit int of the firmware functions """
+        return ((value & 0xFFFF) ^ 0x8000) - 0x8000
+
+    def _set_top(self, top):
+        top = min(max(top, self.TOP_MIN), self.TOP_MAX)
+        duty_cycle = (self.CM + 1) / (self.TOP + 1)
+        cm_new = int((top + 1) * duty_cycle - 1)
+        self.TOP = top
+        self._set_cm(cm_new)
+
+    def _set_cm(self, cm):
+        self.CM = min(max(cm, 0), int(self.DUTY_MAX * self.TOP))
+        self.pwm_timestamp = time.perf_counter()
+
+    def _open_shutter(self, shutter, length, now):
+        if not self.shutter_on[shutter]:
+            self.shutter_on[shutter] = True
+            self.shutter_close_time[shutter] = now + length * 1e-6
+            self._shutter_edge(shutter, now)
+
+    def _toggle_shutter(self, shutter, now):
+        self._shutter_edge(shutter, now)
+
+    def _shutter_edge(self, shutter, now):
+        """ A toggling shutter gets a TTL pulse (the firmware blocks for 10 ms), the other one
+        changes its level. """
+        if self.SHUTTER_TOGGLING[shutter]:
+            time.sleep(.01)
+        self.shutter_level[shutter] = not self.shutter_level[shutter]
+        self.shutter_timestamp[shutter] = now
+
+    def _check_shutters(self):
+        now = time.perf_counter()
+        with self.lock:
+            for shutter in range(self.SHUTTERS):
+                if self.shutter_on[shutter] and now >= self.shutter_close_time[shutter]:
+                    self._shutter_edge(shutter, self.shutter_close_time[shutter])
+                    self.shutter_on[shutter] = False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Emulate the fiber shooting Arduino on a '
+                                                 'pseudo-terminal.')
+    parser.add_argument('--delay', type=float, default=0., help='processing delay per command (s)')
+    parser.add_argument('--jitter', type=float, default=0., help='random extra delay (s)')
+    parser.add_argument('--drop', type=float, default=0., help='probability to lose a command')
+    parser.add_argument('--corrupt', type=float, default=0., help='probability to corrupt a command')
+    parser.add_argument('--firmware-version', type=int, default=1, help='emulated protocol version')
+    args = parser.parse_args()
+
+    emulator = ArduinoEmulator(delay=args.delay, jitter=args.jitter, drop_probability=args.drop,
+                               corrupt_probability=args.corrupt,
+                               firmware_version=args.firmware_version)
+    print('Emulated Arduino on port {0}. Press Ctrl+C to stop.'.format(emulator.start()))
+    try:
+        while True:
+            time.sleep(1)
+            print('duty cycle {0:.4f}, frequency {1:.0f} Hz, shutters {2}, {3:d} commands'
+                  ''.format(emulator.get_duty_cycle(), emulator.get_frequency(),
+                            emulator.shutter_level, emulator.commands_executed))
+    except KeyboardInterrupt:
+        emulator.stop()
@@ -15,6 +15,7 @@ boolean shutter_toggling[SHUTTERS] = {true, false};  // true: toggling, false: h
 unsigned long shutter_starttime[SHUTTERS];  // Time at which shutter opens (in microseconds since Arduino start time)
 unsigned long shutter_length[SHUTTERS];     // Duration for shutter open state (in microseconds)
 boolean shutter_on[SHUTTERS] = {false, false};
+#define SERIAL_TIMEOUT 10     // serial communication timeout in ms
 
 // ------------------ Basics function of the arduino ------------------
 
@@ -78,6 +79,7 @@ void initialize() {
   TCCR1A |= _BV(COM1A1);             // Set non-inverting Fast PWM mode
   TCCR1B |= _BV(CS10);               // No prescaling, i.e., use Arduino Uno's 16 MHz clock (F_CPU)
   Serial.begin(115200);              // Connect to the serial port
+  Serial.setTimeout(SERIAL_TIMEOUT); // parseInt/readBytes give up after this time (default is 1 s)
 }
 
 // Raw set TOP
@@ -1,22 +1,75 @@
-from core.module import Base
+from core.module import Base, ConfigOption
 from interface.empty_interface import EmptyInterface
+import numpy as np
+import re
 import serial
+import threading
+import time
+from collections import deque, OrderedDict
 from threading import Timer
 
 
 class ArduinoHardware(Base, EmptyInterface):
     """
     This is the Interface class to define the controls for the arduino
+
+    All commands are sent by a serial writer thread. Duty cycle and frequency updates are
+    coalesced (latest value wins, stale setpoints are dropped under load), shutter and pulse
+    commands keep their strict ordering. Everything pending is written in one batch per flush.
+
+    In acknowledgement mode every command carries a sequence number and the firmware echoes it
+    back (see PROTOCOL.md). A reader thread matches the echoes, measures the round-trip latency
+    and detects lost or garbled commands. Example config:
+
+        arduino_hardware:
+            module.Class: 'arduino_uno.arduino_uno_hardware.ArduinoHardware'
+            port: 'COM3'  # or e.g. the pseudo-terminal of arduino_emulator.py
+            ack_mode: True
+            ack_timeout: 0.5  # s, a command without echo after this time is counted as lost
+            protocol: 'binary'  # 'ascii' (default) or 'binary'
+
+    With protocol 'binary' the duty cycle, frequency and shutter commands are sent as fixed-length
+    6 byte frames with checksum instead of ASCII text, if the firmware supports it. The protocol
+    version of the firmware is negotiated when connecting.
     """
     _modclass = 'EmptyInterface'
     _modtype = 'hardware'
 
+    _port = ConfigOption('port', 'COM3')
+    _baud_rate = ConfigOption('baud_rate', 115200)
+    _ack_mode = ConfigOption('ack_mode', False)
+    _ack_timeout = ConfigOption('ack_timeout', 0.5)
+    _protocol = ConfigOption('protocol', 'ascii')
+    # The Uno resets when the port is opened, the boot loader needs about 2 s
+    _negotiation_timeout = ConfigOption('negotiation_timeout', 3.)
+
+    # Coalesced commands, in the order they are written within one batch. The frequency goes
+    # first, because the duty cycle command is expressed in units of the PWM period (TOP).
+    _coalesced_commands = ('f', 'd')
+    # The Arduino Uno has a 64 byte receive buffer, do not overflow it with one batch
+    _max_batch_bytes = 48
+    # Sequence numbers wrap around to keep the commands short
+    _max_seq = 10000
+    # Reply of the firmware in acknowledgement mode: A<seq>:<echo> or N<seq>:<echo> (rejected)
+    _reply_pattern = re.compile(r'^([AN])(\d+):(.*)$')
+
+    # Protocol versions, see PROTOCOL.md. Version 0 firmware does not answer the version query.
+    PROTOCOL_ASCII = 0
+    PROTOCOL_BINARY = 1
+    # Binary frame: sync, opcode (ack flag | command id | option), sequence number,
+    # 16 bit payload (little endian), checksum
+    _frame_sync = 0xA5
+    _frame_length = 6
+    _frame_ack_flag = 0x80
+    _binary_command_ids = {'f': 1, 'd': 2, 's': 3, 'S': 4, 't': 5}
+    _max_binary_payload = 0xFFFF
+
     def on_activate(self):
         """
         Initialisation performed during activation of the module.
         """
-        self.port = 'COM3'
-        self.baud_rate=115200
+        self.port = self._port
+        self.baud_rate = self._baud_rate
         self.timeout = 0.2
         self.F_CPU = 16e6  # Arduino UNO CPU frequency (is used to derive the PWM frequency)
         self.TOP = 3199    # (TOP + 1) is the number of clock cycles in one PWM period
@@ -41,18 +94,28 @@ class ArduinoHardware(Base, EmptyInterface):
     def connect_arduino(self):
         self.arduino = serial.Serial(self.port, self.baud_rate, timeout=self.timeout)
         self.duty = 0.
+        self._negotiate_protocol()
+        self._start_writer()
+        if self._ack_mode:
+            self._start_reader()
 
     def disconnect_arduino(self):
+        self._stop_writer()
+        self._stop_reader()
         if self.arduino:
             self.arduino.close()
 
     def set_TOP(self, top):
-        self.TOP = top
-        self.arduino.write(('f_%d;' % self.TOP).encode())
+        with self._write_condition:
+            self.TOP = top
+            self._queue_command('f', top)
 
     def set_CM(self, cm):
-        self.CM = cm
-        self.arduino.write(('d_%d;' % self.CM).encode())
+        with self._write_condition:
+            # After an emergency stop the duty cycle stays zero, see reset_emergency_stop()
+            self.CM = -1 if self._estopped else cm
+            # Remember the period the compare value refers to, see _take_batch()
+            self._queue_command('d', (cm, self.TOP))
 
 
     def set_freq(self, freq):
@@ -66,16 +129,417 @@ class ArduinoHardware(Base, EmptyInterface):
         # print 'setting CM = {0:d} (duty = {1:.2f}%)'.format(cm, 100. * (CM + 1) / (TOP + 1))
 
     def open_shutter(self, shutter, duration):
-        self.arduino.write(('s{0:d}{1:d};'.format(shutter, duration)).encode())
+        self._queue_command('s', (shutter, duration))
 
     def open_shutter_micro(self, shutter, duration):
-        self.arduino.write(('S{0:d}{1:d};'.format(shutter, duration)).encode())
+        self._queue_command('S', (shutter, duration))
 
     def toggle_shutter(self, shutter):
-        # An arbitrary integer (9) added to avoid Serial.parseInt() timeout (see Arduino_communication.ino):
-        self.arduino.write('t{0:d}9;'.format(shutter).encode())
+        self._queue_command('t', shutter)
 
     def change_duty(self, duty):
         self.duty = duty
         if self.lasing:
             self.setduty(duty)
+
+    def emergency_stop(self):
+        """ Set the duty cycle to zero through the priority path.
+
+        The zero duty command is written directly to the serial port from the calling thread,
+        without waiting for the serial writer thread and ahead of the queued commands. A pending
+        duty cycle update is discarded. A batch the writer thread has already taken from the
+        queue may still be written after the zero, so the zero duty is queued once more and the
+        writer sends it right after that batch.
+
+        The stop is latched: until reset_emergency_stop() every duty cycle update is forced to
+        zero, also one that a control loop queues right after the stop with an older value.
+
+        @return float: time (s) spent until the command was written to the port
+        """
+        start = time.perf_counter()
+        with self._write_condition:
+            self._estopped = True
+            self.CM = -1
+            if self._latest_commands.pop('d', None) is not None:
+                self.dropped_updates += 1
+            frame = self._encode_command(*self._command_fields('d', self.CM))
+        try:
+            with self._serial_lock:
+                self.arduino.write(frame)
+        except serial.SerialException:
+            self.log.exception('Emergency stop: writing to the Arduino on {0} failed.'
+                               ''.format(self.port))
+        with self._write_condition:
+            self.emergency_stops += 1
+            self.bytes_written += len(frame)
+            self.commands_written += 1
+        self._queue_command('d', (self.CM, self.TOP))
+        return time.perf_counter() - start
+
+    def reset_emergency_stop(self):
+        """ Release the latch of emergency_stop(), duty cycle updates are sent again. The duty
+        cycle stays zero until the next update. """
+        with self._write_condition:
+            self._estopped = False
+
+    def is_emergency_stopped(self):
+        """ Whether the duty cycle is latched to zero by emergency_stop(). """
+        return self._estopped
+
+    # Protocol negotiation
+
+    def get_firmware_protocol_version(self):
+        """ Query the protocol version of the firmware. Only call before the reader thread runs.
+
+        @return int: highest protocol version supported by the firmware, or None if it does not
+                     answer (firmware older than the version query, i.e. ASCII only)
+        """
+        self.arduino.reset_input_buffer()
+        deadline = time.perf_counter() + self._negotiation_timeout
+        # Repeat the query, the first ones are lost while the Uno boots after opening the port
+        while time.perf_counter() < deadline:
+            self.arduino.write(b'v_0;')
+            line = self.arduino.readline().strip()
+            while line:
+                if line.startswith(b'V') and line[1:].isdigit():
+                    return int(line[1:])
+                line = self.arduino.readline().strip()
+        return None
+
+    def _negotiate_protocol(self):
+        """ Select the protocol used for sending commands, depending on the config and firmware. """
+        self.protocol_version = self.PROTOCOL_ASCII
+        if self._protocol == 'ascii':
+            return
+        elif self._protocol != 'binary':
+            self.log.error('Unknown protocol "{0}", using the ASCII protocol.'.format(self._protocol))
+            return
+        firmware_version = self.get_firmware_protocol_version()
+        if firmware_version is None or firmware_version < self.PROTOCOL_BINARY:
+            self.log.warning('The Arduino firmware does not support the binary protocol (version '
+                             '{0}). Using the ASCII protocol.'.format(firmware_version))
+            return
+        self.protocol_version = self.PROTOCOL_BINARY
+        self.log.info('Using the binary protocol with the Arduino.')
+
+    # Link health
+
+    def get_link_health(self):
+        """ Health of the serial link to the Arduino.
+
+        @return dict: the writer statistics (see get_writer_statistics) and, in acknowledgement
+                      mode, the counts of acknowledged, lost, garbled (echo does not match),
+                      rejected (unknown to the firmware) and pending commands, and the round-trip
+                      latency in s (mean, median, p99 and max of the last commands, as well as the
+                      histogram of all commands as (bin_edges, counts) with under- and overflow
+                      bins at both ends of counts).
+        """
+        health = self.get_writer_statistics()
+        health['protocol_version'] = self.protocol_version
+        health['ack_mode'] = self._ack_mode
+        if not self._ack_mode:
+            return health
+        with self._ack_lock:
+            latencies = np.array(self._recent_latencies)
+            health.update({'acknowledged': self.acknowledged_commands,
+                           'lost': self.lost_commands,
+                           'garbled': self.garbled_commands,
+                           'rejected': self.rejected_commands,
+                           'pending_acks': len(self._pending_acks),
+                           'latency_histogram': (self._latency_bin_edges.copy(),
+                                                 self._latency_counts.copy())})
+        if latencies.size > 0:
+            health.update({'latency_mean': float(latencies.mean()),
+                           'latency_median': float(np.median(latencies)),
+                           'latency_p99': float(np.percentile(latencies, 99)),
+                           'latency_max': float(latencies.max())})
+        else:
+            health.update({'latency_mean': np.nan, 'latency_median': np.nan,
+                           'latency_p99': np.nan, 'latency_max': np.nan})
+        return health
+
+    def _start_reader(self):
+        """ Set up the acknowledgement book-keeping and start the serial reader thread. """
+        self._ack_lock = threading.Lock()
+        self._pending_acks = OrderedDict()  # seq -> (expected echo, send time), oldest first
+        self.acknowledged_commands = 0
+        self.lost_commands = 0
+        self.garbled_commands = 0
+        self.rejected_commands = 0
+        # Logarithmic latency bins from 0.1 ms to 1 s
+        self._latency_bin_edges = np.logspace(-4, 0, 41)
+        self._latency_counts = np.zeros(len(self._latency_bin_edges) + 1, dtype=np.int64)
+        self._recent_latencies = deque(maxlen=1000)
+        self._reader_running = True
+        self._reader_thread = threading.Thread(target=self._serial_reader_loop,
+                                               name='arduino-serial-reader',
+                                               daemon=True)
+        self._reader_thread.start()
+
+    def _stop_reader(self):
+        """ Stop the serial reader thread. """
+        if getattr(self, '_reader_thread', None) is None:
+            return
+        self._reader_running = False
+        self._reader_thread.join(timeout=2)
+        self._reader_thread = None
+
+    def _serial_reader_loop(self):
+        """ Thread target: read the replies of the firmware and expire commands without reply. """
+        while self._reader_running:
+            try:
+                # Returns an empty line after the port timeout
+                line = self.arduino.readline()
+            except serial.SerialException:
+                self.log.exception('Reading from the Arduino on {0} failed.'.format(self.port))
+                return
+            now = time.perf_counter()
+            if line:
+                self._handle_reply(line, now)
+            self._expire_acks(now)
+
+    def _handle_reply(self, line, receive_time):
+        """ Match a reply of the firmware with the command it acknowledges. """
+        match = self._reply_pattern.match(line.decode('ascii', errors='replace').strip())
+        with self._ack_lock:
+            if match is None:
+                self.garbled_commands += 1
+                self.log.warning('Garbled reply from the Arduino: {0}'.format(line))
+                return
+            kind, seq, echo = match.group(1), int(match.group(2)), match.group(3)
+            if seq not in self._pending_acks:
+                # Either already counted as lost, or the sequence number itself got garbled
+                self.garbled_commands += 1
+                self.log.warning('Unexpected reply from the Arduino: {0}'.format(line))
+                return
+            expected, send_time = self._pending_acks.pop(seq)
+            if echo != expected:
+                self.garbled_commands += 1
+                self.log.warning('Arduino received "{0}" instead of "{1}".'.format(echo, expected))
+            elif kind == 'N':
+                self.rejected_commands += 1
+                self.log.warning('Arduino rejected the command "{0}".'.format(echo))
+            else:
+                self.acknowledged_commands += 1
+                latency = receive_time - send_time
+                self._latency_counts[np.searchsorted(self._latency_bin_edges, latency)] += 1
+                self._recent_latencies.append(latency)
+
+    def _expire_acks(self, now):
+        """ Count the commands that were not acknowledged within the timeout as lost. """
+        with self._ack_lock:
+            while self._pending_acks:
+                seq, (expected, send_time) = next(iter(self._pending_acks.items()))
+                if now - send_time < self._ack_timeout:
+                    break
+                del self._pending_acks[seq]
+                self.lost_commands += 1
+                self.log.warning('Command "{0}" (sequence number {1:d}) was not acknowledged by '
+                                 'the Arduino.'.format(expected, seq))
+
+    # Serial writer
+
+    def get_writer_statistics(self):
+        """ Statistics of the serial writer thread.
+
+        @return dict: bytes_written, bytes_per_second (over the last second), commands_written,
+                      dropped_updates (coalesced duty/frequency updates that were never sent),
+                      flushes, pending (commands waiting in the queue) and emergency_stops
+        """
+        with self._write_condition:
+            now = time.perf_counter()
+            self._prune_rate_window(now)
+            return {'bytes_written': self.bytes_written,
+                    'bytes_per_second': sum(n for _, n in self._rate_window),
+                    'commands_written': self.commands_written,
+                    'dropped_updates': self.dropped_updates,
+                    'flushes': self.flushes,
+                    'pending': len(self._latest_commands) + len(self._ordered_commands),
+                    'emergency_stops': self.emergency_stops}
+
+    def _start_writer(self):
+        """ Set up the command queue and start the serial writer thread. """
+        self._write_condition = threading.Condition()
+        self._serial_lock = threading.Lock()
+        self._latest_commands = dict()   # command -> latest argument, latest value wins
+        self._ordered_commands = deque()  # (command, argument), strict ordering
+        self._rate_window = deque()       # (time, bytes) of the writes during the last second
+        self._next_seq = 0
+        self.bytes_written = 0
+        self.commands_written = 0
+        self.dropped_updates = 0
+        self.flushes = 0
+        self.emergency_stops = 0
+        self._estopped = False
+        self._writer_running = True
+        self._writer_thread = threading.Thread(target=self._serial_writer_loop,
+                                               name='arduino-serial-writer',
+                                               daemon=True)
+        self._writer_thread.start()
+
+    def _stop_writer(self):
+        """ Stop the serial writer thread after it has written all pending commands. """
+        if getattr(self, '_writer_thread', None) is None:
+            return
+        with self._write_condition:
+            self._writer_running = False
+            self._write_condition.notify()
+        self._writer_thread.join(timeout=2)
+        self._writer_thread = None
+
+    def _queue_command(self, command, argument):
+        """ Hand a command over to the serial writer thread.
+
+        @param str command: command character, see arduino_communication.ino
+        @param argument: command argument, format depends on the command
+        """
+        with self._write_condition:
+            if command == 'd' and self._estopped and argument[0] != -1:
+                # Latched emergency stop: a duty cycle update can not replace the queued zero
+                argument = (-1, argument[1])
+            if command in self._coalesced_commands:
+                if command in self._latest_commands:
+                    self.dropped_updates += 1
+                self._latest_commands[command] = argument
+            else:
+                self._ordered_commands.append((command, argument))
+            self._write_condition.notify()
+
+    def _serial_writer_loop(self):
+        """ Thread target: write everything that is pending, then wait for new commands. """
+        while True:
+            with self._write_condition:
+                while (self._writer_running and not self._latest_commands
+                       and not self._ordered_commands):
+                    self._write_condition.wait()
+                if not self._latest_commands and not self._ordered_commands:
+                    return
+                batch, sent = self._take_batch()
+            self._write(batch, sent)
+
+    def _take_batch(self):
+        """ Remove pending commands from the queue and encode them into one batch.
+        Call with _write_condition held.
+
+        @return (bytes, list): encoded commands to write in one go, and (sequence number, echo)
+                               of each command for the acknowledgement book-keeping
+        """
+        fields = []
+        for command in self._coalesced_commands:
+            if command in self._latest_commands:
+                argument = self._latest_commands.pop(command)
+                if command == 'd':
+                    cm, top = argument
+                    if top != self.TOP:
+                        # The period changed after this duty update was queued. Keep the duty cycle.
+                        cm = int(round((cm + 1) * (self.TOP + 1) / (top + 1) - 1))
+                    argument = cm
+                fields.append(self._command_fields(command, argument))
+        frames = [self._encode_command(*field, seq=self._next_seq_number(i))
+                  for i, field in enumerate(fields)]
+        size = sum(len(frame) for frame in frames)
+        while self._ordered_commands:
+            field = self._command_fields(*self._ordered_commands[0])
+            frame = self._encode_command(*field, seq=self._next_seq_number(len(frames)))
+            if frames and size + len(frame) > self._max_batch_bytes:
+                # Keep the rest for the next flush
+                break
+            self._ordered_commands.popleft()
+            fields.append(field)
+            frames.append(frame)
+            size += len(frame)
+        sent = []
+        if self._ack_mode:
+            for i, (command, option, value) in enumerate(fields):
+                sent.append((self._next_seq_number(i), '{0}{1}{2:d}'.format(command, option, value)))
+            self._next_seq = self._next_seq_number(len(fields))
+        self.commands_written += len(frames)
+        return b''.join(frames), sent
+
+    def _next_seq_number(self, offset=0):
+        """ Sequence number of the command offset positions after the next one to be sent. """
+        max_seq = 256 if self.protocol_version == self.PROTOCOL_BINARY else self._max_seq
+        return (self._next_seq + offset) % max_seq
+
+    def _command_fields(self, command, argument):
+        """ Split a queued command into the fields of the protocol.
+
+        @return (str, str, int): command character, option character and unsigned value. The
+                                 firmware echoes these as '<command><option><value>'.
+        """
+        if command == 'f':
+            return 'f', '_', argument
+        elif command == 'd':
+            # Zero duty gives CM = -1. The firmware constrains CM to >= 0 anyway, and the value
+            # is parsed (and echoed) as unsigned.
+            return 'd', '_', max(argument, 0)
+        elif command in ('s', 'S'):
+            shutter, duration = argument
+            if (command == 'S' and self.protocol_version == self.PROTOCOL_BINARY
+                    and duration > self._max_binary_payload):
+                # Does not fit into the 16 bit payload, switch to the millisecond pulse
+                command, duration = 's', int(round(duration / 1000))
+            return command, str(shutter), duration
+        elif command == 't':
+            # An arbitrary integer (9) added to avoid Serial.parseInt() timeout (see Arduino_communication.ino):
+            return 't', str(argument), 9
+        raise ValueError('Unknown Arduino command "{0}".'.format(command))
+
+    def _encode_command(self, command, option, value, seq=None):
+        """ Encode a single command with the negotiated protocol (see PROTOCOL.md).
+
+        @param str command: command character
+        @param str option: option character
+        @param int value: unsigned value
+        @param int seq: sequence number, only used in acknowledgement mode
+
+        @return bytes: encoded command
+        """
+        if not self._ack_mode:
+            seq = None
+        if self.protocol_version == self.PROTOCOL_BINARY:
+            if value > self._max_binary_payload:
+                self.log.error('Value {0:d} of command "{1}" does not fit into a binary frame. '
+                               'Clipped to {2:d}.'.format(value, command, self._max_binary_payload))
+                value = self._max_binary_payload
+            opcode = self._binary_command_ids[command] << 4
+            if option != '_':
+                opcode |= int(option)
+            if seq is not None:
+                opcode |= self._frame_ack_flag
+            body = bytes((opcode, 0 if seq is None else seq, value & 0xFF, value >> 8))
+            # The bytes after the sync byte sum up to zero (mod 256)
+            return bytes((self._frame_sync,)) + body + bytes(((-sum(body)) & 0xFF,))
+        if seq is None:
+            return '{0}{1}{2:d};'.format(command, option, value).encode()
+        return '{0}{1}{2:d}@{3:d};'.format(command, option, value, seq).encode()
+
+    def _write(self, data, sent=()):
+        """ Write one batch to the serial port and update the statistics.
+
+        @param bytes data: encoded batch
+        @param list sent: (sequence number, echo) of the commands in the batch, in ack mode
+        """
+        if sent:
+            # Register before writing, the reply may arrive before write() returns
+            send_time = time.perf_counter()
+            with self._ack_lock:
+                for seq, echo in sent:
+                    self._pending_acks[seq] = (echo, send_time)
+        try:
+            with self._serial_lock:
+                self.arduino.write(data)
+        except serial.SerialException:
+            self.log.exception('Writing to the Arduino on {0} failed.'.format(self.port))
+            return
+        now = time.perf_counter()
+        with self._write_condition:
+            self.bytes_written += len(data)
+            self.flushes += 1
+            self._rate_window.append((now, len(data)))
+            self._prune_rate_window(now)
+
+    def _prune_rate_window(self, now):
+        """ Forget writes older than one second. Call with _write_condition held. """
+        while self._rate_window and now - self._rate_window[0][0] > 1.:
+            self._rate_window.popleft()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a dummy replacing the Arduino Uno which generates the laser PWM and drives
+the shutters. It has the same API as arduino_uno.arduino_uno_hardware.ArduinoHardware and forwards
+the duty cycle to the simulated laser plant.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import time
+
+from core.module import Base, Connector, ConfigOption
+from interface.empty_interface import EmptyInterface
+
+
+class ArduinoDummy(Base, EmptyInterface):
+    """ Dummy of the Arduino laser/shutter controller.
+
+    The firmware limits (TOP range and hard duty cycle limit, see arduino_uno.ino) are applied
+    the same way as on the real board, so the dummy sees exactly the duty cycle the laser would.
+
+    Example config:
+
+        arduino_hardware:
+            module.Class: 'fiber_shooting_dummy.arduino_dummy.ArduinoDummy'
+            connect:
+                laser_plant: 'laser_plant_dummy'
+    """
+    _modclass = 'EmptyInterface'
+    _modtype = 'hardware'
+
+    laser_plant = Connector(interface='EmptyInterface')
+
+    # Firmware constants (arduino_uno.ino)
+    _top_min = ConfigOption('top_min', 799)
+    _top_max = ConfigOption('top_max', 3199)
+    _firmware_duty_max = ConfigOption('firmware_duty_max', .6)
+    _shutters = ConfigOption('shutters', 2)
+
+    def on_activate(self):
+        """
+        Initialisation performed during activation of the module.
+        """
+        self._laser_plant = self.laser_plant()
+        self.port = 'dummy'
+        self.baud_rate = 115200
+        self.F_CPU = 16e6  # Arduino UNO CPU frequency (is used to derive the PWM frequency)
+        self.TOP = 3199    # (TOP + 1) is the number of clock cycles in one PWM period
+        self.CM = 0        # (CM + 1) is the number of clock cycles for PWM high time (defines the duty cycle)
+        # Register values after the firmware constraints
+        self._applied_top = self._top_max
+        self._applied_cm = 0
+        # Emulated output state, with time stamps (perf_counter) of the last change
+        self.shutter_open = [False] * self._shutters
+        self.shutter_timestamp = [0.] * self._shutters
+        self._shutter_close_time = [None] * self._shutters
+        self.duty_timestamp = 0.
+        self.commands_received = 0
+        self.emergency_stops = 0
+        self._estopped = False
+        self.connect_arduino()
+        self.set_freq(5000)  # Default PWM frequency
+        self.set_duty_cycle(.01)
+        self.lasing = False
+        return
+
+    def on_deactivate(self):
+        """
+        De-initialisation performed during deactivation of the module.
+        """
+        self.disconnect_arduino()
+        return
+
+    def connect_arduino(self):
+        self.arduino = None
+        self.duty = 0.
+
+    def disconnect_arduino(self):
+        self._laser_plant.set_duty_cycle(0.)
+
+    def set_TOP(self, top):
+        self.TOP = top
+        self.commands_received += 1
+        # Like the firmware: constrain TOP and keep the duty cycle unchanged
+        duty = (self._applied_cm + 1) / (self._applied_top + 1)
+        self._applied_top = min(max(top, self._top_min), self._top_max)
+        self._apply_cm(int((self._applied_top + 1) * duty - 1))
+
+    def set_CM(self, cm):
+        # After an emergency stop the duty cycle stays zero, see reset_emergency_stop()
+        self.CM = -1 if self._estopped else cm
+        self.commands_received += 1
+        self._apply_cm(self.CM)
+
+    def set_freq(self, freq):
+        top = int(round(self.F_CPU / float(freq) - 1))  # because PWM_freq = F_CPU / (top + 1)
+        self.set_TOP(top)
+
+    def set_duty_cycle(self, duty):
+        cm = int(round(duty * (self.TOP + 1) - 1))  # because duty = (CM + 1)/(TOP + 1)
+        self.set_CM(cm)
+
+    def open_shutter(self, shutter, duration):
+        self.open_shutter_micro(shutter, duration * 1000)
+
+    def open_shutter_micro(self, shutter, duration):
+        self.commands_received += 1
+        # The firmware ignores a pulse request while the shutter is still open
+        if self.is_shutter_open(shutter):
+            return
+        now = time.perf_counter()
+        self.shutter_open[shutter] = True
+        self.shutter_timestamp[shutter] = now
+        self._shutter_close_time[shutter] = now + duration * 1e-6
+
+    def toggle_shutter(self, shutter):
+        self.commands_received += 1
+        self.shutter_open[shutter] = not self.is_shutter_open(shutter)
+        self.shutter_timestamp[shutter] = time.perf_counter()
+        self._shutter_close_time[shutter] = None
+
+    def change_duty(self, duty):
+        self.duty = duty
+        if self.lasing:
+            self.set_duty_cycle(duty)
+
+    def emergency_stop(self):
+        """ Set the duty cycle to zero, see ArduinoHardware.emergency_stop().
+
+        @return float: time (s) spent until the command was applied
+        """
+        start = time.perf_counter()
+        self.emergency_stops += 1
+        self._estopped = True
+        self.set_CM(-1)
+        return time.perf_counter() - start
+
+    def reset_emergency_stop(self):
+        """ Release the latch of emergency_stop(), see ArduinoHardware.reset_emergency_stop(). """
+        self._estopped = False
+
+    def is_emergency_stopped(self):
+        """ Whether the duty cycle is latched to zero by emergency_stop(). """
+        return self._estopped
+
+    def get_link_health(self):
+        """ Link statistics in the format of ArduinoHardware.get_link_health(). There is no serial
+        link, every command is applied immediately.
+        """
+        return {'bytes_written': 0,
+                'bytes_per_second': 0,
+                'commands_written': self.commands_received,
+                'dropped_updates': 0,
+                'flushes': self.commands_received,
+                'pending': 0,
+                'emergency_stops': self.emergency_stops,
+                'ack_mode': False}
+
+    def is_shutter_open(self, shutter):
+        """ Emulated state of a shutter output, taking finished pulses into account. """
+        close_time = self._shutter_close_time[shutter]
+        if close_time is not None and time.perf_counter() >= close_time:
+            self.shutter_open[shutter] = False
+            self.shutter_timestamp[shutter] = close_time
+            self._shutter_close_time[shutter] = None
+        return self.shutter_open[shutter]
+
+    def get_applied_duty_cycle(self):
+        """ Duty cycle the emulated firmware currently outputs on the PWM pin. """
+        if self._applied_cm <= 0:
+            return 0.
+        return (self._applied_cm + 1) / (self._applied_top + 1)
+
+    def _apply_cm(self, cm):
+        """ Constrain CM like the firmware does and forward the resulting duty cycle to the plant. """
+        self._applied_cm = min(max(cm, 0), int(self._firmware_duty_max * self._applied_top))
+        self.duty_timestamp = time.perf_counter()
+        # CM = 0 is a single clock cycle spike, which does not make the laser emit
+        self._laser_plant.set_duty_cycle(self.get_applied_duty_cycle())
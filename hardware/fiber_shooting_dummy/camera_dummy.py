@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a dummy replacing the TheImagingSource camera. It has the same API as
+TiS_camera_hardware.TisCamera, keeps the marker and zoom settings, but opens no camera and no
+OpenCV window, so it runs without OpenCV and without a display.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+from core.module import Base
+from interface.empty_interface import EmptyInterface
+
+
+class CameraDummy(Base, EmptyInterface):
+    """ Dummy of the TheImagingSource camera.
+
+    Example config:
+
+        TiS_camera_hardware:
+            module.Class: 'fiber_shooting_dummy.camera_dummy.CameraDummy'
+    """
+    _modclass = 'EmptyInterface'
+    _modtype = 'hardware'
+
+    def on_activate(self):
+        """
+        Initialisation performed during activation of the module.
+        """
+        self.cam = None
+        self.video = False
+        self.exposure = -2
+        # Same pixel size and software scaling as TisCamera
+        self.px_size_zoom1_um = 7 * 125. / 452 / 2
+        self.zoom_factor = 7
+        self.px_size_um = self.px_size_zoom1_um / self.zoom_factor
+        # On-screen markers
+        self.edges = False
+        self.edge_min = 6
+        self.edge_max = 26
+        self.cross = False
+        self.cladding = False
+        self.jacket = False
+        self.core = False
+        self.fiber_jacket_radius = 165 / 2  # um
+        self.fiber_cladding_radius = 125 / 2  # um
+        self.fiber_core_radius = 5 / 2  # um
+        self._update_marker_radii()
+        return
+
+    def on_deactivate(self):
+        """ Deinitialisation performed during deactivation of the module.
+        """
+        self.stop_video()
+        return
+
+    def setup_camera(self):
+        """ Setup camera parameters. The dummy camera is always available.
+
+        @return bool: True
+        """
+        self.cam = 'dummy'
+        self._update_marker_radii()
+        return True
+
+    def start_video_thread(self):
+        """ Start the (emulated) video capture. """
+        if self.cam is not None:
+            self.log.warning('Camera output is already in progress.')
+            return
+        self.setup_camera()
+        self.video = True
+        return
+
+    def stop_video(self):
+        """ Stop the (emulated) video capture. """
+        self.video = False
+        self.cam = None
+        return
+
+    def set_edge_detection(self, boolean):
+        """ Set the edge detection drawn status. """
+        self.edges = boolean
+
+    def is_edge_detection(self):
+        """ Get the edge detection drawn status. """
+        return self.edges
+
+    def take_screenshot(self):
+        """ There is no frame to save. """
+        self.log.info('The dummy camera has no frame to save as screenshot.')
+
+    def set_zoom_factor(self, value):
+        """ Set the scaling factor of the video. """
+        self.zoom_factor = value
+        self.px_size_um = self.px_size_zoom1_um / self.zoom_factor
+        self._update_marker_radii()
+
+    def get_zoom_factor(self):
+        """ Get the scaling factor of the video. """
+        return self.zoom_factor
+
+    def set_edge_min(self, value):
+        """ Set the edges minimum threshold. """
+        self.edge_min = value * 255 / 100
+
+    def get_edge_min(self):
+        """ Get the edges minimum threshold. """
+        return int(self.edge_min * 100 / 255)
+
+    def set_edge_max(self, value):
+        """ Set the edges maximum threshold. """
+        self.edge_max = value * 255 / 100
+
+    def get_edge_max(self):
+        """ Get the edges maximum threshold. """
+        return int(self.edge_max * 100 / 255)
+
+    # Hot-key handlers
+
+    def exposure_up(self):
+        """Increase exposure of the camera
+        @return: New exposure value"""
+        if self.cam is not None:
+            self.exposure += 1
+            return self.exposure
+
+    def exposure_down(self):
+        """Decrease exposure of the camera
+        @return: New exposure value"""
+        if self.cam is not None:
+            self.exposure -= 1
+            return self.exposure
+
+    def core_up(self):
+        """Increase the radius of the fiber core marker
+        @return: New fiber core size in px"""
+        if self.cam is not None:
+            self.core_circle_radius += 1
+            return self.core_circle_radius
+
+    def core_down(self):
+        """Decrease the radius of the fiber core marker
+        @return: New fiber core size in px"""
+        if self.cam is not None:
+            self.core_circle_radius -= 1
+            return self.core_circle_radius
+
+    def _update_marker_radii(self):
+        """ Radii (px) of the fiber markers for the current pixel size. """
+        self.jacket_circle_radius = int(self.fiber_jacket_radius / self.px_size_um)
+        self.cladding_circle_radius = int(self.fiber_cladding_radius / self.px_size_um)
+        self.core_circle_radius = int(self.fiber_core_radius / self.px_size_um)
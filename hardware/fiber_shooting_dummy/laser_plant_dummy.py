@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a simulated CO2 laser plant which couples the Arduino dummy
+(actuator) and the power meter dummy (sensor) of the fiber shooting setup.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from core.module import Base, ConfigOption
+from interface.empty_interface import EmptyInterface
+
+
+class LaserPlantModel:
+    """ First-order-plus-dead-time model of the laser power as a function of the PWM duty cycle.
+
+        power(t) follows  tau * dP/dt = gain * duty(t - dead_time) + offset - P
+
+    The duty cycle is piecewise constant (it only changes when a command is sent), so the state
+    is propagated exactly between input changes and only evaluated when somebody asks for it.
+    This class does not depend on Qt and can be used standalone (e.g. in simulation scripts).
+    """
+
+    def __init__(self, gain=10., time_constant=0.3, dead_time=0.02, noise=1e-3, offset=0.,
+                 max_power=None, seed=None, clock=time.perf_counter):
+        """
+        @param float gain: steady state power per unit duty cycle (W)
+        @param float time_constant: first-order (thermal) lag of the laser output (s)
+        @param float dead_time: pure delay between a duty change and the power response (s)
+        @param float noise: standard deviation of the additive gaussian measurement noise (W)
+        @param float offset: power measured at zero duty cycle (W)
+        @param float max_power: optional, saturation of the laser output (W)
+        @param int seed: optional, seed of the noise generator for reproducible runs
+        @param callable clock: monotonic clock used when no explicit time is passed
+        """
+        self.gain = gain
+        self.time_constant = time_constant
+        self.dead_time = dead_time
+        self.noise = noise
+        self.offset = offset
+        self.max_power = max_power
+        self.clock = clock
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, t=None):
+        """ Put the plant back to rest (zero duty, power at offset). """
+        with self._lock:
+            self._t = self.clock() if t is None else t
+            self._u = 0.
+            self._y = self.offset
+            self._pending = deque()
+
+    def set_input(self, duty, t=None):
+        """ Apply a new duty cycle. It will act on the output after the dead time.
+
+        @param float duty: duty cycle between 0 and 1
+        @param float t: optional, time of the change (defaults to now)
+        """
+        t = self.clock() if t is None else t
+        with self._lock:
+            self._pending.append((t + self.dead_time, float(duty)))
+
+    def get_output(self, t=None, noisy=True):
+        """ Get the laser power at time t.
+
+        @param float t: optional, evaluation time (defaults to now). Must not go back in time.
+        @param bool noisy: add measurement noise to the returned value
+
+        @return float: laser power (W)
+        """
+        t = self.clock() if t is None else t
+        with self._lock:
+            self._advance(t)
+            power = self._y
+        if noisy and self.noise > 0:
+            power += self._rng.normal(0., self.noise)
+        return power
+
+    def steady_state(self, duty):
+        """ Steady state power for a constant duty cycle (no noise). """
+        power = self.gain * duty + self.offset
+        if self.max_power is not None:
+            power = min(power, self.max_power)
+        return power
+
+    def _advance(self, t):
+        """ Propagate the state up to time t, applying all delayed input changes on the way. """
+        while self._pending and self._pending[0][0] <= t:
+            t_apply, duty = self._pending.popleft()
+            self._propagate(t_apply)
+            self._u = duty
+        self._propagate(t)
+
+    def _propagate(self, t):
+        """ Exact solution of the first-order lag for a constant input over [self._t, t]. """
+        dt = t - self._t
+        if dt <= 0:
+            return
+        target = self.steady_state(self._u)
+        if self.time_constant > 0:
+            self._y = target + (self._y - target) * math.exp(-dt / self.time_constant)
+        else:
+            self._y = target
+        self._t = t
+
+
+class LaserPlantDummy(Base, EmptyInterface):
+    """ Qudi module holding the simulated laser plant shared by the Arduino and power meter dummies.
+
+    Example config:
+
+        laser_plant_dummy:
+            module.Class: 'fiber_shooting_dummy.laser_plant_dummy.LaserPlantDummy'
+            gain: 10        # W per unit duty cycle
+            time_constant: 0.3  # s
+            dead_time: 0.02     # s
+            noise: 1e-3         # W
+    """
+    _modclass = 'EmptyInterface'
+    _modtype = 'hardware'
+
+    _gain = ConfigOption('gain', 10.)
+    _time_constant = ConfigOption('time_constant', 0.3)
+    _dead_time = ConfigOption('dead_time', 0.02)
+    _noise = ConfigOption('noise', 1e-3)
+    _offset = ConfigOption('offset', 0.)
+    _max_power = ConfigOption('max_power', None)
+    _seed = ConfigOption('seed', None)
+
+    def on_activate(self):
+        """ Initialisation performed during activation of the module. """
+        self.plant = LaserPlantModel(gain=self._gain,
+                                     time_constant=self._time_constant,
+                                     dead_time=self._dead_time,
+                                     noise=self._noise,
+                                     offset=self._offset,
+                                     max_power=self._max_power,
+                                     seed=self._seed)
+        return
+
+    def on_deactivate(self):
+        """ Deinitialisation performed during deactivation of the module. """
+        self.plant.reset()
+        return
+
+    def set_duty_cycle(self, duty):
+        """ Actuator side: the duty cycle currently applied to the laser. """
+        self.plant.set_input(duty)
+
+    def get_power(self):
+        """ Sensor side: the laser power (W) at this moment including measurement noise. """
+        return self.plant.get_output()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a dummy replacing the Thorlabs PM101 power meter (TLPM driver). It has the same
+API as Thorlabs_PM101.Thorlabs_TLPM_hardware.Thorlabs_Powermeter and reads the power from the
+simulated laser plant.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import time
+
+from core.module import Base, Connector, ConfigOption
+from interface.empty_interface import EmptyInterface
+
+
+class PowermeterDummy(Base, EmptyInterface):
+    """ Dummy of the Thorlabs power meter.
+
+    measPower of the real device blocks for the duration of one measurement, which sets the rate
+    of the control loop. The dummy emulates this with the configurable measurement_time.
+
+    Example config:
+
+        power_meter_hardware:
+            module.Class: 'fiber_shooting_dummy.powermeter_dummy.PowermeterDummy'
+            measurement_time: 3e-3  # s
+            connect:
+                laser_plant: 'laser_plant_dummy'
+    """
+    _modclass = 'EmptyInterface'
+    _modtype = 'hardware'
+
+    laser_plant = Connector(interface='EmptyInterface')
+
+    _measurement_time = ConfigOption('measurement_time', 3e-3)
+    _beam_splitter_coef = ConfigOption('beam_splitter_coef', 1)
+
+    def on_activate(self):
+        """
+        Initialisation performed during activation of the module.
+        """
+        self._laser_plant = self.laser_plant()
+        self.beam_splitter_coef = self._beam_splitter_coef
+        self.connected = True
+        return
+
+    def on_deactivate(self):
+        """ Deinitialisation performed during deactivation of the module.
+        """
+        self.connected = False
+        return
+
+    def get_power(self):
+        if self.connected:
+            if self._measurement_time > 0:
+                time.sleep(self._measurement_time)
+            return self._laser_plant.get_power() * self.beam_splitter_coef
+        else:
+            return 0
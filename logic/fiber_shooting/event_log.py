@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the append-only binary event log of the fiber shooting logic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import datetime
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+# Event types
+EVENT_PULSE = 1             # channel: shutter, value: duration (ms)
+EVENT_DUTY_CYCLE = 2        # value: requested duty cycle, value2: duty cycle sent to the laser
+EVENT_FREQUENCY = 3         # value: PWM frequency
+EVENT_SHUTTER_TOGGLE = 4    # channel: shutter (0: flipper, 1: shutter)
+EVENT_PID = 5               # value: 1 for PID on, 0 for PID off
+EVENT_SETPOINT = 6          # value: power setpoint (W)
+EVENT_LASER = 7             # value: 1 for laser on, 0 for laser off
+EVENT_WATCHDOG = 8          # value: reaction latency (s), value2: requested duty cycle
+
+EVENT_NAMES = {EVENT_PULSE: 'pulse',
+               EVENT_DUTY_CYCLE: 'duty_cycle',
+               EVENT_FREQUENCY: 'frequency',
+               EVENT_SHUTTER_TOGGLE: 'shutter_toggle',
+               EVENT_PID: 'pid',
+               EVENT_SETPOINT: 'setpoint',
+               EVENT_LASER: 'laser',
+               EVENT_WATCHDOG: 'watchdog_trip'}
+
+# Fixed record of 40 bytes, little endian
+EVENT_DTYPE = np.dtype([('monotonic', '<f8'),   # time.perf_counter() (s)
+                        ('wall_time', '<f8'),   # time.time() (s since the epoch)
+                        ('event', '<u2'),
+                        ('channel', '<i2'),
+                        ('session', '<u4'),     # index of the EventLog instance in the day
+                        ('value', '<f8'),
+                        ('value2', '<f8')])
+_RECORD = struct.Struct('<ddHhIdd')
+
+# File header of 64 bytes: magic, version, header size, record size, record count.
+# The count is updated after the record is written, so a reader never sees a partial record.
+_MAGIC = b'FSEVTLOG'
+_VERSION = 1
+_HEADER = struct.Struct('<8sHHIQ')
+_HEADER_SIZE = 64
+_COUNT_OFFSET = 16
+
+
+def event_log_filename(directory, day):
+    """ Path of the event log file of a day.
+
+    @param str directory: event log directory
+    @param datetime.date day: day of the events
+
+    @return str: path of the file
+    """
+    return os.path.join(directory, '{0}_fiber_shooting_events.bin'.format(day.strftime('%Y%m%d')))
+
+
+class EventLog:
+    """ Append-only log of fixed-size event records, one file per day.
+
+    The file is grown in chunks and memory-mapped, so writing an event is a struct pack into the
+    map and an update of the record count in the header, without a system call. It is cheap
+    enough to be called from the control loop. The operating system writes the pages back to
+    the file, also when the program crashes, only a power loss can lose the last events.
+    """
+
+    def __init__(self, directory, chunk_records=4096, clock=time.perf_counter,
+                 wall_clock=time.time):
+        """
+        @param str directory: directory of the daily event log files, created if needed
+        @param int chunk_records: number of records the file grows by
+        @param callable clock: monotonic clock of the 'monotonic' field
+        @param callable wall_clock: clock of the 'wall_time' field (s since the epoch), it also
+                                    selects the file of the day
+        """
+        self.directory = directory
+        self.chunk_records = chunk_records
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.session = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._count = 0
+        self._capacity = 0
+        self._day_end = 0.
+
+    @property
+    def filename(self):
+        """ Path of the current file, None if closed. """
+        return None if self._file is None else self._file.name
+
+    def log(self, event, value=0., value2=0., channel=0):
+        """ Append an event.
+
+        @param int event: event type, one of the EVENT_* constants
+        @param float value: first parameter of the event
+        @param float value2: second parameter of the event
+        @param int channel: shutter or channel index
+        """
+        monotonic = self.clock()
+        wall_time = self.wall_clock()
+        with self._lock:
+            if wall_time >= self._day_end:
+                self._open(wall_time)
+            if self._count >= self._capacity:
+                self._grow()
+            offset = _HEADER_SIZE + self._count * _RECORD.size
+            _RECORD.pack_into(self._map, offset, monotonic, wall_time, event, channel,
+                              self.session, value, value2)
+            self._count += 1
+            struct.pack_into('<Q', self._map, _COUNT_OFFSET, self._count)
+
+    def flush(self):
+        """ Write the mapped pages to the disk (fsync). """
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+
+    def close(self):
+        """ Flush and close the current file. """
+        with self._lock:
+            self._close()
+            self._day_end = 0.
+
+    def _open(self, wall_time):
+        """ Open (or create) the file of the day of wall_time. """
+        self._close()
+        day = datetime.date.fromtimestamp(wall_time)
+        midnight = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time())
+        self._day_end = midnight.timestamp()
+        os.makedirs(self.directory, exist_ok=True)
+        path = event_log_filename(self.directory, day)
+        if os.path.exists(path):
+            self._file = open(path, 'r+b')
+            count = _read_header(self._file, path)
+            if count:
+                self._file.seek(_HEADER_SIZE + (count - 1) * _RECORD.size)
+                self.session = _RECORD.unpack(self._file.read(_RECORD.size))[4] + 1
+            else:
+                self.session = 0
+        else:
+            self._file = open(path, 'w+b')
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION, _HEADER_SIZE, _RECORD.size, 0)
+                             .ljust(_HEADER_SIZE, b'\0'))
+            self._file.flush()
+            count = 0
+            self.session = 0
+        self._count = count
+        size = os.fstat(self._file.fileno()).st_size
+        self._capacity = (size - _HEADER_SIZE) // _RECORD.size
+        self._map = mmap.mmap(self._file.fileno(), max(size, _HEADER_SIZE))
+
+    def _grow(self):
+        """ Extend the file by chunk_records records and map it again. """
+        self._capacity += self.chunk_records
+        self._map.close()
+        self._file.truncate(_HEADER_SIZE + self._capacity * _RECORD.size)
+        self._map = mmap.mmap(self._file.fileno(), _HEADER_SIZE + self._capacity * _RECORD.size)
+
+    def _close(self):
+        """ Release the map and cut the unused part of the file. """
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.truncate(_HEADER_SIZE + self._count * _RECORD.size)
+            self._file.close()
+            self._file = None
+
+
+def _read_header(file, path):
+    """ Check the header of an event log file and get the number of valid records. """
+    file.seek(0)
+    magic, version, header_size, record_size, count = _HEADER.unpack(file.read(_HEADER.size))
+    if magic != _MAGIC or header_size != _HEADER_SIZE or record_size != _RECORD.size:
+        raise IOError('{0} is not an event log file of version {1:d}.'.format(path, _VERSION))
+    return count
+
+
+def load_events(directory, day=None):
+    """ Load all events of a day.
+
+    @param str directory: event log directory
+    @param datetime.date day: day of the events, today if None
+
+    @return numpy.ndarray: structured array with EVENT_DTYPE, empty if there is no file.
+                           Use EVENT_NAMES to translate the 'event' field.
+    """
+    if day is None:
+        day = datetime.date.today()
+    path = event_log_filename(directory, day)
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=EVENT_DTYPE)
+    with open(path, 'rb') as file:
+        count = _read_header(file, path)
+        file.seek(_HEADER_SIZE)
+        return np.fromfile(file, dtype=EVENT_DTYPE, count=count)
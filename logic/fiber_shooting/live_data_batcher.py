@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the batching of the live control loop data for the GUI.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import threading
+import time
+
+from core.util.ring_buffer import RingBuffer
+
+
+class LiveDataBatcher:
+    """ Collects the samples of the control loop and hands them out in batches at a bounded rate.
+
+    The producer add()s samples and asks due() whether a batch should be sent. due() answers
+    True at most max_rate times per second and only when no batch is in flight: the flag is set
+    by due() and cleared by take(), which is called when the batch is actually sent. A consumer
+    that falls behind therefore gets one larger batch instead of a queue of small ones. The
+    pending samples are bounded, the oldest are dropped (and counted) if nobody takes them.
+    """
+
+    def __init__(self, dtype, max_rate=20., capacity=65536, clock=time.perf_counter):
+        """
+        @param numpy.dtype dtype: record type of a sample
+        @param float max_rate: maximum number of batches per second
+        @param int capacity: maximum number of pending samples
+        @param callable clock: monotonic clock (s)
+        """
+        self.max_rate = max_rate
+        self._pending = RingBuffer(capacity, dtype)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_batch = -float('inf')
+        self.in_flight = False
+        self.dropped = 0
+
+    def add(self, *values):
+        """ Add one sample, values in the order of the fields of the dtype. """
+        with self._lock:
+            self._pending.append(values)
+
+    def due(self, force=False):
+        """ Whether a batch should be sent now. If so, the batch is in flight until take().
+
+        @param bool force: ignore the rate limit (e.g. for the last samples of a run)
+
+        @return bool: True if the caller has to send a batch
+        """
+        with self._lock:
+            if self.in_flight or len(self._pending) == 0:
+                return False
+            now = self._clock()
+            if not force and now - self._last_batch < 1. / self.max_rate:
+                return False
+            self._last_batch = now
+            self.in_flight = True
+            return True
+
+    def take(self):
+        """ All pending samples, which are removed, and clear the in-flight flag.
+
+        @return numpy.ndarray: the samples in chronological order
+        """
+        with self._lock:
+            batch = self._pending.get()
+            self.dropped += self._pending.total - len(batch)
+            self._pending.clear()
+            self.in_flight = False
+            return batch
+
+    def clear(self):
+        """ Forget the pending samples. """
+        with self._lock:
+            self._pending.clear()
+            self.in_flight = False
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the bounded multi-resolution history of the fiber shooting control loop.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import math
+import threading
+
+import numpy as np
+
+from core.util.ring_buffer import RingBuffer
+
+
+class MultiResolutionHistory:
+    """ Time series store with the raw samples of the last minutes and min/mean/max aggregates
+    at coarser levels (by default 1 s, 10 s and 1 min), all in fixed capacity ring buffers, so
+    the memory is bounded however long the session runs.
+
+    The aggregates are maintained incrementally: a sample only updates the open bin of the
+    finest level. When a bin closes it is stored and merged into the open bin of the next level,
+    so every level costs O(1) per bin of the level below and nothing is ever rescanned.
+
+    get() picks the finest resolution that covers the requested time range with at most
+    max_points points, so a plot can zoom from hours to single samples.
+    """
+
+    def __init__(self, fields, raw_capacity=65536, levels=((1., 21600), (10., 17280),
+                                                           (60., 10080))):
+        """
+        @param tuple fields: names of the recorded values
+        @param int raw_capacity: number of raw samples kept
+        @param tuple levels: (bin width (s), number of bins kept) per aggregation level, the
+                             widths increasing and every width a multiple of the previous one
+        """
+        self.fields = tuple(fields)
+        widths = [float(width) for width, _ in levels]
+        for finer, coarser in zip(widths, widths[1:]):
+            ratio = coarser / finer
+            if ratio < 1 or abs(ratio - round(ratio)) > 1e-9:
+                raise ValueError('The bin width of every level must be a multiple of the bin '
+                                 'width of the level below, got {0}.'.format(widths))
+        self.widths = tuple(widths)
+        self.raw = RingBuffer(raw_capacity, [('time', '<f8')]
+                              + [(name, '<f8') for name in self.fields])
+        level_dtype = [('time', '<f8'), ('count', '<u4')]
+        for name in self.fields:
+            level_dtype += [(name + '_min', '<f8'), (name + '_mean', '<f8'),
+                            (name + '_max', '<f8')]
+        self.level_dtype = np.dtype(level_dtype)
+        self.levels = tuple(RingBuffer(bins, self.level_dtype) for _, bins in levels)
+        self._lock = threading.Lock()
+        self._open = [None] * len(self.levels)
+
+    @property
+    def nbytes(self):
+        """ Memory of the buffers (bytes), independent of the session length. """
+        return (self.raw.capacity * self.raw.dtype.itemsize
+                + sum(level.capacity * self.level_dtype.itemsize for level in self.levels))
+
+    def clear(self):
+        """ Forget all samples and aggregates. """
+        with self._lock:
+            self.raw.clear()
+            for level in self.levels:
+                level.clear()
+            self._open = [None] * len(self.levels)
+
+    def append(self, time, *values):
+        """ Add one sample, values in the order of the fields.
+
+        @param float time: time of the sample (s), increasing
+        """
+        with self._lock:
+            self.raw.append((time,) + values)
+            if self.levels:
+                values = np.array(values, dtype=float)
+                self._add(0, time, 1, values, values, values)
+
+    def _add(self, index, time, count, minimum, total, maximum):
+        """ Merge count samples (or a closed bin) into the open bin of the level index. """
+        bin_time = math.floor(time / self.widths[index]) * self.widths[index]
+        current = self._open[index]
+        if current is not None and current[0] != bin_time:
+            self._close(index)
+            current = None
+        if current is None:
+            self._open[index] = [bin_time, count, minimum.copy(), total.copy(), maximum.copy()]
+        else:
+            current[1] += count
+            np.minimum(current[2], minimum, out=current[2])
+            current[3] += total
+            np.maximum(current[4], maximum, out=current[4])
+
+    def _close(self, index):
+        """ Store the open bin of the level index and pass it on to the next level. """
+        bin_time, count, minimum, total, maximum = self._open[index]
+        self.levels[index].append(self._record(bin_time, count, minimum, total, maximum))
+        self._open[index] = None
+        if index + 1 < len(self.levels):
+            self._add(index + 1, bin_time, count, minimum, total, maximum)
+
+    def _record(self, bin_time, count, minimum, total, maximum):
+        """ Level record of a bin. """
+        stats = np.empty((len(self.fields), 3))
+        stats[:, 0] = minimum
+        stats[:, 1] = total / count
+        stats[:, 2] = maximum
+        return (bin_time, count) + tuple(stats.ravel())
+
+    def _open_record(self, index):
+        """ Open bin of the level index merged with the open bins of the finer levels, which
+        are not yet part of it. None if there is no open bin. """
+        merged = None
+        for current in self._open[:index + 1]:
+            if current is None:
+                continue
+            if merged is None:
+                merged = [current[0], current[1], current[2].copy(), current[3].copy(),
+                          current[4].copy()]
+            else:
+                merged[1] += current[1]
+                np.minimum(merged[2], current[2], out=merged[2])
+                merged[3] += current[3]
+                np.maximum(merged[4], current[4], out=merged[4])
+        if merged is None:
+            return None
+        merged[0] = math.floor(merged[0] / self.widths[index]) * self.widths[index]
+        return np.array([self._record(*merged)], dtype=self.level_dtype)
+
+    def get_raw(self, start=None, stop=None):
+        """ Raw samples with start <= time < stop (None for no limit).
+
+        @return numpy.ndarray: structured array with the fields 'time' and the recorded values
+        """
+        return self.raw.get_range(start, stop, 'time')
+
+    def get_level(self, index, start=None, stop=None, include_open=True):
+        """ Aggregates of the level index with start <= bin time < stop (None for no limit).
+
+        @param bool include_open: append the bin that is still being filled
+
+        @return numpy.ndarray: structured array with the fields 'time' (start of the bin),
+                               'count' and <field>_min, <field>_mean, <field>_max
+        """
+        with self._lock:
+            data = self.levels[index].get_range(start, stop, 'time')
+            current = self._open_record(index) if include_open else None
+        if current is not None and (stop is None or current['time'][0] < stop):
+            data = np.concatenate((data, current))
+        return data
+
+    @staticmethod
+    def _first_time(buffer):
+        """ Time of the oldest record of a ring buffer, inf if it is empty. """
+        oldest = buffer.oldest()
+        return math.inf if oldest is None else oldest['time']
+
+    def _covers(self, buffer, start):
+        """ Whether a ring buffer still holds the data from start on. """
+        return buffer.total == len(buffer) or self._first_time(buffer) <= start
+
+    def get(self, start=None, stop=None, max_points=2000):
+        """ The time range at the finest resolution with at most about max_points points that
+        still covers the start of the range. If no level reaches back to start, the coarsest
+        level is used.
+
+        @param float start: start time (s), None for the oldest data
+        @param float stop: end time (s), None for the newest data
+        @param int max_points: maximum number of points
+
+        @return dict: 'resolution' (bin width in s, 0 for raw samples), 'time' and for every
+                      field <field>_min, <field>_mean and <field>_max (all equal for raw samples)
+        """
+        latest = self.raw.latest()
+        if latest is None:
+            return None
+        stop_time = latest['time'] if stop is None else stop
+        raw_start = self._first_time(self.raw)
+        if start is None:
+            level_starts = [self._first_time(level) for level in self.levels]
+            start = min([raw_start] + level_starts)
+        span = max(stop_time - start, 0.)
+
+        # Raw samples, if they reach back to start and are not too many
+        if self._covers(self.raw, start) and len(self.raw) > 1:
+            sample_time = (latest['time'] - raw_start) / (len(self.raw) - 1)
+            if sample_time > 0 and span / sample_time <= max_points:
+                data = self.get_raw(start, stop)
+                result = {'resolution': 0., 'time': data['time']}
+                for name in self.fields:
+                    result[name + '_min'] = result[name + '_mean'] = result[name + '_max'] = \
+                        data[name]
+                return result
+
+        for index, width in enumerate(self.widths):
+            coarsest = index == len(self.widths) - 1
+            covered = self._covers(self.levels[index], start)
+            if coarsest or covered and span / width <= max_points:
+                data = self.get_level(index, math.floor(start / width) * width, stop)
+                result = {'resolution': width, 'time': data['time']}
+                for name in data.dtype.names[2:]:
+                    result[name] = data[name]
+                return result
+        return None
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the relay feedback autotuning of the fiber shooting PID.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import time
+
+import numpy as np
+
+# Tuning rules from the ultimate gain Ku and period Pu: (Kp / Ku, Ti / Pu, Td / Pu).
+# Ki = Kp / Ti and Kd = Kp * Td.
+TUNING_RULES = {'ziegler_nichols': (0.6, 1 / 2, 1 / 8),
+                'pi_ziegler_nichols': (0.45, 1 / 1.2, 0.),
+                'tyreus_luyben': (1 / 2.2, 2.2, 1 / 6.3),
+                'pessen': (0.7, 1 / 2.5, 0.15),
+                'some_overshoot': (1 / 3, 1 / 2, 1 / 3),
+                'no_overshoot': (0.2, 1 / 2, 1 / 3)}
+
+
+def run_relay_experiment(set_output, read_process, setpoint, center, amplitude, hysteresis=0.,
+                         cycles=8, sample_time=0.01, timeout=30., abort=None, polarity=1,
+                         clock=time.perf_counter, sleep=time.sleep):
+    """ Relay feedback experiment (Astrom-Hagglund).
+
+    The output switches between center + amplitude and center - amplitude whenever the process
+    value crosses the setpoint (with hysteresis), which makes the loop oscillate at its ultimate
+    period.
+
+    @param callable set_output: sets the controller output (duty cycle)
+    @param callable read_process: returns the process value (power, W)
+    @param float setpoint: process value the relay switches around
+    @param float center: output in the middle of the relay, e.g. the feedforward duty cycle
+    @param float amplitude: relay amplitude (output units)
+    @param float hysteresis: relay hysteresis (process units), larger than the noise
+    @param int cycles: number of oscillation periods to record
+    @param float sample_time: minimum time between two samples (s)
+    @param float timeout: maximum duration of the experiment (s)
+    @param callable abort: optional, returns True to stop the experiment
+    @param int polarity: 1 if the process value increases with the output, -1 otherwise
+    @param callable clock: monotonic clock (s)
+    @param callable sleep: sleep function, e.g. of a simulated clock for a headless test
+
+    @return (array, array, array): time (s), process value and output of every sample
+    """
+    times, values, outputs = [], [], []
+    high = True
+    set_output(center + amplitude)
+    start = clock()
+    switches = 0
+    while switches < 2 * cycles + 1:
+        now = clock()
+        value = read_process()
+        times.append(now - start)
+        values.append(value)
+        outputs.append(center + amplitude if high else center - amplitude)
+        error = polarity * (setpoint - value)
+        if high and error < -hysteresis:
+            high = False
+            switches += 1
+            set_output(center - amplitude)
+        elif not high and error > hysteresis:
+            high = True
+            switches += 1
+            set_output(center + amplitude)
+        if now - start > timeout or (abort is not None and abort()):
+            break
+        remaining = sample_time - (clock() - now)
+        if remaining > 0:
+            sleep(remaining)
+    return np.array(times), np.array(values), np.array(outputs)
+
+
+def analyze_relay_response(times, values, outputs, amplitude, hysteresis=0., skip_cycles=2):
+    """ Ultimate gain and period from a relay experiment.
+
+    The first skip_cycles periods are discarded as transient. Ku = 4 d / (pi sqrt(a^2 - e^2))
+    with relay amplitude d, oscillation amplitude a and hysteresis e.
+
+    @return dict: 'ultimate_gain', 'ultimate_period', 'oscillation_amplitude', 'periods' (number
+                  of analyzed periods) and 'period_std'; None if fewer than 2 periods were found
+    """
+    rising = np.flatnonzero(np.diff(outputs) > 0) + 1
+    switch_times = times[rising]
+    if len(switch_times) < skip_cycles + 3:
+        return None
+    switch_times = switch_times[skip_cycles:]
+    periods = np.diff(switch_times)
+    window = (times >= switch_times[0]) & (times < switch_times[-1])
+    oscillation_amplitude = (values[window].max() - values[window].min()) / 2
+    if oscillation_amplitude <= hysteresis:
+        return None
+    ultimate_gain = 4 * amplitude / (np.pi * np.sqrt(oscillation_amplitude ** 2 - hysteresis ** 2))
+    return {'ultimate_gain': ultimate_gain,
+            'ultimate_period': periods.mean(),
+            'oscillation_amplitude': oscillation_amplitude,
+            'periods': len(periods),
+            'period_std': periods.std()}
+
+
+def compute_gains(ultimate_gain, ultimate_period, rule='ziegler_nichols'):
+    """ PID gains from the ultimate gain and period.
+
+    @param float ultimate_gain: Ku
+    @param float ultimate_period: Pu (s)
+    @param str rule: one of TUNING_RULES
+
+    @return (float, float, float): kp, ki (1/s), kd (s) of the parallel form
+                                   kp e + ki int(e) + kd de/dt
+    """
+    if rule not in TUNING_RULES:
+        raise ValueError('Unknown tuning rule "{0}", use one of {1}.'.format(
+            rule, sorted(TUNING_RULES)))
+    kp_factor, ti_factor, td_factor = TUNING_RULES[rule]
+    kp = kp_factor * ultimate_gain
+    ki = kp / (ti_factor * ultimate_period)
+    kd = kp * td_factor * ultimate_period
+    return kp, ki, kd
+
+
+def autotune(set_output, read_process, setpoint, center, amplitude, hysteresis=0., cycles=8,
+             rule='ziegler_nichols', **experiment_options):
+    """ Run the relay experiment and compute the gains of all rules.
+
+    @param experiment_options: further keyword arguments of run_relay_experiment()
+
+    @return dict: result of analyze_relay_response() plus 'rule', 'kp', 'ki', 'kd' of the
+                  selected rule, 'gains' (rule -> (kp, ki, kd)) and 'data' (times, values,
+                  outputs); None if no oscillation was found
+    """
+    if rule not in TUNING_RULES:
+        raise ValueError('Unknown tuning rule "{0}", use one of {1}.'.format(
+            rule, sorted(TUNING_RULES)))
+    data = run_relay_experiment(set_output, read_process, setpoint, center, amplitude,
+                                hysteresis=hysteresis, cycles=cycles, **experiment_options)
+    result = analyze_relay_response(*data, amplitude=amplitude, hysteresis=hysteresis)
+    if result is None:
+        return None
+    result['gains'] = {name: compute_gains(result['ultimate_gain'], result['ultimate_period'], name)
+                       for name in TUNING_RULES}
+    result['rule'] = rule
+    result['kp'], result['ki'], result['kd'] = result['gains'][rule]
+    result['data'] = data
+    return result
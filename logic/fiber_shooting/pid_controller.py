@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the PID controller of the fiber shooting logic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import math
+
+
+class PIDController:
+    """ Discrete PID controller in parallel form with feedforward:
+
+        output = feedforward + polarity * (kp * e + i + kd * d)
+
+    with error e = setpoint - measurement, the integral term i (in output units, so changing ki
+    does not make the output jump) and d the filtered derivative of -measurement.
+
+    - Anti-windup: with 'back_calculation' the integral term is pulled back by
+      (limited output - unlimited output) / tracking_time, with 'conditional' the error is not
+      integrated while the output is saturated and the error drives it further into saturation.
+    - The derivative acts on the measurement, so setpoint steps do not kick the output. It is
+      low-pass filtered with the time constant derivative_filter.
+    - The output is clamped to [output_min, output_max] and its change is limited to rate_limit
+      per second (None for no limit).
+    - Bumpless manual/auto transfer: in manual mode (update() with manual_output) the integral
+      term tracks the manual output, so the first automatic output continues from it.
+    """
+
+    anti_windup_modes = ('back_calculation', 'conditional')
+
+    def __init__(self, kp=0.1, ki=0.5, kd=0., output_min=0., output_max=1., polarity=1,
+                 derivative_filter=0.02, rate_limit=None, anti_windup='back_calculation',
+                 tracking_time=None):
+        """
+        @param float kp: proportional gain (output units per measurement unit)
+        @param float ki: integral gain (1/s)
+        @param float kd: derivative gain (s)
+        @param float output_min: lower output limit
+        @param float output_max: upper output limit
+        @param int polarity: 1 if the measurement increases with the output, -1 otherwise
+        @param float derivative_filter: time constant (s) of the derivative filter, 0 for none
+        @param float rate_limit: maximum output change per second, None for no limit
+        @param str anti_windup: 'back_calculation' or 'conditional'
+        @param float tracking_time: time constant (s) of the back-calculation, by default
+                                    sqrt(Ti * Td) or Ti = kp / ki without derivative term
+        """
+        if anti_windup not in self.anti_windup_modes:
+            raise ValueError('Unknown anti-windup mode "{0}", use one of {1}.'.format(
+                anti_windup, self.anti_windup_modes))
+        self.kp, self.ki, self.kd = kp, ki, kd
+        self.output_min, self.output_max = output_min, output_max
+        self.polarity = polarity
+        self.derivative_filter = derivative_filter
+        self.rate_limit = rate_limit
+        self.anti_windup = anti_windup
+        self.tracking_time = tracking_time
+        self.reset()
+
+    def reset(self, output=0.):
+        """ Clear the integral and derivative state and set the last output. """
+        self.integral = 0.
+        self.derivative = 0.
+        self.output = output
+        self.error = 0.
+        self.p_term = self.i_term = self.d_term = 0.
+        self.saturated = False
+        self._last_measurement = None
+
+    def clear_integral(self):
+        """ Clear the integral term. """
+        self.integral = 0.
+
+    def get_tracking_time(self):
+        """ Time constant (s) of the back-calculation anti-windup. """
+        if self.tracking_time is not None:
+            return self.tracking_time
+        if self.ki <= 0:
+            return math.inf
+        ti = self.kp / self.ki if self.kp > 0 else 1. / self.ki
+        if self.kd > 0 and self.kp > 0:
+            return math.sqrt(ti * self.kd / self.kp)
+        return ti
+
+    def update(self, setpoint, measurement, dt, feedforward=0., manual_output=None):
+        """ Compute the output of one control cycle.
+
+        @param float setpoint: setpoint
+        @param float measurement: measured process value
+        @param float dt: time since the last update (s)
+        @param float feedforward: feedforward term added to the output
+        @param float manual_output: output in manual mode; the controller only tracks it
+
+        @return float: output
+        """
+        error = setpoint - measurement
+        self.error = error
+        # Derivative of -measurement, low-pass filtered
+        if self._last_measurement is not None and dt > 0:
+            raw = -(measurement - self._last_measurement) / dt
+            alpha = dt / (self.derivative_filter + dt) if self.derivative_filter > 0 else 1.
+            self.derivative += alpha * (raw - self.derivative)
+        self._last_measurement = measurement
+        self.p_term = self.kp * error
+        self.d_term = self.kd * self.derivative
+
+        if manual_output is not None:
+            # Bumpless transfer: the integral term takes the value that reproduces the output
+            self.integral = self.polarity * (manual_output - feedforward) - self.p_term - self.d_term
+            self.i_term = self.integral
+            self.output = manual_output
+            self.saturated = False
+            return self.output
+
+        unlimited = feedforward + self.polarity * (self.p_term + self.integral + self.d_term)
+        output = min(max(unlimited, self.output_min), self.output_max)
+        if self.rate_limit is not None and dt > 0:
+            max_step = self.rate_limit * dt
+            output = min(max(output, self.output - max_step), self.output + max_step)
+        self.saturated = output != unlimited
+
+        if self.ki > 0:
+            if self.anti_windup == 'conditional':
+                # Direction in which the error moves the output
+                push = self.polarity * error
+                if not (self.saturated and push * (unlimited - output) > 0):
+                    self.integral += self.ki * error * dt
+            else:
+                back = min(dt / self.get_tracking_time(), 1.)
+                self.integral += self.ki * error * dt + self.polarity * (output - unlimited) * back
+        self.i_term = self.integral
+        self.output = output
+        return output
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the duty cycle to power calibration of the fiber shooting logic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import time
+
+import numpy as np
+
+
+class PowerCalibration:
+    """ Steady-state duty cycle to power table of the laser.
+
+    The inverse of the table gives the duty cycle that produces a requested power, which the PID
+    uses as feedforward term, so it only has to correct the model error instead of integrating
+    its way to the setpoint.
+    """
+
+    def __init__(self, duty_cycles, powers, std=None, timestamp=None):
+        """
+        @param array duty_cycles: duty cycles of the sweep, increasing
+        @param array powers: steady-state power (W) for every duty cycle
+        @param array std: standard deviation of the power readings (W), optional
+        @param float timestamp: time of the calibration (time.time()), now if None
+        """
+        self.duty_cycles = np.asarray(duty_cycles, dtype=float)
+        self.powers = np.asarray(powers, dtype=float)
+        self.std = np.zeros_like(self.powers) if std is None else np.asarray(std, dtype=float)
+        self.timestamp = time.time() if timestamp is None else timestamp
+        # np.interp needs increasing x values: noise near the lasing threshold can make the
+        # measured power decrease slightly, so the inverse uses the running maximum
+        self._monotonic_powers = np.maximum.accumulate(self.powers)
+
+    def power(self, duty_cycle):
+        """ Steady-state power (W) for a duty cycle (scalar or array). """
+        return np.interp(duty_cycle, self.duty_cycles, self.powers)
+
+    def feedforward(self, setpoint):
+        """ Duty cycle that gives a power setpoint (scalar or array of W). Setpoints outside the
+        calibrated range give the first or last duty cycle of the table.
+        """
+        return np.interp(setpoint, self._monotonic_powers, self.duty_cycles)
+
+    def save(self, path):
+        """ Store the table in a numpy .npz file. """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as file:
+            np.savez(file, duty_cycles=self.duty_cycles, powers=self.powers, std=self.std,
+                     timestamp=self.timestamp)
+
+    @classmethod
+    def load(cls, path):
+        """ Load a table stored with save().
+
+        @return PowerCalibration: the calibration, None if the file does not exist
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data['duty_cycles'], data['powers'], data['std'], float(data['timestamp']))
+
+
+def measure_steady_state(read_power, settle_window=1., settle_tolerance=0.01, resolution=1e-3,
+                         timeout=10., abort=None):
+    """ Read the power until it is steady.
+
+    The power is steady when the mean of the last half settle_window differs from the mean of
+    the half before by less than settle_tolerance (relative) or resolution (W).
+
+    @param callable read_power: returns one power reading (W)
+    @param float settle_window: duration (s) of the window compared for steady state
+    @param float settle_tolerance: relative tolerance of the steady state
+    @param float resolution: absolute tolerance (W), e.g. the noise level of the power meter
+    @param float timeout: maximum time (s) to wait for the steady state
+    @param callable abort: optional, returns True to stop waiting
+
+    @return (float, float, bool): mean and standard deviation (W) of the readings of the last half
+                                  window, and whether the steady state was reached
+    """
+    times, powers = [], []
+    start = time.perf_counter()
+    while True:
+        powers.append(read_power())
+        times.append(time.perf_counter())
+        now = times[-1]
+        if now - start >= settle_window:
+            t = np.asarray(times)
+            p = np.asarray(powers)
+            last = p[t >= now - settle_window / 2]
+            previous = p[(t >= now - settle_window) & (t < now - settle_window / 2)]
+            if len(previous) and len(last):
+                mean = last.mean()
+                if abs(mean - previous.mean()) <= max(settle_tolerance * abs(mean), resolution):
+                    return mean, last.std(), True
+        if now - start >= timeout or (abort is not None and abort()):
+            t = np.asarray(times)
+            last = np.asarray(powers)[t >= now - settle_window / 2]
+            return last.mean(), last.std(), False
+        # Keep the history bounded to the comparison window
+        while times and times[0] < now - settle_window:
+            del times[0]
+            del powers[0]
+
+
+def run_calibration_sweep(set_duty_cycle, read_power, duty_cycles, abort=None, progress=None,
+                          **steady_state_options):
+    """ Step the duty cycle through duty_cycles and record the steady-state power of every step.
+
+    @param callable set_duty_cycle: sets the laser duty cycle
+    @param callable read_power: returns one power reading (W)
+    @param array duty_cycles: duty cycles of the sweep, increasing
+    @param callable abort: optional, returns True to stop the sweep
+    @param callable progress: optional, called with (index, duty cycle, power, std, steady) after
+                              every step
+    @param steady_state_options: keyword arguments of measure_steady_state()
+
+    @return PowerCalibration: the calibration, None if the sweep was aborted
+    """
+    powers, stds = [], []
+    for index, duty_cycle in enumerate(duty_cycles):
+        set_duty_cycle(duty_cycle)
+        power, std, steady = measure_steady_state(read_power, abort=abort, **steady_state_options)
+        if abort is not None and abort():
+            return None
+        powers.append(power)
+        stds.append(std)
+        if progress is not None:
+            progress(index, duty_cycle, power, std, steady)
+    return PowerCalibration(duty_cycles, powers, stds)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the power stability analysis of a fiber shooting session: overlapping Allan
+deviation and Welch power spectral density of the measured power.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from core.util.units import get_ft_windows
+
+
+def resample_uniform(times, values, dt=None):
+    """ Resample irregularly sampled values (control loop jitter) to a uniform grid.
+
+    Gaps (e.g. while the laser was off) are bridged by linear interpolation, select a part of the
+    history without gaps to avoid this.
+
+    @param array times: sample times (s), increasing
+    @param array values: samples
+    @param float dt: sample time (s) of the grid, by default the median sample interval
+
+    @return (array, float): resampled values and their sample time (s)
+    """
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if dt is None:
+        dt = float(np.median(np.diff(times)))
+    grid = times[0] + dt * np.arange(int((times[-1] - times[0]) / dt) + 1)
+    return np.interp(grid, times, values), dt
+
+
+def allan_deviation(values, dt, taus=None, points=50):
+    """ Overlapping Allan deviation of uniformly sampled values.
+
+    The values are integrated once (x = dt * cumsum(values)), so the variance for an averaging
+    time tau = m * dt is a single vectorized pass over x:
+
+        AVAR(tau) = sum((x[i + 2m] - 2 x[i + m] + x[i])^2) / (2 tau^2 (N + 1 - 2m))
+
+    which is O(N) per tau instead of O(N * m) with explicit block averages.
+
+    @param array values: samples
+    @param float dt: sample time (s)
+    @param array taus: averaging times (s), rounded to multiples of dt. By default points
+                       logarithmically spaced values up to a third of the duration.
+    @param int points: number of default averaging times
+
+    @return dict: 'tau' (s), 'adev' (units of values), 'adev_relative' (fraction of the mean) and
+                  'count' (number of overlapping differences per tau)
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if taus is None:
+        m = np.unique(np.round(np.logspace(0, np.log10(max(n // 3, 1)), points)).astype(int))
+    else:
+        m = np.unique(np.maximum(np.round(np.asarray(taus) / dt), 1).astype(int))
+    m = m[(m >= 1) & (2 * m <= n)]
+    x = np.concatenate(([0.], dt * np.cumsum(values)))
+    adev = np.empty(len(m))
+    count = np.empty(len(m), dtype=int)
+    for k, mk in enumerate(m):
+        d = x[2 * mk:] - 2 * x[mk:-mk] + x[:-2 * mk]
+        tau = mk * dt
+        count[k] = len(d)
+        adev[k] = np.sqrt(np.dot(d, d) / (2 * tau * tau * len(d)))
+    mean = values.mean() if n else np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        relative = adev / abs(mean)
+    return {'tau': m * dt, 'adev': adev, 'adev_relative': relative, 'count': count}
+
+
+def welch_psd(values, dt, segment_length=None, window='hann', overlap=0.5):
+    """ One-sided power spectral density by Welch's method: the mean of the periodograms of
+    overlapping, mean-subtracted and windowed segments.
+
+    @param array values: samples
+    @param float dt: sample time (s)
+    @param int segment_length: samples per segment, by default the power of two that gives about
+                               eight segments (at least 16 samples)
+    @param str window: window of core.util.units.get_ft_windows()
+    @param float overlap: overlap of consecutive segments (fraction)
+
+    @return dict: 'frequency' (Hz), 'psd' (units of values squared per Hz) and 'segments'
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if segment_length is None:
+        segment_length = max(16, 2 ** int(np.log2(max(n // 4, 1))))
+    segment_length = min(segment_length, n)
+    step = max(int(segment_length * (1 - overlap)), 1)
+    segments = np.lib.stride_tricks.sliding_window_view(values, segment_length)[::step]
+    segments = segments - segments.mean(axis=1, keepdims=True)
+    win = get_ft_windows()[window]['func'](segment_length)
+    spectrum = np.fft.rfft(segments * win, axis=1)
+    psd = (spectrum.real ** 2 + spectrum.imag ** 2).mean(axis=0) * dt / np.dot(win, win)
+    # One-sided: the power of the negative frequencies is added, except at DC and Nyquist
+    psd[1:-1 if segment_length % 2 == 0 else None] *= 2
+    return {'frequency': np.fft.rfftfreq(segment_length, dt), 'psd': psd,
+            'segments': len(segments)}
+
+
+def plot_stability(allan, psd, title=''):
+    """ Figure with the Allan deviation and the power spectral density.
+
+    A matplotlib Figure without pyplot, so it can be created on a worker thread.
+
+    @param dict allan: output of allan_deviation()
+    @param dict psd: output of welch_psd()
+    @param str title: figure title
+
+    @return matplotlib.figure.Figure: the figure
+    """
+    fig = Figure(figsize=(12, 5))
+    ax_allan, ax_psd = fig.subplots(1, 2)
+    ax_allan.loglog(allan['tau'], allan['adev_relative'], 'o-', markersize=3)
+    ax_allan.set_xlabel('Averaging time (s)')
+    ax_allan.set_ylabel('Relative Allan deviation')
+    ax_allan.grid(True, which='both', alpha=0.3)
+    ax_psd.loglog(psd['frequency'][1:], psd['psd'][1:])
+    ax_psd.set_xlabel('Frequency (Hz)')
+    ax_psd.set_ylabel('Power spectral density (W$^2$/Hz)')
+    ax_psd.grid(True, which='both', alpha=0.3)
+    if title:
+        fig.suptitle(title)
+    fig.tight_layout()
+    return fig
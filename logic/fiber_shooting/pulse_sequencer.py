@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the pulse-train sequencer of the fiber shooting logic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import threading
+import time
+
+
+class PulseSequencer:
+    """ Runs a list of steps on a dedicated timing thread.
+
+    A step is a dictionary with the optional keys
+
+        'duty_cycle': laser duty cycle (0..1) to set at the beginning of the step
+        'frequency': laser PWM frequency (Hz) to set at the beginning of the step
+        'setpoint': power setpoint (W) to set at the beginning of the step
+        'shutter_duration': shutter open time (ms), 0 for no shot
+        'delay': time (s) from the beginning of this step to the beginning of the next one
+
+    Example of three 10 ms shots, 0.5 s apart, at increasing duty cycle:
+
+        [{'duty_cycle': 0.1, 'shutter_duration': 10, 'delay': 0.5},
+         {'duty_cycle': 0.2, 'shutter_duration': 10, 'delay': 0.5},
+         {'duty_cycle': 0.3, 'shutter_duration': 10, 'delay': 0.5}]
+
+    The start time of every step is scheduled relative to the start of the sequence, so timing
+    errors do not accumulate. The thread sleeps until shortly before the target time and
+    busy-waits (time.perf_counter) for the rest, which gives sub-millisecond accuracy where
+    time.sleep alone is off by up to one scheduler tick.
+    """
+
+    step_keys = ('duty_cycle', 'frequency', 'setpoint', 'shutter_duration', 'delay')
+
+    def __init__(self, execute_step, spin_time=1e-3, step_callback=None, finished_callback=None):
+        """
+        @param callable execute_step: called with the step dictionary at the step start time
+        @param float spin_time: the last part of every wait (s) that is busy-waited
+        @param callable step_callback: optional, called with the record of every executed step
+        @param callable finished_callback: optional, called with the list of all records when the
+                                           sequence is finished or stopped
+        """
+        self.execute_step = execute_step
+        self.spin_time = spin_time
+        self.step_callback = step_callback
+        self.finished_callback = finished_callback
+        self.records = []
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @classmethod
+    def check_steps(cls, steps):
+        """ Validate the steps and fill in defaults.
+
+        @param list steps: list of step dictionaries
+
+        @return list: list of complete step dictionaries
+        """
+        checked = []
+        for index, step in enumerate(steps):
+            unknown = set(step) - set(cls.step_keys)
+            if unknown:
+                raise ValueError('Step {0:d} has unknown keys {1}.'.format(index, sorted(unknown)))
+            full_step = {'duty_cycle': None, 'frequency': None, 'setpoint': None,
+                         'shutter_duration': 0, 'delay': 0.}
+            full_step.update(step)
+            if full_step['delay'] < 0 or full_step['shutter_duration'] < 0:
+                raise ValueError('Step {0:d} has a negative delay or shutter duration.'
+                                 ''.format(index))
+            checked.append(full_step)
+        return checked
+
+    def is_running(self):
+        """ Whether a sequence is being executed. """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, steps, repetitions=1):
+        """ Start executing the steps on the timing thread.
+
+        @param list steps: list of step dictionaries (see class documentation)
+        @param int repetitions: number of times the whole list is executed
+        """
+        if self.is_running():
+            raise RuntimeError('A pulse sequence is already running.')
+        steps = self.check_steps(steps) * repetitions
+        self.records = []
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(steps,),
+                                        name='pulse-sequencer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """ Stop the sequence before the next step and wait for the thread to finish. """
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def wait_until(self, target):
+        """ Wait until time.perf_counter() reaches target.
+
+        @return bool: False if the wait was interrupted by stop()
+        """
+        remaining = target - time.perf_counter()
+        if remaining > self.spin_time:
+            if self._stop_event.wait(remaining - self.spin_time):
+                return False
+        while time.perf_counter() < target:
+            pass
+        return not self._stop_event.is_set()
+
+    def _run(self, steps):
+        """ Thread target: execute the steps at their scheduled times. """
+        start = time.perf_counter() + self.spin_time
+        target = start
+        try:
+            for index, step in enumerate(steps):
+                if not self.wait_until(target):
+                    break
+                actual = time.perf_counter()
+                self.execute_step(step)
+                record = dict(step)
+                record.update({'index': index,
+                               'target_time': target - start,
+                               'actual_time': actual - start,
+                               'timing_error': actual - target,
+                               'execution_time': time.perf_counter() - actual})
+                self.records.append(record)
+                if self.step_callback is not None:
+                    self.step_callback(record)
+                target += step['delay']
+        finally:
+            if self.finished_callback is not None:
+                self.finished_callback(self.records)
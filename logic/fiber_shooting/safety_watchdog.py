@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the laser safety watchdog of the fiber shooting logic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import threading
+import time
+
+
+class SafetyWatchdog:
+    """ Stops the laser when the control loop or the power meter stalls.
+
+    The watchdog runs on its own thread with its own timer, so it keeps working when the Qt event
+    loop or the power meter call blocks. While armed, it expects a fresh power reading at least
+    every power_timeout seconds (feed_power) and a control loop heartbeat at least every
+    heartbeat_timeout seconds (heartbeat). Otherwise it trips: stop_callback is called on the
+    watchdog thread (it should force the duty cycle to zero) and the watchdog stays tripped until
+    reset() is called, also when it is armed again.
+
+    The watchdog checks every deadline / 2 seconds, so the stop is requested at most about
+    deadline seconds after a timeout expired. The reaction latency (end of the stop callback
+    minus expiry of the timeout) is reported to report_callback.
+    """
+
+    def __init__(self, stop_callback, report_callback=None, power_timeout=0.5,
+                 heartbeat_timeout=0.5, deadline=0.02, clock=time.perf_counter):
+        """
+        @param callable stop_callback: called without arguments when the watchdog trips
+        @param callable report_callback: optional, called with a dictionary describing the trip
+                                         ('reason', 'expired_time', 'trip_time',
+                                         'reaction_latency', 'stop_duration', 'deadline_met')
+        @param float power_timeout: maximum age of the last power reading (s)
+        @param float heartbeat_timeout: maximum age of the last control loop heartbeat (s)
+        @param float deadline: maximum time (s) from the expiry of a timeout to the stop
+        @param callable clock: monotonic clock
+        """
+        self.stop_callback = stop_callback
+        self.report_callback = report_callback
+        self.power_timeout = power_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.deadline = deadline
+        self.clock = clock
+        self.armed = False
+        self.tripped = False
+        self.last_trip = None
+        self._last_power = 0.
+        self._last_heartbeat = 0.
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """ Start the watchdog thread (disarmed). """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='safety-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """ Stop the watchdog thread. """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def arm(self):
+        """ Start monitoring, with fresh time stamps. A previous trip stays latched. """
+        now = self.clock()
+        self._last_power = now
+        self._last_heartbeat = now
+        self.armed = True
+
+    def disarm(self):
+        """ Stop monitoring (the laser is off). """
+        self.armed = False
+
+    def reset(self):
+        """ Clear a trip and restart the timeouts. """
+        self.tripped = False
+        if self.armed:
+            self.arm()
+
+    def feed_power(self):
+        """ Report a fresh power reading. """
+        self._last_power = self.clock()
+
+    def heartbeat(self):
+        """ Report a finished control loop cycle. """
+        self._last_heartbeat = self.clock()
+
+    def check(self):
+        """ Check the timeouts once and trip if one expired.
+
+        @return bool: True if the watchdog tripped in this check
+        """
+        if not self.armed or self.tripped:
+            return False
+        now = self.clock()
+        expired = []
+        if now - self._last_power > self.power_timeout:
+            expired.append(('power reading', self._last_power + self.power_timeout))
+        if now - self._last_heartbeat > self.heartbeat_timeout:
+            expired.append(('control loop heartbeat', self._last_heartbeat + self.heartbeat_timeout))
+        if not expired:
+            return False
+        self.tripped = True
+        stop_start = self.clock()
+        self.stop_callback()
+        trip_time = self.clock()
+        expired_time = min(t for _, t in expired)
+        reaction_latency = trip_time - expired_time
+        self.last_trip = {'reason': ' and '.join(reason for reason, _ in expired),
+                          'expired_time': expired_time,
+                          'trip_time': trip_time,
+                          'reaction_latency': reaction_latency,
+                          'stop_duration': trip_time - stop_start,
+                          'deadline_met': reaction_latency <= self.deadline}
+        if self.report_callback is not None:
+            self.report_callback(dict(self.last_trip))
+        return True
+
+    def _run(self):
+        """ Thread target: check the timeouts periodically. """
+        while not self._stop_event.wait(self.deadline / 2):
+            self.check()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the control loop history of a fiber shooting session.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import threading
+
+import numpy as np
+
+# One record per control loop cycle
+HISTORY_DTYPE = np.dtype([('time', '<f8'),                # time.time() (s)
+                          ('power', '<f8'),               # measured power (W)
+                          ('duty_cycle', '<f8'),          # requested duty cycle
+                          ('setpoint', '<f8'),            # final setpoint (W)
+                          ('effective_setpoint', '<f8'),  # setpoint on the ramp (W)
+                          ('error', '<f8'),               # effective setpoint - power (W)
+                          ('p', '<f8'),                   # PID terms (duty cycle)
+                          ('i', '<f8'),
+                          ('d', '<f8'),
+                          ('pid', '<u1')])                # 1 if the PID was on
+
+
+class SessionHistory:
+    """ Record array of the control loop cycles of a session, bounded to max_records.
+
+    The records are stored in preallocated chunks of chunk_size records. append() writes into the
+    newest chunk and allocates a new one when it is full, nothing is ever copied on the control
+    loop. When more than max_records are stored, the oldest chunk is dropped, so the memory is
+    bounded however long the session runs.
+
+    The filled records of a chunk are never changed again. get() therefore only takes the list of
+    chunks under the lock and copies the records outside of it, so a long copy (e.g. for an
+    export) does not block append().
+    """
+
+    def __init__(self, dtype=HISTORY_DTYPE, max_records=2 ** 20, chunk_size=65536):
+        """
+        @param numpy.dtype dtype: record type
+        @param int max_records: number of records kept, the oldest are dropped in chunks
+                                (None for no limit)
+        @param int chunk_size: number of records per chunk
+        """
+        self.dtype = np.dtype(dtype)
+        # A chunk is never larger than the history, so that the bound holds for small limits
+        self.chunk_size = int(chunk_size if max_records is None
+                              else max(min(chunk_size, max_records), 1))
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        """ Memory of the allocated chunks (bytes). """
+        return len(self._chunks) * self.chunk_size * self.dtype.itemsize
+
+    def clear(self):
+        """ Forget all records. """
+        with self._lock:
+            self._chunks = [np.empty(self.chunk_size, dtype=self.dtype)]
+            self._last_count = 0    # records in the newest chunk
+            self._count = 0         # records in all chunks
+            self.dropped = 0        # records dropped since the last clear()
+
+    def append(self, *values):
+        """ Append one record, values in the order of the fields of the dtype. """
+        with self._lock:
+            if self._last_count == self.chunk_size:
+                self._chunks.append(np.empty(self.chunk_size, dtype=self.dtype))
+                self._last_count = 0
+                if (self.max_records is not None
+                        and self._count + 1 > self.max_records + self.chunk_size):
+                    self._chunks.pop(0)
+                    self._count -= self.chunk_size
+                    self.dropped += self.chunk_size
+            self._chunks[-1][self._last_count] = values
+            self._last_count += 1
+            self._count += 1
+
+    def get(self, start=0, stop=None):
+        """ Copy of the records start to stop (indices as for slicing, 0 is the oldest record
+        still kept).
+
+        @return numpy.ndarray: structured array
+        """
+        with self._lock:
+            chunks = list(self._chunks)
+            count = self._count
+        start, stop, _ = slice(start, stop).indices(count)
+        if stop <= start:
+            return np.zeros(0, dtype=self.dtype)
+        first, last = start // self.chunk_size, (stop - 1) // self.chunk_size
+        parts = chunks[first:last + 1]
+        parts[-1] = parts[-1][:stop - last * self.chunk_size]
+        parts[0] = parts[0][start - first * self.chunk_size:]
+        return np.concatenate(parts)
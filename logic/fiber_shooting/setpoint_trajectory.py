@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the setpoint trajectory generator of the fiber shooting logic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import threading
+
+import numpy as np
+
+# Program without segments: start times, end times, start values, end values, s-curve flags
+_EMPTY_PROGRAM = (np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool))
+
+
+class SetpointTrajectory:
+    """ Piecewise setpoint trajectory: ramps with limited slew rate and hold segments.
+
+    The control loop calls advance() once per cycle and uses the returned effective setpoint in
+    the PID error instead of the final setpoint, so a setpoint change does not enter the PID as
+    a step.
+
+    A program is a list of segments:
+
+        {'setpoint': 3., 'slew_rate': 0.5, 'profile': 's_curve'}   ramp to 3 W
+        {'hold': 2.}                                               keep the setpoint for 2 s
+
+    'slew_rate' (W/s) and 'profile' are optional and default to the values of the trajectory.
+    Profile 'linear' ramps at the slew rate. Profile 's_curve' follows a half cosine, which starts
+    and ends with zero slope; its maximum slope equals the slew rate, so it takes pi/2 times
+    longer than the linear ramp.
+
+    reset() and set_program() may be called from other threads than the control loop. The
+    segments are replaced as one tuple and the effective setpoint is updated under a lock, so
+    advance() never sees a half-replaced program.
+    """
+
+    profiles = ('linear', 's_curve')
+
+    def __init__(self, slew_rate=1., profile='linear'):
+        """
+        @param float slew_rate: default slew rate (W/s)
+        @param str profile: default profile, 'linear' or 's_curve'
+        """
+        self.slew_rate = slew_rate
+        self.profile = profile
+        self.value = 0.
+        # Segments as arrays (t0, t1, p0, p1, s_curve): start time, end time, start value, end
+        # value, s-curve flag. Only replaced as a whole.
+        self._program = _EMPTY_PROGRAM
+        self._lock = threading.Lock()
+
+    @property
+    def end_time(self):
+        """ End time of the last segment, None without program. """
+        t1 = self._program[1]
+        return t1[-1] if len(t1) else None
+
+    @property
+    def final_value(self):
+        """ Setpoint at the end of the program. """
+        with self._lock:
+            p1 = self._program[3]
+            return float(p1[-1]) if len(p1) else self.value
+
+    def reset(self, value):
+        """ Clear the program and set the effective setpoint to value. """
+        with self._lock:
+            self.value = value
+            self._program = _EMPTY_PROGRAM
+
+    def set_target(self, target, now, slew_rate=None, profile=None):
+        """ Ramp from the current effective setpoint to target, starting at now. """
+        self.set_program([{'setpoint': target, 'slew_rate': slew_rate, 'profile': profile}], now)
+
+    def set_program(self, segments, now):
+        """ Replace the program by segments, starting at now from the current effective setpoint.
+
+        @param list segments: list of segment dictionaries, see class documentation
+        @param float now: start time (s), same clock as advance()
+        """
+        with self._lock:
+            self._program = self._build_program(segments, now, self.value)
+
+    def _build_program(self, segments, now, value):
+        """ Segment arrays of a program starting at now from value.
+
+        @return tuple: (t0, t1, p0, p1, s_curve) arrays
+        """
+        t0, t1, p0, p1, s_curve = [], [], [], [], []
+        t, p = now, value
+        for index, segment in enumerate(segments):
+            if 'hold' in segment:
+                duration, target, is_s_curve = segment['hold'], p, False
+            elif 'setpoint' in segment:
+                target = segment['setpoint']
+                slew_rate = segment.get('slew_rate') or self.slew_rate
+                profile = segment.get('profile') or self.profile
+                if profile not in self.profiles or slew_rate <= 0:
+                    raise ValueError('Segment {0:d}: unknown profile "{1}" or slew rate {2} <= 0.'
+                                     ''.format(index, profile, slew_rate))
+                is_s_curve = profile == 's_curve'
+                duration = abs(target - p) / slew_rate * (np.pi / 2 if is_s_curve else 1.)
+            else:
+                raise ValueError('Segment {0:d} has neither "setpoint" nor "hold".'.format(index))
+            t0.append(t)
+            t1.append(t + duration)
+            p0.append(p)
+            p1.append(target)
+            s_curve.append(is_s_curve)
+            t, p = t + duration, target
+        return (np.array(t0), np.array(t1), np.array(p0), np.array(p1),
+                np.array(s_curve, dtype=bool))
+
+    def evaluate(self, times):
+        """ Effective setpoint at the given times (scalar or array) without advancing. """
+        return self._evaluate(self._program, self.value, times)
+
+    @staticmethod
+    def _evaluate(program, value, times):
+        """ Setpoint of program at times, value if the program is empty. """
+        times = np.asarray(times, dtype=float)
+        t0, t1, p0, p1, s_curve = program
+        if not len(t0):
+            return np.full(times.shape, value)
+        # Segment of every time; before the start the first, after the end the last segment
+        index = np.clip(np.searchsorted(t1, times, side='left'), 0, len(t1) - 1)
+        start, end = t0[index], t1[index]
+        span = np.where(end > start, end - start, 1.)
+        x = np.clip((times - start) / span, 0., 1.)
+        x = np.where(s_curve[index], (1. - np.cos(np.pi * x)) / 2., x)
+        return p0[index] + (p1[index] - p0[index]) * x
+
+    def advance(self, now):
+        """ Effective setpoint at now, to be called once per control cycle.
+
+        @return float: effective setpoint
+        """
+        with self._lock:
+            if len(self._program[0]):
+                self.value = float(self._evaluate(self._program, self.value, now))
+            return self.value
+
+    def is_finished(self, now):
+        """ Whether the program has reached its end at now. """
+        t1 = self._program[1]
+        return not len(t1) or now >= t1[-1]
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the step response identification of the fiber shooting control loop.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+METRIC_NAMES = ('rise_time', 'settling_time', 'overshoot', 'steady_state_error', 'gain',
+                'dead_time', 'time_constant', 'fit_rmse')
+
+
+def detect_steps(times, reference, min_step, min_duration=0.):
+    """ Find the steps of a reference signal (setpoint or open-loop duty cycle).
+
+    @param array times: sample times (s)
+    @param array reference: reference signal
+    @param float min_step: minimum change between two samples that counts as a step
+    @param float min_duration: minimum time (s) until the next step
+
+    @return (array, array): index of the first sample after every step and index of the end of
+                            its segment (next step or end of the data, exclusive)
+    """
+    starts = np.flatnonzero(np.abs(np.diff(reference)) >= min_step) + 1
+    ends = np.append(starts[1:], len(reference))
+    keep = times[ends - 1] - times[starts] >= min_duration
+    return starts[keep], ends[keep]
+
+
+def _fit_fopdt_grid(t, y, theta_grid, tau_grid):
+    """ Least squares fit of y = a + b (1 - exp(-(t - theta) / tau)) for t > theta, for all rows
+    at once. theta and tau are searched on a grid per row, a and b are solved in closed form for
+    every grid point.
+
+    @param array t: (steps, samples) times from the step (s)
+    @param array y: (steps, samples) response
+    @param array theta_grid: (steps, ct) dead times (s)
+    @param array tau_grid: (steps, cu) time constants (s)
+
+    @return (array, array, array, array, array): a, b, theta, tau and rms residual per row
+    """
+    theta = theta_grid[:, :, None, None]                            # (n, ct, 1, 1)
+    tau = tau_grid[:, None, :, None]                                # (n, 1, cu, 1)
+    tt = t[:, None, None, :]                                        # (n, 1, 1, m)
+    shape = np.where(tt > theta, -np.expm1(-(tt - theta) / tau), 0.)  # (n, ct, cu, m)
+    m = t.shape[1]
+    yy = y[:, None, None, :]
+    sx = shape.sum(axis=-1)
+    sxx = (shape * shape).sum(axis=-1)
+    sxy = (shape * yy).sum(axis=-1)
+    sy = y.sum(axis=-1)[:, None, None]
+    syy = (y * y).sum(axis=-1)[:, None, None]
+    den = m * sxx - sx * sx
+    with np.errstate(invalid='ignore', divide='ignore'):
+        b = np.where(den > 1e-12, (m * sxy - sx * sy) / den, 0.)
+    a = (sy - b * sx) / m
+    sse = syy - 2 * a * sy - 2 * b * sxy + m * a * a + 2 * a * b * sx + b * b * sxx
+    n = t.shape[0]
+    best = sse.reshape(n, -1).argmin(axis=1)
+    it, iu = np.unravel_index(best, sse.shape[1:])
+    rows = np.arange(n)
+    rmse = np.sqrt(np.maximum(sse[rows, it, iu], 0.) / m)
+    return (a[rows, it, iu], b[rows, it, iu], theta[rows, it, 0, 0], tau[rows, 0, iu, 0], rmse)
+
+
+def _fit_fopdt(t, y, n_theta, n_tau):
+    """ Coarse grid search relative to the duration of every row (dead time up to half, time
+    constant from 1/1000 to once the duration), then a finer grid around the best point.
+
+    @return (array, array, array, array, array): a, b, theta, tau and rms residual per row
+    """
+    duration = t[:, -1:]
+    theta_grid = duration * np.linspace(0, 0.5, n_theta)
+    tau_step = 3. / (n_tau - 1)
+    tau_grid = duration * np.logspace(-3, 0, n_tau)
+    _, _, theta, tau, _ = _fit_fopdt_grid(t, y, theta_grid, tau_grid)
+    theta_step = 0.5 * duration / (n_theta - 1)
+    theta_grid = np.maximum(theta[:, None] + theta_step * np.linspace(-1, 1, n_theta), 0.)
+    tau_grid = tau[:, None] * np.logspace(-tau_step, tau_step, n_tau)
+    return _fit_fopdt_grid(t, y, theta_grid, tau_grid)
+
+
+def analyze_steps(times, response, reference, min_step, closed_loop=True, max_duration=None,
+                  settling_band=0.02, samples=200, n_theta=25, n_tau=40, block=16):
+    """ Detect the steps of the reference and characterize the response to every step.
+
+    Every segment is resampled to a uniform grid of samples points and all segments are fitted
+    with a first-order-plus-dead-time model at once (vectorized over the steps, in blocks).
+
+    @param array times: sample times (s)
+    @param array response: measured response (power, W)
+    @param array reference: setpoint (closed loop) or duty cycle (open loop)
+    @param float min_step: minimum reference change that counts as a step
+    @param bool closed_loop: the response is expected to reach the reference (setpoint). In
+                             open loop, the metrics refer to the final value of the response.
+    @param float max_duration: maximum analyzed time (s) after a step, None for all
+    @param float settling_band: settling band, fraction of the step of the response
+    @param int samples: number of points of the resampled segments
+    @param int n_theta: size of the dead time grid
+    @param int n_tau: size of the time constant grid
+    @param int block: number of steps fitted at once (memory ~ block * n_theta * n_tau * samples)
+
+    @return dict: arrays with one entry per step: 'time' (s), 'initial', 'target', 'step'
+                  (reference change), 'rise_time' (10 % to 90 %, s), 'settling_time' (s, nan if
+                  not settled), 'overshoot' (fraction of the step), 'steady_state_error'
+                  (target - final response, nan in open loop), 'gain' (response change per
+                  reference change), 'dead_time' (s), 'time_constant' (s) and 'fit_rmse'
+    """
+    times = np.asarray(times, dtype=float)
+    response = np.asarray(response, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    starts, ends = detect_steps(times, reference, min_step)
+    n = len(starts)
+    result = {key: np.full(n, np.nan) for key in ('time', 'initial', 'target', 'step')
+              + METRIC_NAMES}
+    if n == 0:
+        return result
+
+    # Resample every segment to a uniform grid
+    t = np.empty((n, samples))
+    y = np.empty((n, samples))
+    for k, (start, end) in enumerate(zip(starts, ends)):
+        segment_t = times[start - 1:end] - times[start - 1]
+        duration = segment_t[-1] if max_duration is None else min(segment_t[-1], max_duration)
+        t[k] = np.linspace(0, duration, samples)
+        y[k] = np.interp(t[k], segment_t, response[start - 1:end])
+    initial = response[starts - 1]
+    step = reference[starts] - reference[starts - 1]
+    final = y[:, -max(samples // 10, 1):].mean(axis=1)
+    target = reference[starts] if closed_loop else final
+
+    # Step response metrics, relative to the change of the response
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = (y - initial[:, None]) / (target - initial)[:, None]
+    rows = np.arange(n)
+    reached_10 = x >= 0.1
+    reached_90 = x >= 0.9
+    rise = t[rows, reached_90.argmax(axis=1)] - t[rows, reached_10.argmax(axis=1)]
+    result['rise_time'] = np.where(reached_10.any(axis=1) & reached_90.any(axis=1), rise, np.nan)
+    result['overshoot'] = np.maximum(np.nanmax(x, axis=1) - 1., 0.)
+    outside = np.abs(x - 1.) > settling_band
+    last_outside = samples - 1 - outside[:, ::-1].argmax(axis=1)
+    settling = np.where(outside.any(axis=1), t[rows, np.minimum(last_outside + 1, samples - 1)], 0.)
+    result['settling_time'] = np.where(outside[:, -1], np.nan, settling)
+    result['steady_state_error'] = target - final if closed_loop else np.full(n, np.nan)
+
+    # First-order-plus-dead-time fit, vectorized over blocks of steps
+    for first in range(0, n, block):
+        rows = slice(first, first + block)
+        a, b, theta, tau, rmse = _fit_fopdt(t[rows], y[rows], n_theta, n_tau)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['gain'][rows] = b / step[rows]
+        result['dead_time'][rows] = theta
+        result['time_constant'][rows] = tau
+        result['fit_rmse'][rows] = rmse
+
+    result['time'] = times[starts]
+    result['initial'] = initial
+    result['target'] = target
+    result['step'] = step
+    return result
+
+
+def summarize_by_target(result, decimals=3):
+    """ Mean metrics of the steps to the same target.
+
+    @param dict result: output of analyze_steps()
+    @param int decimals: targets are compared after rounding to decimals
+
+    @return dict: rounded target -> dict with 'steps' (count) and the mean of every metric
+    """
+    summary = dict()
+    targets = np.round(result['target'], decimals)
+    for target in np.unique(targets):
+        selected = targets == target
+        entry = {'steps': int(selected.sum())}
+        for name in METRIC_NAMES:
+            values = result[name][selected]
+            entry[name] = np.nanmean(values) if np.isfinite(values).any() else np.nan
+        summary[float(target)] = entry
+    return summary
+
+
+def format_summary(summary):
+    """ Text table of summarize_by_target() for the log or the console. """
+    lines = ['{0:>9} {1:>5} {2:>9} {3:>9} {4:>9} {5:>10} {6:>9} {7:>9} {8:>9}'.format(
+        'target', 'steps', 'rise s', 'settle s', 'overshoot', 'ss error', 'gain', 'dead s',
+        'tau s')]
+    for target, entry in sorted(summary.items()):
+        lines.append('{0:9.3f} {1:5d} {2:9.3f} {3:9.3f} {4:8.1f}% {5:10.4f} {6:9.3f} {7:9.3f} '
+                     '{8:9.3f}'.format(target, entry['steps'], entry['rise_time'],
+                                       entry['settling_time'], 100 * entry['overshoot'],
+                                       entry['steady_state_error'], entry['gain'],
+                                       entry['dead_time'], entry['time_constant']))
+    return '\n'.join(lines)
@@ -17,14 +17,29 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this 12 and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import datetime
+import os
+import threading
 import time
 import numpy as np
 from qtpy import QtCore
 
 from core.module import Base
 from interface.empty_interface import EmptyInterface
-from core.module import Connector
+from core.module import Connector, ConfigOption
 from core.util.mutex import Mutex
+from logic.fiber_shooting.pulse_sequencer import PulseSequencer
+from logic.fiber_shooting import event_log
+from logic.fiber_shooting.safety_watchdog import SafetyWatchdog
+from logic.fiber_shooting.power_calibration import PowerCalibration, run_calibration_sweep
+from logic.fiber_shooting.setpoint_trajectory import SetpointTrajectory
+from logic.fiber_shooting.pid_autotune import TUNING_RULES, autotune
+from logic.fiber_shooting.pid_controller import PIDController
+from logic.fiber_shooting.session_history import SessionHistory
+from logic.fiber_shooting.multi_resolution_history import MultiResolutionHistory
+from logic.fiber_shooting.live_data_batcher import LiveDataBatcher
+from logic.fiber_shooting import step_response
+from logic.fiber_shooting import power_stability
 
 
 class FiberShootingLogic(Base, EmptyInterface):
@@ -39,9 +54,67 @@ class FiberShootingLogic(Base, EmptyInterface):
     TiS_camera_hardware = Connector(interface='EmptyInterface')
     arduino_hardware = Connector(interface='EmptyInterface')
     power_meter_hardware = Connector(interface='EmptyInterface')
-
-    sigPowerUpdated = QtCore.Signal()
+    savelogic = Connector(interface='SaveLogic')
+
+    # Pulse sequencer: the last part of every wait (s) is busy-waited for sub-ms timing
+    _sequencer_spin_time = ConfigOption('sequencer_spin_time', 1e-3)
+    # Directory of the daily binary event logs (pulses, duty cycle, shutters, PID, ...), by default
+    # FiberShooting/EventLog in the data directory of the SaveLogic. It is not a daily directory,
+    # the event log starts a new file at midnight.
+    _event_log_directory = ConfigOption('event_log_directory', None)
+    # Safety watchdog: maximum age (s) of the last power reading and of the last control loop
+    # cycle while the laser is on, and maximum reaction time (s) after a timeout expired
+    _watchdog_power_timeout = ConfigOption('watchdog_power_timeout', 0.5)
+    _watchdog_heartbeat_timeout = ConfigOption('watchdog_heartbeat_timeout', 0.5)
+    _watchdog_deadline = ConfigOption('watchdog_deadline', 0.05)
+    # Duty cycle to power calibration: cached table and steady-state detection of the sweep. A
+    # relative calibration_file is in the directory of the configuration file (in the data
+    # directory of the SaveLogic if there is no manager)
+    _calibration_file = ConfigOption('calibration_file', 'fiber_shooting_power_calibration.npz')
+    _calibration_settle_window = ConfigOption('calibration_settle_window', 1.)
+    _calibration_settle_tolerance = ConfigOption('calibration_settle_tolerance', 0.01)
+    _calibration_timeout = ConfigOption('calibration_timeout', 10.)
+    # Setpoint ramp: default slew rate (W/s) and profile ('linear' or 's_curve')
+    _ramp_slew_rate = ConfigOption('ramp_slew_rate', 1.)
+    _ramp_profile = ConfigOption('ramp_profile', 'linear')
+    # Relay autotuning: relay amplitude (duty cycle) and hysteresis (W, above the power noise)
+    _autotune_amplitude = ConfigOption('autotune_amplitude', 0.05)
+    _autotune_hysteresis = ConfigOption('autotune_hysteresis', 5e-3)
+    # PID: anti-windup ('back_calculation' or 'conditional'), time constant (s) of the derivative
+    # filter and maximum duty cycle change per second (0 for no limit)
+    _pid_anti_windup = ConfigOption('pid_anti_windup', 'back_calculation')
+    _pid_derivative_filter = ConfigOption('pid_derivative_filter', 0.02)
+    _pid_rate_limit = ConfigOption('pid_rate_limit', 0.)
+    # Number of control loop cycles kept in the full-resolution session history (about 3 h at
+    # 100 Hz, 77 MB), the oldest are dropped. Longer sessions are covered by the live history.
+    _session_history_samples = ConfigOption('session_history_samples', 2 ** 20)
+    # Bounded live history: number of raw samples and [bin width (s), number of bins] of the
+    # min/mean/max levels (about 11 min raw at 100 Hz, 6 h at 1 s, 2 days at 10 s, 1 week at 1 min)
+    _history_raw_samples = ConfigOption('history_raw_samples', 65536)
+    _history_levels = ConfigOption('history_levels', [[1, 21600], [10, 17280], [60, 10080]])
+    # Live data for the GUI: maximum number of batches per second and of pending samples
+    _live_data_rate = ConfigOption('live_data_rate', 20.)
+    _live_data_buffer = ConfigOption('live_data_buffer', 65536)
+
+    # Values of the multi-resolution live history
+    live_history_fields = ('power', 'duty_cycle', 'effective_setpoint', 'error', 'p', 'i', 'd')
+
+    # The kd of the GUI is in units of 10 ms (kd = 0.3 is a derivative time of 3 ms)
+    _kd_scale = 0.01
+
+    # Samples since the last batch: structured array with 'time' and the live_history_fields
+    sigLiveData = QtCore.Signal(object)
     sigPowerDataNext = QtCore.Signal()
+    _sigLiveDataDue = QtCore.Signal()
+    sigSequenceStepExecuted = QtCore.Signal(dict)
+    sigSequenceFinished = QtCore.Signal(list)
+    sigWatchdogTripped = QtCore.Signal(dict)
+    sigCalibrationProgress = QtCore.Signal(int, float, float)
+    sigCalibrationFinished = QtCore.Signal()
+    sigAutotuneFinished = QtCore.Signal(dict)
+    sigStabilityAnalysisFinished = QtCore.Signal(dict)
+    sigExportProgress = QtCore.Signal(float)
+    sigExportFinished = QtCore.Signal(str)
 
     def on_activate(self):
         """ Initialisation performed during activation of the module. """
@@ -62,20 +135,74 @@ class FiberShootingLogic(Base, EmptyInterface):
         self.polarity = 1
         self.kp, self.ki, self.kd = 0.1, 0.5, 0.3
         self.min_pid_out, self.max_pid_out = 0., 1.0
-        self.ramping_factor = 0.01
+        self.ramping_factor = self._ramp_slew_rate  # Slew rate (W/s) of the setpoint ramp
+        self.effective_setpoint = 0.
+        self._trajectory = SetpointTrajectory(self.ramping_factor, self._ramp_profile)
         self.offset = 0
-        self.error_p_prev = 0.
         self.duty_cycle_prev = 0.
-        self.error_p = 0
-        self.error_i = 0
-        self.error_d = 0
         self.output = 0
         self.time_loop = []
         self.power = None
         self.error = None
 
+        self._pid = PIDController(self.kp, self.ki, self.kd * self._kd_scale,
+                                  output_min=self.min_pid_out,
+                                  output_max=min(self.max_pid_out, self.max_safe_duty_cycle),
+                                  polarity=self.polarity,
+                                  derivative_filter=self._pid_derivative_filter,
+                                  rate_limit=self._pid_rate_limit or None,
+                                  anti_windup=self._pid_anti_windup)
+
+        # Control loop history of the session, bounded like the live history
+        self._history = SessionHistory(max_records=self._session_history_samples)
+        # Bounded multi-resolution history of the live values for the plots
+        self._live_history = MultiResolutionHistory(
+            self.live_history_fields, raw_capacity=self._history_raw_samples,
+            levels=self._history_levels)
+        # New samples are sent to the GUI in batches, see sigLiveData
+        self.live_data_dtype = self._live_history.raw.dtype
+        self._live_batcher = LiveDataBatcher(self.live_data_dtype, max_rate=self._live_data_rate,
+                                             capacity=self._live_data_buffer)
+        # Power stability analysis of the history (Allan deviation, PSD) on a worker thread
+        self._stability_thread = None
+        self.stability_result = None
+        # Export of the session history on a worker thread
+        self._export_thread = None
+
         # Thread
         self.threadlock = Mutex()
+        # Event log
+        self._save_logic = self.savelogic()
+        self._event_log_path = self._event_log_directory
+        if self._event_log_path is None:
+            self._event_log_path = os.path.join(self._save_logic.data_dir, 'FiberShooting',
+                                                'EventLog')
+        self._event_log = event_log.EventLog(self._event_log_path)
+        self._logged_duty_cycle = None
+        # Safety watchdog
+        self._watchdog = SafetyWatchdog(self._watchdog_stop, self._watchdog_tripped,
+                                        power_timeout=self._watchdog_power_timeout,
+                                        heartbeat_timeout=self._watchdog_heartbeat_timeout,
+                                        deadline=self._watchdog_deadline)
+        # Duty cycle to power calibration, used as feedforward term of the PID
+        self._calibration_path = self._calibration_file
+        if not os.path.isabs(self._calibration_path):
+            if self._manager is not None:
+                self._calibration_path = self._manager.configFileName(self._calibration_path)
+            else:
+                self._calibration_path = os.path.join(self._save_logic.data_dir,
+                                                      self._calibration_path)
+        self._calibration = PowerCalibration.load(self._calibration_path)
+        self.feedforward_status = self._calibration is not None
+        # Worker thread of the plant experiments (calibration sweep, PID autotuning)
+        self._experiment_thread = None
+        self._experiment_abort = threading.Event()
+        self.autotune_result = None
+        # Pulse sequencer
+        self._pulse_sequencer = PulseSequencer(self._execute_sequence_step,
+                                               spin_time=self._sequencer_spin_time,
+                                               step_callback=self._sequence_step_executed,
+                                               finished_callback=self._sequence_finished)
 
         self._TiS_camera_hardware = self.TiS_camera_hardware()
         self._arduino_hardware = self.arduino_hardware()
@@ -84,15 +211,31 @@ class FiberShootingLogic(Base, EmptyInterface):
             self.pm_connected = True
 
         self.sigPowerDataNext.connect(self.set_power, QtCore.Qt.QueuedConnection)
+        self._sigLiveDataDue.connect(self._send_live_data, QtCore.Qt.QueuedConnection)
+        self._watchdog.start()
         return
 
     def on_deactivate(self):
         """  Performed during deactivation of the module. """
-        self._TiS_camera_hardware.on_deactivate()
+        self._pulse_sequencer.stop(timeout=1)
+        self._stop_experiment()
+        for thread in (self._stability_thread, self._export_thread):
+            if thread is not None:
+                thread.join()
+        # Laser first, the camera must not be able to prevent the shutdown
         self.set_duty_cycle(0)
+        if self.laser_on:
+            self.set_laser_status(False)
+        self._watchdog.stop(timeout=1)
         self._arduino_hardware.on_deactivate()
         self._power_meter_hardware.on_deactivate()
+        try:
+            self._TiS_camera_hardware.on_deactivate()
+        except Exception:
+            self.log.exception('Error while deactivating the camera.')
+        self._event_log.close()
         self.sigPowerDataNext.disconnect()
+        self._sigLiveDataDue.disconnect()
         return
 
     def reset_hardware(self):
@@ -216,6 +359,7 @@ class FiberShootingLogic(Base, EmptyInterface):
     def open_flipper(self):
         """ Open the flipper. """
         self._arduino_hardware.toggle_shutter(0)
+        self._event_log.log(event_log.EVENT_SHUTTER_TOGGLE, channel=0)
         return
 
     # Shutter
@@ -223,28 +367,110 @@ class FiberShootingLogic(Base, EmptyInterface):
     def open_shutter(self):
         """ Open the shutter (permanently). """
         self._arduino_hardware.toggle_shutter(1)
+        self._event_log.log(event_log.EVENT_SHUTTER_TOGGLE, channel=1)
         return
 
     def send_pulse(self, duration):
         """ Open/close the shutter with a certain duration (min : about 6 ms). """
         self._arduino_hardware.open_shutter_micro(1, int(duration*1e3))
+        self._event_log.log(event_log.EVENT_PULSE, duration, self.duty_cycle, channel=1)
+        return
+
+    # Pulse sequencer
+
+    def run_pulse_sequence(self, steps, repetitions=1):
+        """ Run a multi-shot recipe with reproducible timing on the sequencer thread.
+
+        @param list steps: list of dictionaries with the optional keys 'duty_cycle', 'frequency',
+                           'setpoint', 'shutter_duration' (ms) and 'delay' (s, until the next
+                           step). See PulseSequencer.
+        @param int repetitions: number of times the whole list is executed
+        """
+        steps = PulseSequencer.check_steps(steps)
+        if self.pid_status and any(step['duty_cycle'] is not None for step in steps):
+            self.log.warning('The PID is on, it will override the duty cycle of the sequence '
+                             'steps. Use setpoint steps instead.')
+        self._pulse_sequencer.start(steps, repetitions)
+        return
+
+    def stop_pulse_sequence(self):
+        """ Stop the running pulse sequence before its next step. """
+        self._pulse_sequencer.stop()
         return
 
+    def is_sequence_running(self):
+        """ Get whether a pulse sequence is running (boolean). """
+        return self._pulse_sequencer.is_running()
+
+    def get_sequence_log(self):
+        """ Get the records of the steps executed by the last pulse sequence.
+        @return list: one dictionary per step with the step parameters and 'target_time',
+                      'actual_time', 'timing_error' and 'execution_time' (s)
+        """
+        return list(self._pulse_sequencer.records)
+
+    def _execute_sequence_step(self, step):
+        """ Apply one sequence step (called on the sequencer thread). """
+        if step['frequency'] is not None:
+            self.set_frequency(step['frequency'])
+        if step['setpoint'] is not None:
+            self.set_setpoint(step['setpoint'])
+        if step['duty_cycle'] is not None:
+            self.set_duty_cycle(step['duty_cycle'])
+        if step['shutter_duration'] > 0:
+            self.send_pulse(step['shutter_duration'])
+
+    def _sequence_step_executed(self, record):
+        """ Log a step executed by the sequencer and forward its record. """
+        self.log.debug('Sequence step {0:d} at {1:.6f} s (timing error {2:.1f} us).'.format(
+            record['index'], record['actual_time'], record['timing_error'] * 1e6))
+        self.sigSequenceStepExecuted.emit(record)
+
+    def _sequence_finished(self, records):
+        """ Log a summary of the timing of the finished sequence. """
+        if records:
+            errors = np.abs([record['timing_error'] for record in records])
+            self.log.info('Pulse sequence finished after {0:d} steps. Timing error: mean {1:.1f} '
+                          'us, max {2:.1f} us.'.format(len(records), errors.mean() * 1e6,
+                                                       errors.max() * 1e6))
+        self.sigSequenceFinished.emit(records)
+
     # CO2 Laser
 
     def set_laser_status(self, status):
         """ Set laser status to know whether we need to update the power-meter readings """
         self.laser_on = status
+        self._event_log.log(event_log.EVENT_LASER, float(status))
+        # Switching the laser off also acknowledges a watchdog trip
+        if status:
+            self._watchdog.arm()
+            if self._watchdog.tripped:
+                self.log.warning('Safety watchdog: the duty cycle stays at zero until the trip is '
+                                 'acknowledged by switching the laser off.')
+        else:
+            self._watchdog.disarm()
+            self._acknowledge_watchdog_trip()
+            # Send the last samples of the run
+            if self._live_batcher.due(force=True):
+                self._sigLiveDataDue.emit()
 
     def set_duty_cycle(self, duty_cycle):
         """ Set the duty cycle of the laser (between 0 and 1). """
         self.duty_cycle = duty_cycle
         # Safety feature: if someone blocks the photodetector,
         # do not increase the power above maximum safe value
-        if self.duty_cycle > self.max_safe_duty_cycle:
-            self._arduino_hardware.set_duty_cycle(self.max_safe_duty_cycle)
+        if self._watchdog.tripped:
+            # Latched until the laser is switched off
+            applied = 0
+        elif self.duty_cycle > self.max_safe_duty_cycle:
+            applied = self.max_safe_duty_cycle
         else:
-            self._arduino_hardware.set_duty_cycle(self.duty_cycle)
+            applied = self.duty_cycle
+        self._arduino_hardware.set_duty_cycle(applied)
+        # Without PID the loop sends the same duty cycle every cycle, only changes are logged
+        if applied != self._logged_duty_cycle:
+            self._event_log.log(event_log.EVENT_DUTY_CYCLE, duty_cycle, applied)
+            self._logged_duty_cycle = applied
 
     def get_duty_cycle(self):
         """ Get the duty cycle of the laser. """
@@ -254,6 +480,7 @@ class FiberShootingLogic(Base, EmptyInterface):
         """ Set the frequency of the laser (kHz). """
         self.frequency = frequency
         self._arduino_hardware.set_freq(self.frequency)
+        self._event_log.log(event_log.EVENT_FREQUENCY, frequency)
         return
 
     def get_frequency(self):
@@ -261,8 +488,14 @@ class FiberShootingLogic(Base, EmptyInterface):
         return self.frequency
 
     def set_setpoint(self, setpoint):
-        """ Set the power setpoint of the laser. """
+        """ Set the power setpoint of the laser. With the ramp on, the effective setpoint of the
+        PID follows with the ramping factor (slew rate). """
         self.setpoint = setpoint
+        if self.ramp_status:
+            self._trajectory.set_target(setpoint, time.perf_counter())
+        else:
+            self._trajectory.reset(setpoint)
+        self._event_log.log(event_log.EVENT_SETPOINT, setpoint)
         return
 
     def get_setpoint(self):
@@ -272,6 +505,7 @@ class FiberShootingLogic(Base, EmptyInterface):
     def set_pid_status(self, boolean):
         """ Set the PID to True or False. """
         self.pid_status = boolean
+        self._event_log.log(event_log.EVENT_PID, float(boolean))
         return
 
     def is_pid_status(self):
@@ -281,29 +515,66 @@ class FiberShootingLogic(Base, EmptyInterface):
     def set_kp(self, value):
         """ Set the proportional term of the PID. """
         self.kp = value
+        self._pid.kp = value
         return
 
     def set_ki(self, value):
         """ Set the integral term of the PID. """
         self.ki = value
+        self._pid.ki = value
         return
 
     def set_kd(self, value):
-        """ Set the derivative term of the PID. """
+        """ Set the derivative term of the PID (in units of 10 ms). """
         self.kd = value
+        self._pid.kd = value * self._kd_scale
         return
 
     def clear_integral(self):
         """ Clear the integral term of the PID. """
-        self.error_i = 0
+        self._pid.clear_integral()
         return
 
     def set_ramp_status(self, boolean):
         """ Set the ramp status (True ot False).
         Used in order to increase the changes of laser power"""
         self.ramp_status = boolean
+        if boolean:
+            self._trajectory.reset(self.effective_setpoint)
+            self._trajectory.set_target(self.setpoint, time.perf_counter())
+        else:
+            self._trajectory.reset(self.setpoint)
+        return
+
+    def set_ramping_factor(self, value):
+        """ Set the slew rate (W/s) of the setpoint ramp. """
+        self.ramping_factor = value
+        self._trajectory.slew_rate = value
         return
 
+    def get_ramping_factor(self):
+        """ Get the slew rate (W/s) of the setpoint ramp. """
+        return self.ramping_factor
+
+    def run_setpoint_program(self, segments):
+        """ Follow a program of setpoint ramps and holds, starting from the effective setpoint.
+        Switches the ramp on.
+
+        @param list segments: list of dictionaries, either {'setpoint': W, 'slew_rate': W/s,
+                              'profile': 'linear' or 's_curve'} (slew_rate and profile are
+                              optional) or {'hold': s}. See SetpointTrajectory.
+        """
+        self.ramp_status = True
+        self._trajectory.reset(self.effective_setpoint)
+        self._trajectory.set_program(segments, time.perf_counter())
+        self.setpoint = self._trajectory.final_value
+        self._event_log.log(event_log.EVENT_SETPOINT, self.setpoint)
+        return
+
+    def get_effective_setpoint(self):
+        """ Get the setpoint the PID currently regulates to (on the ramp). """
+        return self.effective_setpoint
+
     def set_power(self):
         """Set the duty cycle with or without PID"""
         if not self.laser_on:
@@ -311,6 +582,7 @@ class FiberShootingLogic(Base, EmptyInterface):
         # measure power and the time
         #self.power = self.get_power()
         self.power = self._power_meter_hardware.get_power()
+        self._watchdog.feed_power()
         self.time_loop.append(time.time())
         # We delete the useless data in order to not saturate the memory
         if len(self.time_loop) > 2:
@@ -319,35 +591,514 @@ class FiberShootingLogic(Base, EmptyInterface):
                 # If the time is the same for two loops then we call the function again
                 pass
             else:
-                # We update the power on the GUI
-                self.sigPowerUpdated.emit()
-                self.error = self.get_setpoint() - self.power
+                if self.ramp_status:
+                    self.effective_setpoint = self._trajectory.advance(time.perf_counter())
+                else:
+                    self.effective_setpoint = self.get_setpoint()
+                self.error = self.effective_setpoint - self.power
+                delta_t = self.time_loop[-1] - self.time_loop[-2]
+                if self.feedforward_status and self._calibration is not None:
+                    self.offset = float(self._calibration.feedforward(self.effective_setpoint))
                 if self.pid_status:
-                    delta_t = self.time_loop[-1] - self.time_loop[-2]
-                    self.error_p = self.error
-                    self.error_i += self.error * delta_t
-                    self.error_d = (self.error - self.error_p_prev) / delta_t
-                    p = self.kp * self.error_p
-                    i = self.ki * self.error_i
-                    d = self.kd * self.error_d
-                    pid_out = self.polarity * (p + i + d/100)
-                    correction = self.offset + pid_out
-                    if correction >= self.max_pid_out:
-                        self.output = self.max_pid_out
-                    elif correction <= self.min_pid_out:
-                        self.output = self.min_pid_out
-                    else:
-                        self.output = correction
+                    self.output = self._pid.update(self.effective_setpoint, self.power, delta_t,
+                                                   feedforward=self.offset)
                     if abs(self.output - self.duty_cycle_prev) > 1e-4:
                         self.set_duty_cycle(self.output)
                     self.duty_cycle_prev = self.output
-                    self.error_p_prev = self.error_p
                 else:
+                    # The PID tracks the manual duty cycle, switching it on is bumpless
+                    self._pid.update(self.effective_setpoint, self.power, delta_t,
+                                     feedforward=self.offset,
+                                     manual_output=min(self.duty_cycle, self.max_safe_duty_cycle))
                     self.set_duty_cycle(self.duty_cycle)
+                self._history.append(self.time_loop[-1], self.power, self.duty_cycle,
+                                     self.setpoint, self.effective_setpoint, self.error,
+                                     self._pid.p_term, self._pid.i_term, self._pid.d_term,
+                                     self.pid_status)
+                live_values = (self.time_loop[-1], self.power, self.duty_cycle,
+                               self.effective_setpoint, self.error, self._pid.p_term,
+                               self._pid.i_term, self._pid.d_term)
+                self._live_history.append(*live_values)
+                self._live_batcher.add(*live_values)
+                if self._live_batcher.due():
+                    self._sigLiveDataDue.emit()
+        self._watchdog.heartbeat()
         self.sigPowerDataNext.emit()
         time.sleep(0.01)    # Introduce idle time to decrease slightly CPU load
         return
 
+    def get_pid_terms(self):
+        """ Get the state of the PID of the last control cycle.
+        @return dict: 'error', 'p', 'i', 'd' (contributions to the duty cycle), 'output' and
+                      'saturated'
+        """
+        return {'error': self._pid.error, 'p': self._pid.p_term, 'i': self._pid.i_term,
+                'd': self._pid.d_term, 'output': self._pid.output, 'saturated': self._pid.saturated}
+
+    def _send_live_data(self):
+        """ Emit the samples collected since the last batch (queued slot).
+
+        It runs when the event loop gets to it, so while the event loop is busy the samples pile
+        up into one batch instead of queueing one signal per sample.
+        """
+        batch = self._live_batcher.take()
+        if len(batch):
+            self.sigLiveData.emit(batch)
+        return
+
+    # Session history
+
+    def get_session_history(self, start=0, stop=None):
+        """ Get the control loop history of the session, one record per cycle. Only the last
+        session_history_samples cycles are kept, the longer past is in get_live_history().
+
+        @param int start: index of the first record (0 is the oldest record kept)
+        @param int stop: index after the last record, None for all
+
+        @return numpy.ndarray: structured array with the fields 'time', 'power', 'duty_cycle',
+                               'setpoint', 'effective_setpoint', 'error', 'p', 'i', 'd' and 'pid'
+        """
+        return self._history.get(start, stop)
+
+    def clear_session_history(self):
+        """ Forget the control loop history. """
+        self._history.clear()
+        self._live_history.clear()
+        return
+
+    def get_live_history(self, start=None, stop=None, max_points=2000):
+        """ Get the live values of a time range at the finest resolution with at most about
+        max_points points: raw samples of the last minutes, otherwise min/mean/max per 1 s, 10 s or
+        1 min bin. The resolution is chosen without scanning the raw data, so a plot can zoom from
+        hours to milliseconds.
+
+        @param float start: start time (time.time(), s), None for the oldest data
+        @param float stop: end time (s), None for the newest data
+        @param int max_points: maximum number of points
+
+        @return dict: 'resolution' (bin width in s, 0 for raw samples), 'time' and for every field
+                      of live_history_fields the arrays <field>_min, <field>_mean and <field>_max
+                      (the same array for raw samples). None if there is no data.
+        """
+        return self._live_history.get(start, stop, max_points)
+
+    def get_live_history_raw(self, start=None, stop=None):
+        """ Get the raw live values with start <= time < stop of the last minutes.
+
+        @return numpy.ndarray: structured array with the fields 'time' and live_history_fields
+        """
+        return self._live_history.get_raw(start, stop)
+
+    def analyze_step_responses(self, min_step=0.05, closed_loop=True):
+        """ Characterize the steps of the session: rise time, settling time, overshoot,
+        steady-state error and a first-order-plus-dead-time fit per step, summarized per target.
+
+        @param float min_step: minimum setpoint (W, closed loop) or duty cycle (open loop) change
+                               that counts as a step
+        @param bool closed_loop: analyze setpoint steps with the PID on, otherwise duty cycle
+                                 steps with the PID off
+
+        @return dict: per step results, see logic.fiber_shooting.step_response.analyze_steps()
+        """
+        data = self._history.get()
+        data = data[data['pid'] == (1 if closed_loop else 0)]
+        reference = data['setpoint'] if closed_loop else data['duty_cycle']
+        result = step_response.analyze_steps(data['time'], data['power'], reference, min_step,
+                                             closed_loop=closed_loop)
+        if len(result['time']):
+            self.log.info('Step responses ({0}):\n{1}'.format(
+                'closed loop' if closed_loop else 'open loop',
+                step_response.format_summary(step_response.summarize_by_target(result))))
+        else:
+            self.log.info('No steps found in the session history.')
+        return result
+
+    # Power stability
+
+    def start_stability_analysis(self, start=0, stop=None, window='hann'):
+        """ Compute the overlapping Allan deviation and the Welch power spectral density of the
+        measured power on a worker thread. The results are plotted and saved in the FiberShooting
+        data directory, then sigStabilityAnalysisFinished is emitted.
+
+        @param int start: index of the first record of the session history
+        @param int stop: index after the last record, None for all
+        @param str window: window of the PSD segments, see core.util.units.get_ft_windows()
+        """
+        if self.is_stability_analysis_running():
+            self.log.warning('The power stability analysis is still running.')
+            return
+        data = self._history.get(start, stop)
+        if len(data) < 32:
+            self.log.warning('Not enough power readings in the session history for a stability '
+                             'analysis.')
+            return
+        self._stability_thread = threading.Thread(target=self._run_stability_analysis,
+                                                  args=(data['time'], data['power'], window),
+                                                  name='power-stability', daemon=True)
+        self._stability_thread.start()
+        return
+
+    def is_stability_analysis_running(self):
+        """ Get whether the power stability analysis is running (boolean). """
+        return self._stability_thread is not None and self._stability_thread.is_alive()
+
+    def get_stability_result(self):
+        """ Get the result of the last power stability analysis.
+        @return dict: 'allan' and 'psd' (see logic.fiber_shooting.power_stability), 'mean', 'std',
+                      'sample_time' and 'duration', None if there is none
+        """
+        return self.stability_result
+
+    def _run_stability_analysis(self, times, power, window):
+        """ Thread target: analyze, plot and save the power stability. """
+        try:
+            values, dt = power_stability.resample_uniform(times, power)
+            allan = power_stability.allan_deviation(values, dt)
+            psd = power_stability.welch_psd(values, dt, window=window)
+            result = {'allan': allan, 'psd': psd, 'mean': values.mean(), 'std': values.std(),
+                      'sample_time': dt, 'duration': times[-1] - times[0]}
+            fig = power_stability.plot_stability(
+                allan, psd, 'Mean {0:.4f} W, std {1:.2e} W over {2:.0f} s'.format(
+                    result['mean'], result['std'], result['duration']))
+            parameters = {'Mean power (W)': result['mean'], 'Power std (W)': result['std'],
+                          'Sample time (s)': dt, 'Duration (s)': result['duration'],
+                          'PSD window': window, 'PSD segments': psd['segments']}
+            filepath = self._save_logic.get_path_for_module('FiberShooting')
+            self._save_logic.save_data({'Averaging time (s)': allan['tau'],
+                                        'Allan deviation (W)': allan['adev'],
+                                        'Relative Allan deviation': allan['adev_relative']},
+                                       filepath=filepath, parameters=parameters,
+                                       filelabel='allan_deviation', plotfig=fig)
+            self._save_logic.save_data({'Frequency (Hz)': psd['frequency'],
+                                        'PSD (W^2/Hz)': psd['psd']},
+                                       filepath=filepath, parameters=parameters,
+                                       filelabel='power_spectral_density')
+        except Exception:
+            self.log.exception('The power stability analysis failed.')
+            return
+        self.stability_result = result
+        self.sigStabilityAnalysisFinished.emit(result)
+
+    # Session export
+
+    def export_session(self):
+        """ Save the session history up to now (time, power, duty cycle, setpoints, error, PID
+        terms and PID status per control cycle) on a worker thread, so neither the control loop
+        nor the GUI waits for the disk. The arrays are written as compressed numpy .npz file with
+        a text file of the parameters next to it, in the FiberShooting data directory.
+        sigExportProgress reports the progress (0 to 1), sigExportFinished the path of the file.
+        """
+        if self.is_exporting():
+            self.log.warning('The session export is still running.')
+            return
+        stop = len(self._history)
+        if stop == 0:
+            self.log.warning('The session history is empty, nothing to export.')
+            return
+        parameters = {'Kp': self.kp, 'Ki': self.ki, 'Kd': self.kd,
+                      'Frequency (Hz)': self.frequency, 'Setpoint (W)': self.setpoint,
+                      'Ramp slew rate (W/s)': self.ramping_factor,
+                      'Feedforward': self.feedforward_status}
+        self._export_thread = threading.Thread(target=self._run_export, args=(stop, parameters),
+                                               name='session-export', daemon=True)
+        self._export_thread.start()
+        return
+
+    def is_exporting(self):
+        """ Get whether the session export is running (boolean). """
+        return self._export_thread is not None and self._export_thread.is_alive()
+
+    def _run_export(self, stop, parameters):
+        """ Thread target: copy the history up to stop and save it. """
+        try:
+            self.sigExportProgress.emit(0.)
+            data = self._history.get(0, stop)
+            self.sigExportProgress.emit(0.2)
+            timestamp = datetime.datetime.now()
+            parameters['Samples'] = len(data)
+            parameters['Start'] = time.strftime('%d.%m.%Y %H:%M:%S',
+                                                time.localtime(data['time'][0]))
+            parameters['Duration (s)'] = data['time'][-1] - data['time'][0]
+            filepath = self._save_logic.get_path_for_module('FiberShooting')
+            filename = timestamp.strftime('%Y%m%d-%H%M-%S_fiber_shooting_session.npz')
+            self._save_logic.save_data({name: data[name] for name in data.dtype.names},
+                                       filepath=filepath, filename=filename,
+                                       parameters=parameters, timestamp=timestamp,
+                                       filetype='npz')
+        except Exception:
+            self.log.exception('The session export failed.')
+            return
+        path = os.path.join(filepath, filename)
+        self.log.info('Session exported to {0}'.format(path))
+        self.sigExportProgress.emit(1.)
+        self.sigExportFinished.emit(path)
+
+    # Duty cycle to power calibration
+
+    def start_calibration(self, duty_cycles=None, points=11):
+        """ Start the duty cycle to power calibration sweep on a worker thread.
+
+        The duty cycle is stepped through duty_cycles, for every step the power is read until it
+        is steady. The table is stored in the calibration file and used as feedforward term of the
+        PID. The control loop must be stopped (laser switched off in the GUI). The safety watchdog
+        monitors the sweep.
+
+        @param array duty_cycles: duty cycles of the sweep, by default points values from 0 to
+                                  the maximum safe duty cycle
+        @param int points: number of duty cycles of the default sweep
+        """
+        if duty_cycles is None:
+            duty_cycles = np.linspace(0, self.max_safe_duty_cycle, points)
+        self._start_experiment(self._run_calibration, (np.sort(duty_cycles),),
+                               'power-calibration')
+        return
+
+    def stop_calibration(self):
+        """ Abort the calibration sweep. The previous calibration is kept. """
+        self._stop_experiment()
+        return
+
+    def is_calibrating(self):
+        """ Get whether the calibration sweep is running (boolean). """
+        return self._is_experiment_running('power-calibration')
+
+    def get_calibration(self):
+        """ Get the duty cycle to power calibration.
+        @return PowerCalibration: the calibration, None if there is none
+        """
+        return self._calibration
+
+    def set_feedforward_status(self, boolean):
+        """ Use the calibration as feedforward term of the PID (True or False). """
+        self.feedforward_status = boolean
+        if not boolean:
+            self.offset = 0
+        return
+
+    def is_feedforward_status(self):
+        """ Get whether the PID uses the calibration as feedforward term (boolean). """
+        return self.feedforward_status
+
+    def _run_calibration(self, duty_cycles):
+        """ Thread target: run the calibration sweep and store the result. """
+        def progress(index, duty_cycle, power, std, steady):
+            self.log.info('Calibration {0:d}/{1:d}: duty cycle {2:.3f}, power {3:.4f} W '
+                          '(std {4:.4f} W){5}'.format(index + 1, len(duty_cycles), duty_cycle,
+                                                      power, std,
+                                                      '' if steady else ', not steady'))
+            self.sigCalibrationProgress.emit(index, duty_cycle, power)
+
+        calibration = run_calibration_sweep(
+            self.set_duty_cycle, self._read_experiment_power, duty_cycles,
+            abort=self._is_experiment_aborted, progress=progress,
+            settle_window=self._calibration_settle_window,
+            settle_tolerance=self._calibration_settle_tolerance,
+            timeout=self._calibration_timeout)
+        if calibration is None:
+            self.log.warning('The calibration was aborted, the previous calibration is kept.')
+        else:
+            self._calibration = calibration
+            calibration.save(self._calibration_path)
+            self.log.info('Calibration saved to {0}.'.format(self._calibration_path))
+        self.sigCalibrationFinished.emit()
+
+    # PID autotuning
+
+    def start_autotune(self, setpoint=None, amplitude=None, rule='ziegler_nichols', cycles=8,
+                       apply=False):
+        """ Start the relay feedback autotuning on a worker thread.
+
+        The duty cycle switches between two values around the duty cycle of the setpoint
+        whenever the power crosses the setpoint, the resulting oscillation gives the ultimate
+        gain Ku and period Pu of the loop. The gains proposed by the tuning rule are logged and
+        available from get_autotune_result(). The control loop must be stopped (laser switched
+        off in the GUI). The safety watchdog monitors the experiment.
+
+        @param float setpoint: power (W) to oscillate around, the current setpoint if None
+        @param float amplitude: relay amplitude (duty cycle), autotune_amplitude if None
+        @param str rule: tuning rule, one of logic.fiber_shooting.pid_autotune.TUNING_RULES
+        @param int cycles: number of oscillation periods
+        @param bool apply: set the proposed gains when finished
+        """
+        if rule not in TUNING_RULES:
+            self.log.error('Unknown tuning rule "{0}", use one of {1}.'.format(
+                rule, sorted(TUNING_RULES)))
+            return
+        setpoint = self.setpoint if setpoint is None else setpoint
+        amplitude = self._autotune_amplitude if amplitude is None else amplitude
+        if self._calibration is not None:
+            center = float(self._calibration.feedforward(setpoint))
+        else:
+            center = self.duty_cycle if self.duty_cycle > 0 else self.max_safe_duty_cycle / 2
+        # Both relay levels must be safe duty cycles
+        center = min(max(center, amplitude), self.max_safe_duty_cycle - amplitude)
+        self._start_experiment(self._run_autotune, (setpoint, center, amplitude, rule, cycles,
+                                                    apply), 'pid-autotune')
+        return
+
+    def stop_autotune(self):
+        """ Abort the autotuning. """
+        self._stop_experiment()
+        return
+
+    def is_autotuning(self):
+        """ Get whether the autotuning is running (boolean). """
+        return self._is_experiment_running('pid-autotune')
+
+    def get_autotune_result(self):
+        """ Get the result of the last autotuning.
+        @return dict: 'ultimate_gain' (duty cycle / W), 'ultimate_period' (s), 'rule', 'kp',
+                      'ki', 'kd' (parallel form, kd in s), 'gains' (rule -> (kp, ki, kd)) and
+                      'data' (time, power and duty cycle of the experiment); None if there is none
+        """
+        return self.autotune_result
+
+    def apply_autotune_gains(self, rule=None):
+        """ Set the PID gains proposed by the last autotuning.
+        @param str rule: tuning rule, the one of the autotuning if None
+        """
+        if self.autotune_result is None:
+            self.log.warning('There is no autotuning result.')
+            return
+        kp, ki, kd = self.autotune_result['gains'][rule or self.autotune_result['rule']]
+        self.set_kp(kp)
+        self.set_ki(ki)
+        self.set_kd(kd / self._kd_scale)
+        return
+
+    def _run_autotune(self, setpoint, center, amplitude, rule, cycles, apply):
+        """ Thread target: run the relay experiment and log the proposed gains. """
+        self.log.info('Autotuning around {0:.3f} W: duty cycle {1:.3f} +- {2:.3f}.'.format(
+            setpoint, center, amplitude))
+        result = autotune(self.set_duty_cycle, self._read_experiment_power, setpoint, center,
+                          amplitude, hysteresis=self._autotune_hysteresis, cycles=cycles,
+                          rule=rule, abort=self._is_experiment_aborted, polarity=self.polarity)
+        if self._is_experiment_aborted() or result is None:
+            self.log.warning('The autotuning was aborted or found no oscillation, the gains are '
+                             'kept.')
+            return
+        self.autotune_result = result
+        self.log.info('Autotuning: Ku = {0:.4f}, Pu = {1:.4f} s. Rule {2}: kp = {3:.4f}, '
+                      'ki = {4:.4f}, kd = {5:.5f} s.'.format(result['ultimate_gain'],
+                                                             result['ultimate_period'], rule,
+                                                             result['kp'], result['ki'],
+                                                             result['kd']))
+        for name, gains in result['gains'].items():
+            self.log.debug('Autotuning rule {0}: kp = {1:.4f}, ki = {2:.4f}, kd = {3:.5f} s.'
+                           ''.format(name, *gains))
+        if apply:
+            self.apply_autotune_gains()
+        self.sigAutotuneFinished.emit({key: value for key, value in result.items()
+                                       if key != 'data'})
+
+    # Plant experiments
+
+    def _start_experiment(self, target, args, name):
+        """ Run a plant experiment (calibration, autotuning) on the worker thread. """
+        if self.laser_on:
+            self.log.warning('Switch off the laser control loop before the {0}.'.format(name))
+            return
+        if self._experiment_thread is not None and self._experiment_thread.is_alive():
+            self.log.warning('The {0} is still running.'.format(self._experiment_thread.name))
+            return
+        self._experiment_abort.clear()
+        self._experiment_thread = threading.Thread(target=self._run_experiment,
+                                                   args=(target, args), name=name, daemon=True)
+        self._experiment_thread.start()
+
+    def _stop_experiment(self):
+        """ Abort the plant experiment and wait for the worker thread. """
+        self._experiment_abort.set()
+        if self._experiment_thread is not None:
+            self._experiment_thread.join(timeout=2 * self._calibration_timeout)
+            self._experiment_thread = None
+
+    def _is_experiment_running(self, name):
+        """ Whether the plant experiment name is running. """
+        thread = self._experiment_thread
+        return thread is not None and thread.is_alive() and thread.name == name
+
+    def _is_experiment_aborted(self):
+        """ Whether the plant experiment has to stop (stop request or watchdog trip). """
+        return self._experiment_abort.is_set() or self._watchdog.tripped
+
+    def _read_experiment_power(self):
+        """ Power reading of a plant experiment, which also feeds the safety watchdog. """
+        power = self._power_meter_hardware.get_power()
+        self._watchdog.feed_power()
+        self._watchdog.heartbeat()
+        return power
+
+    def _run_experiment(self, target, args):
+        """ Thread target: run a plant experiment under the watchdog and switch the laser off. """
+        self._watchdog.arm()
+        try:
+            target(*args)
+        finally:
+            self.set_duty_cycle(0)
+            # A trip stays latched until the laser is switched off
+            if not self._watchdog.tripped:
+                self._watchdog.disarm()
+
+    # Arduino link
+
+    def get_link_health(self):
+        """ Get the health statistics of the serial link to the Arduino (command rate, dropped
+        updates and, in acknowledgement mode, lost/garbled commands and round-trip latency).
+        @return dict: see ArduinoHardware.get_link_health()
+        """
+        return self._arduino_hardware.get_link_health()
+
+    # Safety watchdog
+
+    def is_watchdog_tripped(self):
+        """ Get whether the safety watchdog has forced the duty cycle to zero (boolean).
+        It stays tripped until the laser is switched off. """
+        return self._watchdog.tripped
+
+    def get_watchdog_trip(self):
+        """ Get the description of the last watchdog trip.
+        @return dict: see SafetyWatchdog, None if it never tripped
+        """
+        return self._watchdog.last_trip
+
+    def _acknowledge_watchdog_trip(self):
+        """ Clear a watchdog trip together with the emergency stop latch of the hardware, which
+        keeps the duty cycle at zero as long as the watchdog is tripped. """
+        self._watchdog.reset()
+        self._arduino_hardware.reset_emergency_stop()
+
+    def _watchdog_stop(self):
+        """ Force the duty cycle to zero (called on the watchdog thread). """
+        self._arduino_hardware.emergency_stop()
+
+    def _watchdog_tripped(self, trip):
+        """ Log a watchdog trip (called on the watchdog thread after the stop). """
+        self.log.error('Safety watchdog: no {0} within the timeout, the duty cycle was forced to '
+                       'zero. Reaction latency {1:.1f} ms (deadline {2:.1f} ms), stop command '
+                       '{3:.2f} ms.'.format(trip['reason'], trip['reaction_latency'] * 1e3,
+                                            self._watchdog.deadline * 1e3,
+                                            trip['stop_duration'] * 1e3))
+        if not trip['deadline_met']:
+            self.log.warning('Safety watchdog: the reaction deadline was missed.')
+        self._event_log.log(event_log.EVENT_WATCHDOG, trip['reaction_latency'], self.duty_cycle)
+        self.sigWatchdogTripped.emit(trip)
+
+    # Event log
+
+    def get_events(self, day=None):
+        """ Load the actuation events (pulses, duty cycle and frequency changes, shutter and
+        flipper toggles, PID on/off) of a day from the event log directory of this session.
+
+        @param datetime.date day: day of the events, today if None
+
+        @return numpy.ndarray: structured array with the fields 'monotonic', 'wall_time',
+                               'event', 'channel', 'session', 'value' and 'value2'.
+                               See logic.fiber_shooting.event_log.
+        """
+        self._event_log.flush()
+        return event_log.load_events(self._event_log_path, day)
+
     # Power Meter
 
     def get_power(self):
@@ -20,17 +20,24 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 from cycler import cycler
+import concurrent.futures
 import datetime
-import inspect
+import json
 import logging
 import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
 import os
+import pickle
+import queue
 import sys
+import threading
 import time
 
 from collections import OrderedDict
+from qtpy import QtCore
 from core.module import ConfigOption
+from core.util import text_export
 from core.util import units
 from core.util.mutex import Mutex
 from logic.generic_logic import GenericLogic
@@ -39,6 +46,37 @@ from matplotlib.backends.backend_pdf import PdfPages
 #from PIL import PngImagePlugin
 
 
+def save_figure(figure, file_base, metadata):
+    """
+    Save a matplotlib figure as PDF (with metadata) and PNG, as save_data does.
+
+    @param matplotlib.figure.Figure figure: the figure
+    @param str file_base: path of the files without the ending, '_fig.pdf' and '_fig.png' are
+                          appended
+    @param dict metadata: PDF metadata
+    """
+    # Create the PdfPages object to which we will save the pages:
+    # The with statement makes sure that the PdfPages object is closed properly at
+    # the end of the block, even if an Exception occurs.
+    with PdfPages(file_base + '_fig.pdf') as pdf:
+        pdf.savefig(figure, bbox_inches='tight', pad_inches=0.05)
+
+        # We can also set the file's metadata via the PdfPages object:
+        pdf_metadata = pdf.infodict()
+        for x in metadata:
+            pdf_metadata[x] = metadata[x]
+
+    # save the plain PNG
+    figure.savefig(file_base + '_fig.png', bbox_inches='tight', pad_inches=0.05)
+
+
+def _render_pickled_figure(figure_data, file_base, metadata):
+    """ save_figure for a pickled figure, run in the figure rendering processes of SaveLogic. """
+    figure = pickle.loads(figure_data)
+    save_figure(figure, file_base, metadata)
+    plt.close(figure)
+
+
 class DailyLogHandler(logging.FileHandler):
     """
     log handler which uses savelogic's get_daily_directory to log to a
@@ -114,6 +152,255 @@ class FunctionImplementationError(Exception):
         return repr(self.value)
 
 
+class DataStreamWriter:
+    """ Text data file that is written while the data is acquired.
+
+    The header with the parameters and the column labels is written when the stream is opened,
+    then blocks of rows are appended with append(), from any thread. The file is flushed to the
+    disk (flush and fsync) every flush_interval seconds by a background thread and when the
+    stream is closed, so if the program is interrupted the file holds all the rows up to the last
+    flush and can be read like a file of save_data. Create it with SaveLogic.open_data_stream().
+    """
+
+    def __init__(self, path, header, columns, fmt='%.15e', delimiter='\t', comments='#',
+                 flush_interval=1., on_close=None):
+        """
+        @param str path: file to create
+        @param str header: header, without comment characters
+        @param int columns: number of columns of a row
+        @param str or list fmt: format specifier, or one per column
+        @param str delimiter: column delimiter
+        @param str comments: comment characters before every header line
+        @param float flush_interval: time (s) between flushes to the disk, None or 0 to flush
+                                     only on flush() and close()
+        @param callable on_close: called with the writer once it is closed
+        """
+        self.path = path
+        self.columns = columns
+        self.fmt = fmt
+        self.delimiter = delimiter
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._on_close = on_close
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._file = open(path, 'wb')
+        np.savetxt(self._file, np.empty((0, columns)), header=header, comments=comments)
+        self.flush()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, name='DataStreamWriter',
+                                             daemon=True)
+            self._flusher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def append(self, rows):
+        """ Append rows to the file. They are on the disk after the next flush.
+
+        @param array rows: one row (1D) or a block of rows (2D), columns values per row
+        """
+        rows = np.asarray(rows)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        if rows.ndim != 2 or rows.shape[1] != self.columns:
+            raise ValueError('Expected rows with {0} columns, got an array of shape {1}.'
+                             ''.format(self.columns, rows.shape))
+        if len(rows) == 0:
+            return
+        with self._lock:
+            if self._file.closed:
+                raise ValueError('The data stream {0} is closed.'.format(self.path))
+            np.savetxt(self._file, rows, fmt=self.fmt, delimiter=self.delimiter)
+            self.rows_written += len(rows)
+            self._dirty = True
+
+    def flush(self):
+        """ Write the appended rows to the disk. """
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            if self._dirty:
+                self.flush()
+
+    def close(self):
+        """ Flush and close the file. Closing a closed stream does nothing. """
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        if self._on_close is not None:
+            self._on_close(self)
+
+
+class NpyStreamWriter:
+    """ Binary .npy data file that grows while the data is acquired.
+
+    The rows are written into a memory map of the file. When it is full, the file is enlarged
+    geometrically (at least doubled), so appending n rows costs O(n) amortised and the file is
+    remapped only O(log n) times. The .npy header is written with a fixed length that leaves
+    room for any number of rows, so it can be rewritten in place: on every flush it is updated to
+    the rows written so far and on close the preallocated tail is truncated. An interrupted
+    acquisition therefore leaves a valid .npy file with all the rows up to the last flush.
+
+    The file is read lazily with numpy.load(path, mmap_mode='r'), see SaveLogic.load_npy_data.
+    It has the same interface as DataStreamWriter, create it with SaveLogic.open_data_stream().
+    """
+
+    # Alignment (bytes) of the data after the header, as numpy writes it
+    _header_align = 64
+
+    def __init__(self, path, columns, dtype=float, capacity=1024, flush_interval=1.,
+                 on_close=None):
+        """
+        @param str path: file to create
+        @param int columns: number of columns of a row
+        @param numpy.dtype dtype: data type of the values
+        @param int capacity: number of rows preallocated initially
+        @param float flush_interval: time (s) between flushes to the disk, None or 0 to flush
+                                     only on flush() and close()
+        @param callable on_close: called with the writer once it is closed
+        """
+        self.path = path
+        self.columns = columns
+        self.dtype = np.dtype(dtype)
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._on_close = on_close
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._row_bytes = self.dtype.itemsize * columns
+        self._header_length = len(self._header((10 ** 20, columns)))
+        self._capacity = 0
+        self._map = None
+        self._file = open(path, 'w+b')
+        self._grow(max(int(capacity), 1))
+        self._write_header()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, name='NpyStreamWriter',
+                                             daemon=True)
+            self._flusher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def _header(self, shape, length=None):
+        """ .npy (version 1.0) header for the shape, padded to length bytes. """
+        header = "{{'descr': {0!r}, 'fortran_order': False, 'shape': {1!r}, }}".format(
+            np.lib.format.dtype_to_descr(self.dtype), shape)
+        if length is None:
+            length = len(np.lib.format.MAGIC_PREFIX) + 4 + len(header) + 1
+            length = -(-length // self._header_align) * self._header_align
+        header_size = length - len(np.lib.format.MAGIC_PREFIX) - 4
+        header = header.ljust(header_size - 1) + '\n'
+        return (np.lib.format.MAGIC_PREFIX + bytes((1, 0)) + header_size.to_bytes(2, 'little')
+                + header.encode('latin1'))
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(self._header((self.rows_written, self.columns), self._header_length))
+
+    def _grow(self, capacity):
+        """ Enlarge the file and its memory map to capacity rows. """
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        self._file.truncate(self._header_length + capacity * self._row_bytes)
+        self._capacity = capacity
+        self._map = np.memmap(self._file, dtype=self.dtype, mode='r+',
+                              offset=self._header_length, shape=(capacity, self.columns))
+
+    def append(self, rows):
+        """ Append rows to the file. They are on the disk after the next flush.
+
+        @param array rows: one row (1D) or a block of rows (2D), columns values per row
+        """
+        rows = np.asarray(rows, dtype=self.dtype)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        if rows.ndim != 2 or rows.shape[1] != self.columns:
+            raise ValueError('Expected rows with {0} columns, got an array of shape {1}.'
+                             ''.format(self.columns, rows.shape))
+        if len(rows) == 0:
+            return
+        with self._lock:
+            if self._file.closed:
+                raise ValueError('The data stream {0} is closed.'.format(self.path))
+            stop = self.rows_written + len(rows)
+            if stop > self._capacity:
+                self._grow(max(2 * self._capacity, stop))
+            self._map[self.rows_written:stop] = rows
+            self.rows_written = stop
+            self._dirty = True
+
+    def _sync(self):
+        self._map.flush()
+        self._write_header()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._dirty = False
+
+    def flush(self):
+        """ Write the appended rows and the header with the new number of rows to the disk. """
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            if self._dirty:
+                self.flush()
+
+    def close(self):
+        """ Flush, truncate the preallocated rows and close the file. Closing a closed stream
+        does nothing. """
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._map = None
+            self._file.truncate(self._header_length + self.rows_written * self._row_bytes)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        if self._on_close is not None:
+            self._on_close(self)
+
+
 class SaveLogic(GenericLogic):
 
     """
@@ -126,6 +413,13 @@ class SaveLogic(GenericLogic):
     _win_data_dir = ConfigOption('win_data_directory', 'C:/Data/')
     _unix_data_dir = ConfigOption('unix_data_directory', 'Data')
     log_into_daily_directory = ConfigOption('log_into_daily_directory', False, missing='warn')
+    # maximum number of jobs waiting in the queue of save_data_async
+    save_queue_size = ConfigOption('save_queue_size', 16)
+    # number of processes rendering the figures of save_data_async
+    figure_processes = ConfigOption('figure_processes', 1)
+
+    # path of the data file, emitted when a job of save_data_async is finished
+    sigDataSaved = QtCore.Signal(str)
 
     # Matplotlib style definition for saving plots
     mpl_qd_style = {
@@ -187,6 +481,14 @@ class SaveLogic(GenericLogic):
 
         self._daily_loghandler = None
 
+        # (date, path) of the daily directory and (daily directory, {module name: path}) of the
+        # module directories, so that they are only looked up on the disk once a day
+        self._daily_directory = (None, None)
+        self._module_directories = (None, {})
+
+        # data streams that are open, closed on deactivation
+        self._data_streams = []
+
     def on_activate(self):
         """ Definition, configuration and initialisation of the SaveLogic.
         """
@@ -202,7 +504,22 @@ class SaveLogic(GenericLogic):
         else:
             self._daily_loghandler = None
 
+        self._save_queue = queue.Queue(maxsize=self.save_queue_size)
+        self._figure_pool = None
+        self._save_thread = threading.Thread(target=self._save_worker_loop, name='SaveLogic',
+                                             daemon=True)
+        self._save_thread.start()
+
     def on_deactivate(self):
+        # finish the queued save jobs and the figures that are being rendered
+        self._save_queue.put(None)
+        self._save_thread.join()
+        if self._figure_pool is not None:
+            self._figure_pool.shutdown(wait=True)
+            self._figure_pool = None
+        for stream in list(self._data_streams):
+            self.log.warning('Closing data stream {0}, which was still open.'.format(stream.path))
+            stream.close()
         if self._daily_loghandler is not None:
             # removes the log handler logging into the daily directory
             logging.getLogger().removeHandler(self._daily_loghandler)
@@ -223,7 +540,8 @@ class SaveLogic(GenericLogic):
         self._daily_loghandler.setLevel(level)
 
     def save_data(self, data, filepath=None, parameters=None, filename=None, filelabel=None,
-                  timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None):
+                  timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None,
+                  fast_text=False):
         """
         General save routine for data.
 
@@ -269,7 +587,10 @@ class SaveLogic(GenericLogic):
                                    filename and a timestamp, because then the timestamp will be
                                    ignored.
         @param string filetype: optional, the file format the data should be saved in. Valid inputs
-                                are 'text', 'xml' and 'npz'. Default is 'text'.
+                                are 'text', 'npz' and 'npy'. Default is 'text'.
+                                'npy' saves the data as a single array (as for 'text') in a .npy
+                                file, which can be read lazily with load_npy_data, and the
+                                parameters in a JSON file <filename>_params.json.
         @param string or list of strings fmt: optional, format specifier for saved data. See python
                                               documentation for
                                               "Format Specification Mini-Language". If you want for
@@ -284,6 +605,8 @@ class SaveLogic(GenericLogic):
                                               behaviour or failure to save right away.
         @param string delimiter: optional, insert here the delimiter, like '\n' for new line, '\t'
                                  for tab, ',' for a comma ect.
+        @param bool fast_text: optional, format text files with the vectorized writer of
+                               save_array_as_text (same file, faster for large arrays)
 
         1D data
         =======
@@ -313,6 +636,121 @@ class SaveLogic(GenericLogic):
 
         YOU ARE RESPONSIBLE FOR THE IDENTIFIER! DO NOT FORGET THE UNITS FOR THE SAVED TIME
         TRACE/MATRIX.
+
+        @return str: the path of the saved data file, -1 if the data could not be saved
+        """
+        # try to trace back the functioncall to the class which was calling it.
+        module_name = self._get_caller_module_name()
+        return self._save_data(module_name, data, filepath, parameters, filename, filelabel,
+                               timestamp, filetype, fmt, delimiter, plotfig, fast_text)
+
+    def save_data_async(self, data, filepath=None, parameters=None, filename=None,
+                        filelabel=None, timestamp=None, filetype='text', fmt='%.15e',
+                        delimiter='\t', plotfig=None, fast_text=False, block=True,
+                        timeout=None):
+        """
+        save_data in the background: the data is copied and queued for the save thread of the
+        SaveLogic, and a figure is rendered in a separate process, so the caller does not wait for
+        the formatting of the data and matplotlib. The arguments are the ones of save_data.
+
+        The returned future has the path of the data file as result (or the exception of the
+        save), and sigDataSaved is emitted with the path, once the data and the figure are saved.
+        The queue holds save_queue_size jobs. If it is full, the call blocks until there is room
+        (backpressure), or raises queue.Full if block is False or after timeout seconds.
+
+        @param bool block: wait for room in the queue if it is full
+        @param float timeout: maximum time (s) to wait for room, None for no limit
+
+        @return concurrent.futures.Future: the pending save
+        """
+        # the calling module and the timestamp are the ones of the call, not of the save
+        module_name = self._get_caller_module_name()
+        if timestamp is None:
+            timestamp = datetime.datetime.now()
+        # copy the data, since the caller can change it while the job is waiting
+        data = OrderedDict((key, np.array(value)) for key, value in data.items())
+        if isinstance(parameters, dict):
+            parameters = OrderedDict(parameters)
+        figure_data = None
+        if plotfig is not None:
+            figure_data = pickle.dumps(plotfig)
+            plt.close(plotfig)
+
+        future = concurrent.futures.Future()
+        job = (future, figure_data, (module_name, data, filepath, parameters, filename, filelabel,
+                                     timestamp, filetype, fmt, delimiter, None, fast_text))
+        self._save_queue.put(job, block, timeout)
+        return future
+
+    def _save_worker_loop(self):
+        """ Save the jobs of save_data_async until a None job is queued. """
+        while True:
+            job = self._save_queue.get()
+            if job is None:
+                return
+            future, figure_data, arguments = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                path = self._save_data(*arguments)
+                if path == -1:
+                    raise IOError('Saving data failed, see the log for the reason.')
+            except Exception as e:
+                self.log.exception('Saving data in the background failed.')
+                future.set_exception(e)
+                continue
+            if figure_data is None:
+                self._save_job_finished(future, path)
+                continue
+            module_name, timestamp = arguments[0], arguments[6]
+            try:
+                if self._figure_pool is None:
+                    # spawn instead of fork, the Qt threads of this process must not be copied
+                    self._figure_pool = concurrent.futures.ProcessPoolExecutor(
+                        self.figure_processes, mp_context=multiprocessing.get_context('spawn'))
+                render = self._figure_pool.submit(_render_pickled_figure, figure_data,
+                                                  os.path.splitext(path)[0],
+                                                  self._figure_metadata(module_name, timestamp))
+            except Exception as e:
+                self.log.exception('Rendering the figure of {0} failed.'.format(path))
+                future.set_exception(e)
+                continue
+            render.add_done_callback(
+                lambda render, future=future, path=path: self._figure_rendered(future, path,
+                                                                               render))
+
+    def _figure_rendered(self, future, path, render):
+        """ Finish a job of save_data_async when its figure is rendered. """
+        error = render.exception()
+        if error is not None:
+            self.log.error('Rendering the figure of {0} failed: {1}'.format(path, error))
+            future.set_exception(error)
+        else:
+            self._save_job_finished(future, path)
+
+    def _save_job_finished(self, future, path):
+        future.set_result(path)
+        self.sigDataSaved.emit(path)
+
+    def _figure_metadata(self, module_name, timestamp):
+        """ PDF metadata of a figure of save_data. """
+        metadata = dict()
+        metadata['Title'] = 'Image produced by qudi: ' + module_name
+        metadata['Author'] = 'qudi - Software Suite'
+        metadata['Subject'] = 'Find more information on: https://github.com/Ulm-IQO/qudi'
+        metadata['Keywords'] = 'Python 3, Qt, experiment control, automation, measurement, software, framework, modular'
+        metadata['Producer'] = 'qudi - Software Suite'
+        metadata['CreationDate'] = timestamp
+        metadata['ModDate'] = timestamp
+        return metadata
+
+    def _save_data(self, module_name, data, filepath=None, parameters=None, filename=None,
+                   filelabel=None, timestamp=None, filetype='text', fmt='%.15e', delimiter='\t',
+                   plotfig=None, fast_text=False):
+        """
+        save_data for the module module_name, see save_data.
+
+        @return str: the path of the saved data file, -1 if the data could not be saved
         """
         start_time = time.time()
         # Create timestamp if none is present
@@ -369,18 +807,6 @@ class SaveLogic(GenericLogic):
                            'arrays only. Saving data failed!')
             return -1
 
-        # try to trace back the functioncall to the class which was calling it.
-        try:
-            frm = inspect.stack()[1]
-            # this will get the object, which called the save_data function.
-            mod = inspect.getmodule(frm[0])
-            # that will extract the name of the class.
-            module_name = mod.__name__.split('.')[-1]
-        except:
-            # Sometimes it is not possible to get the object which called the save_data function
-            # (such as when calling this from the console).
-            module_name = 'UNSPECIFIED'
-
         # determine proper file path
         if filepath is None:
             filepath = self.get_path_for_module(module_name)
@@ -407,32 +833,12 @@ class SaveLogic(GenericLogic):
             return -1
 
         # Create header string for the file
-        header = 'Saved Data from the class {0} on {1}.\n' \
-                 ''.format(module_name, timestamp.strftime('%d.%m.%Y at %Hh%Mm%Ss'))
-        header += '\nParameters:\n===========\n\n'
-        # Include the active POI name (if not empty) as a parameter in the header
-        if self.active_poi_name != '':
-            header += 'Measured at POI: {0}\n'.format(self.active_poi_name)
-        # add the parameters if specified:
-        if parameters is not None:
-            # check whether the format for the parameters have a dict type:
-            if isinstance(parameters, dict):
-                for entry, param in parameters.items():
-                    if isinstance(param, float):
-                        header += '{0}: {1:.16e}\n'.format(entry, param)
-                    else:
-                        header += '{0}: {1}\n'.format(entry, param)
-            # make a hardcore string conversion and try to save the parameters directly:
-            else:
-                self.log.error('The parameters are not passed as a dictionary! The SaveLogic will '
-                               'try to save the parameters nevertheless.')
-                header += 'not specified parameters: {0}\n'.format(parameters)
-        header += '\nData:\n=====\n'
+        header = self._create_header(module_name, timestamp, parameters)
 
         # write data to file
         # FIXME: Implement other file formats
-        # write to textfile
-        if filetype == 'text':
+        # write to textfile or npy-file
+        if filetype in ('text', 'npy'):
             # Reshape data if multiple 1D arrays have been passed to this method.
             # If a 2D array has been passed, reformat the specifier
             if len(data) != 1:
@@ -470,98 +876,246 @@ class SaveLogic(GenericLogic):
                 data[identifier_str] = data.pop(keyname)
             else:
                 identifier_str = list(data)[0]
-            header += list(data)[0]
-            self.save_array_as_text(data=data[identifier_str], filename=filename, filepath=filepath,
-                                    fmt=fmt, header=header, delimiter=delimiter, comments='#',
-                                    append=False)
+            if filetype == 'npy':
+                columns = [label for label in identifier_str.split(delimiter) if label]
+                array = data[identifier_str]
+                saved_file = os.path.join(filepath, filename[:-4] + '.npy')
+                npy_file = np.lib.format.open_memmap(saved_file, mode='w+', dtype=array.dtype,
+                                                     shape=array.shape)
+                npy_file[...] = array
+                npy_file.flush()
+                del npy_file
+                self._save_parameter_sidecar(
+                    os.path.join(filepath, filename[:-4] + '_params.json'), module_name,
+                    timestamp, parameters, columns)
+            else:
+                header += list(data)[0]
+                saved_file = os.path.join(filepath, filename)
+                self.save_array_as_text(data=data[identifier_str], filename=filename,
+                                        filepath=filepath, fmt=fmt, header=header,
+                                        delimiter=delimiter, comments='#', append=False,
+                                        fast=fast_text)
         # write npz file and save parameters in textfile
         elif filetype == 'npz':
             header += str(list(data.keys()))[1:-1]
             np.savez_compressed(filepath + '/' + filename[:-4], **data)
+            saved_file = os.path.join(filepath, filename[:-4] + '.npz')
             self.save_array_as_text(data=[], filename=filename[:-4]+'_params.dat', filepath=filepath,
                                     fmt=fmt, header=header, delimiter=delimiter, comments='#',
-                                    append=False)
+                                    append=False, fast=fast_text)
         else:
-            self.log.error('Only saving of data as textfile and npz-file is implemented. Filetype "{0}" is not '
+            self.log.error('Only saving of data as textfile, npz-file and npy-file is implemented. Filetype "{0}" is not '
                            'supported yet. Saving as textfile.'.format(filetype))
+            saved_file = os.path.join(filepath, filename)
             self.save_array_as_text(data=data[identifier_str], filename=filename, filepath=filepath,
                                     fmt=fmt, header=header, delimiter=delimiter, comments='#',
-                                    append=False)
+                                    append=False, fast=fast_text)
 
         #--------------------------------------------------------------------------------------------
         # Save thumbnail figure of plot
         if plotfig is not None:
-            # create Metadata
-            metadata = dict()
-            metadata['Title'] = 'Image produced by qudi: ' + module_name
-            metadata['Author'] = 'qudi - Software Suite'
-            metadata['Subject'] = 'Find more information on: https://github.com/Ulm-IQO/qudi'
-            metadata['Keywords'] = 'Python 3, Qt, experiment control, automation, measurement, software, framework, modular'
-            metadata['Producer'] = 'qudi - Software Suite'
-            if timestamp is not None:
-                metadata['CreationDate'] = timestamp
-                metadata['ModDate'] = timestamp
-            else:
-                metadata['CreationDate'] = time
-                metadata['ModDate'] = time
+            save_figure(plotfig, os.path.join(filepath, filename)[:-4],
+                        self._figure_metadata(module_name, timestamp))
 
-            # determine the PDF-Filename
-            fig_fname_vector = os.path.join(filepath, filename)[:-4] + '_fig.pdf'
-
-            # Create the PdfPages object to which we will save the pages:
-            # The with statement makes sure that the PdfPages object is closed properly at
-            # the end of the block, even if an Exception occurs.
-            with PdfPages(fig_fname_vector) as pdf:
-                pdf.savefig(plotfig, bbox_inches='tight', pad_inches=0.05)
+            # close matplotlib figure
+            plt.close(plotfig)
+            self.log.debug('Time needed to save data: {0:.2f}s'.format(time.time()-start_time))
+            #----------------------------------------------------------------------------------
+        return saved_file
 
-                # We can also set the file's metadata via the PdfPages object:
-                pdf_metadata = pdf.infodict()
-                for x in metadata:
-                    pdf_metadata[x] = metadata[x]
+    def open_data_stream(self, columns, filepath=None, parameters=None, filename=None,
+                         filelabel=None, timestamp=None, fmt='%.15e', delimiter='\t',
+                         flush_interval=1., filetype='text', dtype=float):
+        """
+        Open a text data file to append rows to while the data is acquired, instead of keeping
+        all of it in memory for save_data. The file looks like a file of save_data with 1D data
+        arrays: the header with the parameters, the column labels and then the rows.
+
+            stream = self._save_logic.open_data_stream(['Time (s)', 'Power (W)'],
+                                                       parameters={'Setpoint (W)': 2.})
+            stream.append([[0.0, 1.98], [0.1, 2.01]])   # from any thread
+            stream.close()
+
+        The rows are flushed to the disk every flush_interval seconds, so an interrupted
+        acquisition keeps everything up to the last flush. Streams that are still open when the
+        SaveLogic is deactivated are closed.
+
+        With filetype 'npy' the rows go into a growing .npy file (NpyStreamWriter) and the
+        parameters into a JSON file <filename>_params.json, as for save_data.
+
+        @param list columns: column labels (str)
+        @param str filepath: optional, the directory of the file, see save_data
+        @param dict parameters: optional, parameters to save in the header
+        @param str filename: optional, the name of the file, see save_data
+        @param str filelabel: optional, label of the generated filename, see save_data
+        @param datetime timestamp: optional, the timestamp of the file, see save_data
+        @param str or list fmt: optional, format specifier, or one per column
+        @param str delimiter: optional, column delimiter
+        @param float flush_interval: optional, time (s) between flushes to the disk, None or 0 to
+                                     flush only on DataStreamWriter.flush() and close()
+        @param str filetype: optional, 'text' or 'npy'
+        @param numpy.dtype dtype: optional, data type of the values of an 'npy' file
+
+        @return DataStreamWriter or NpyStreamWriter: the open stream
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.now()
+        if not isinstance(fmt, str) and len(fmt) != len(columns):
+            raise ValueError('Length of list of format specifiers and number of columns differs.')
 
-            # determine the PNG-Filename and save the plain PNG
-            fig_fname_image = os.path.join(filepath, filename)[:-4] + '_fig.png'
-            plotfig.savefig(fig_fname_image, bbox_inches='tight', pad_inches=0.05)
+        module_name = self._get_caller_module_name()
+        if filepath is None:
+            filepath = self.get_path_for_module(module_name)
+        elif not os.path.exists(filepath):
+            os.makedirs(filepath)
+            self.log.info('Custom filepath does not exist. Created directory "{0}"'
+                          ''.format(filepath))
+        if filelabel is None:
+            filelabel = module_name
+        if self.active_poi_name != '':
+            filelabel = self.active_poi_name.replace(' ', '_') + '_' + filelabel
+        if filename is None:
+            filename = timestamp.strftime('%Y%m%d-%H%M-%S' + '_' + filelabel + '.dat')
 
-            # Use Pillow (an fork for PIL) to attach metadata to the PNG
-            #png_image = Image.open(fig_fname_image)
-            #png_metadata = PngImagePlugin.PngInfo()
+        if filetype == 'npy':
+            self._save_parameter_sidecar(os.path.join(filepath, filename[:-4] + '_params.json'),
+                                         module_name, timestamp, parameters, columns)
+            stream = NpyStreamWriter(os.path.join(filepath, filename[:-4] + '.npy'),
+                                     len(columns), dtype=dtype, flush_interval=flush_interval,
+                                     on_close=self._data_stream_closed)
+        elif filetype == 'text':
+            header = self._create_header(module_name, timestamp, parameters)
+            header += delimiter.join(columns)
+            stream = DataStreamWriter(os.path.join(filepath, filename), header, len(columns),
+                                      fmt=fmt, delimiter=delimiter, flush_interval=flush_interval,
+                                      on_close=self._data_stream_closed)
+        else:
+            raise ValueError('Data streams support the filetypes "text" and "npy", not "{0}".'
+                             ''.format(filetype))
+        with self.lock:
+            self._data_streams.append(stream)
+        return stream
+
+    def _data_stream_closed(self, stream):
+        with self.lock:
+            if stream in self._data_streams:
+                self._data_streams.remove(stream)
+
+    def _save_parameter_sidecar(self, path, module_name, timestamp, parameters, columns):
+        """ Save what the header of a text file holds in a JSON file next to a binary file.
+
+        @param str path: JSON file
+        @param str module_name: name of the module that saves the data
+        @param datetime timestamp: time of the data
+        @param dict parameters: parameters to save, None for none
+        @param list columns: column labels of the data
+        """
+        sidecar = OrderedDict()
+        sidecar['module'] = module_name
+        sidecar['timestamp'] = timestamp.isoformat()
+        if self.active_poi_name != '':
+            sidecar['poi'] = self.active_poi_name
+        if parameters is not None and not isinstance(parameters, dict):
+            self.log.error('The parameters are not passed as a dictionary! The SaveLogic will '
+                           'try to save the parameters nevertheless.')
+            parameters = {'not specified parameters': str(parameters)}
+        sidecar['parameters'] = parameters if parameters is not None else {}
+        sidecar['columns'] = list(columns)
+        with open(path, 'w') as file:
+            json.dump(sidecar, file, indent=4,
+                      default=lambda value: value.tolist() if hasattr(value, 'tolist')
+                      else str(value))
+
+    def load_npy_data(self, filepath):
+        """
+        Open a .npy file of save_data or open_data_stream without reading it: the array is a
+        read-only memory map, so slicing it only reads the selected part of the file from the
+        disk. The parameters are read from the JSON file next to it.
 
-            # PIL can only handle Strings, so let's convert our times
-            metadata['CreationDate'] = metadata['CreationDate'].strftime('%Y%m%d-%H%M-%S')
-            metadata['ModDate'] = metadata['ModDate'].strftime('%Y%m%d-%H%M-%S')
+        @param str filepath: the .npy file
 
-            for x in metadata:
-                # make sure every value of the metadata is a string
-                if not isinstance(metadata[x], str):
-                    metadata[x] = str(metadata[x])
+        @return (numpy.memmap, dict): the data and the content of the parameter file (empty if
+                                      there is none)
+        """
+        data = np.load(filepath, mmap_mode='r')
+        sidecar = os.path.splitext(filepath)[0] + '_params.json'
+        parameters = OrderedDict()
+        if os.path.exists(sidecar):
+            with open(sidecar) as file:
+                parameters = json.load(file, object_pairs_hook=OrderedDict)
+        return data, parameters
+
+    def _get_caller_module_name(self):
+        """ Name of the module that called the public save method which calls this helper.
+
+        @return str: module name, 'UNSPECIFIED' if it can not be found (e.g. from the console)
+        """
+        try:
+            # only the frame of the caller is looked up, inspect.stack() would build the whole
+            # stack with the source lines
+            frame = sys._getframe(2)
+            # code from the console has a pseudo file name like <ipython-input-1>
+            if frame.f_code.co_filename.startswith('<'):
+                return 'UNSPECIFIED'
+            # that will extract the name of the class.
+            return frame.f_globals['__name__'].split('.')[-1]
+        except:
+            # Sometimes it is not possible to get the object which called the save function.
+            return 'UNSPECIFIED'
 
-                # add the metadata to the picture
-                #png_metadata.add_text(x, metadata[x])
+    def _create_header(self, module_name, timestamp, parameters):
+        """ Header of a data file with the parameters, up to the data section.
 
-            # save the picture again, this time including the metadata
-            #png_image.save(fig_fname_image, "png")
+        @param str module_name: name of the module that saves the data
+        @param datetime timestamp: time of the data
+        @param dict parameters: parameters to save, None for none
 
-            # close matplotlib figure
-            plt.close(plotfig)
-            self.log.debug('Time needed to save data: {0:.2f}s'.format(time.time()-start_time))
-            #----------------------------------------------------------------------------------
+        @return str: header, without comment characters
+        """
+        header = 'Saved Data from the class {0} on {1}.\n' \
+                 ''.format(module_name, timestamp.strftime('%d.%m.%Y at %Hh%Mm%Ss'))
+        header += '\nParameters:\n===========\n\n'
+        # Include the active POI name (if not empty) as a parameter in the header
+        if self.active_poi_name != '':
+            header += 'Measured at POI: {0}\n'.format(self.active_poi_name)
+        # add the parameters if specified:
+        if parameters is not None:
+            # check whether the format for the parameters have a dict type:
+            if isinstance(parameters, dict):
+                for entry, param in parameters.items():
+                    if isinstance(param, float):
+                        header += '{0}: {1:.16e}\n'.format(entry, param)
+                    else:
+                        header += '{0}: {1}\n'.format(entry, param)
+            # make a hardcore string conversion and try to save the parameters directly:
+            else:
+                self.log.error('The parameters are not passed as a dictionary! The SaveLogic will '
+                               'try to save the parameters nevertheless.')
+                header += 'not specified parameters: {0}\n'.format(parameters)
+        header += '\nData:\n=====\n'
+        return header
 
     def save_array_as_text(self, data, filename, filepath='', fmt='%.15e', header='',
-                           delimiter='\t', comments='#', append=False):
+                           delimiter='\t', comments='#', append=False, fast=False):
         """
         An Independent method, which can save a 1D or 2D numpy.ndarray as textfile.
         Can append to files.
+
+        With fast=True the data is formatted by core.util.text_export.savetxt in chunks of rows,
+        vectorized for float data with a '%.<precision>e' format. The file is byte-identical to
+        the one of numpy.savetxt, but written several times faster for large arrays (see
+        tools/text_save_benchmark.py). For small arrays numpy.savetxt is faster.
         """
+        savetxt = text_export.savetxt if fast else np.savetxt
         # write to file. Append if requested.
         if append:
             with open(os.path.join(filepath, filename), 'ab') as file:
-                np.savetxt(file, data, fmt=fmt, delimiter=delimiter, header=header,
-                           comments=comments)
+                savetxt(file, data, fmt=fmt, delimiter=delimiter, header=header,
+                        comments=comments)
         else:
             with open(os.path.join(filepath, filename), 'wb') as file:
-                np.savetxt(file, data, fmt=fmt, delimiter=delimiter, header=header,
-                           comments=comments)
+                savetxt(file, data, fmt=fmt, delimiter=delimiter, header=header,
+                        comments=comments)
         return
 
     def get_daily_directory(self):
@@ -577,7 +1131,14 @@ class SaveLogic(GenericLogic):
 
         and the filepath is returned. There should be always a filepath
         returned.
+
+        The directory is looked up once a day, a directory that is deleted during the day is not
+        created again.
         """
+        today = time.strftime('%Y%m%d')
+        date, current_dir = self._daily_directory
+        if date == today:
+            return current_dir
 
         # First check if the directory exists and if not then the default
         # directory is taken.
@@ -616,6 +1177,7 @@ class SaveLogic(GenericLogic):
             # Details at http://stackoverflow.com/questions/12468022/python-fileexists-error-when-making-directory
             os.makedirs(current_dir, exist_ok=True)
 
+        self._daily_directory = (today, current_dir)
         return current_dir
 
     def get_path_for_module(self, module_name):
@@ -625,9 +1187,21 @@ class SaveLogic(GenericLogic):
         @param string module_name: Specify the folder, which should be created in the daily
                                    directory. The module_name can be e.g. 'Confocal'.
         @return string: absolute path to the module name
+
+        The path is cached with the daily directory, see get_daily_directory.
         """
-        dir_path = os.path.join(self.get_daily_directory(), module_name)
+        daily_dir = self.get_daily_directory()
+        cached_daily_dir, module_dirs = self._module_directories
+        if cached_daily_dir != daily_dir:
+            module_dirs = {}
+            self._module_directories = (daily_dir, module_dirs)
+        dir_path = module_dirs.get(module_name)
+        if dir_path is not None:
+            return dir_path
+
+        dir_path = os.path.join(daily_dir, module_name)
 
         if not os.path.exists(dir_path):
-            os.makedirs(dir_path)
+            os.makedirs(dir_path, exist_ok=True)
+        module_dirs[module_name] = dir_path
         return dir_path
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures of the fiber shooting tests: the logic wired to the simulated hardware of
+config/config_file_fiber_shooting_dummy.cfg, without manager and GUI.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qtpy import QtCore
+
+from hardware.fiber_shooting_dummy.arduino_dummy import ArduinoDummy
+from hardware.fiber_shooting_dummy.camera_dummy import CameraDummy
+from hardware.fiber_shooting_dummy.laser_plant_dummy import LaserPlantDummy
+from hardware.fiber_shooting_dummy.powermeter_dummy import PowermeterDummy
+from logic.fiber_shooting_logic import FiberShootingLogic
+from logic.save_logic import SaveLogic
+
+
+@pytest.fixture(scope='session')
+def qt_app():
+    """ The Qt application of the modules. """
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+
+@pytest.fixture
+def fiber_shooting(qt_app, tmp_path):
+    """ Factory of an activated FiberShootingLogic with the dummy hardware and a SaveLogic
+    writing into a temporary directory. All modules are deactivated after the test.
+
+    @return callable: (logic_config) -> dict with the modules 'logic', 'arduino',
+                      'power_meter', 'laser_plant', 'camera' and 'savelogic'
+    """
+    modules = []
+
+    def make(logic_config=None):
+        plant = LaserPlantDummy(manager=None, name='laser_plant_dummy', config={'seed': 1})
+        arduino = ArduinoDummy(manager=None, name='arduino_hardware', config={})
+        power_meter = PowermeterDummy(manager=None, name='power_meter_hardware', config={})
+        camera = CameraDummy(manager=None, name='TiS_camera_hardware', config={})
+        data_dir = str(tmp_path / 'Data')
+        save_logic = SaveLogic(manager=None, name='savelogic',
+                               config={'unix_data_directory': data_dir,
+                                       'win_data_directory': data_dir,
+                                       'log_into_daily_directory': False})
+        logic = FiberShootingLogic(manager=None, name='fiber_shooting_logic',
+                                   config=logic_config or {})
+        arduino.connectors['laser_plant'].connect(plant)
+        power_meter.connectors['laser_plant'].connect(plant)
+        logic.connectors['TiS_camera_hardware'].connect(camera)
+        logic.connectors['arduino_hardware'].connect(arduino)
+        logic.connectors['power_meter_hardware'].connect(power_meter)
+        logic.connectors['savelogic'].connect(save_logic)
+        for module in (plant, arduino, power_meter, camera, save_logic, logic):
+            assert module.module_state.activate()
+            modules.append(module)
+        return {'logic': logic, 'arduino': arduino, 'power_meter': power_meter,
+                'laser_plant': plant, 'camera': camera, 'savelogic': save_logic}
+
+    yield make
+    for module in reversed(modules):
+        if module.module_state() != 'deactivated':
+            module.module_state.deactivate()
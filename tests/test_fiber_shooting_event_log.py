@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+The event log of the fiber shooting logic starts a new file at midnight in the same directory,
+so the events of every day of a session are found by their day.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import datetime
+import os
+
+from logic.fiber_shooting import event_log
+
+
+def around_midnight(day):
+    """ Wall clock times (s since the epoch) one second before and after the end of day. """
+    midnight = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time())
+    return midnight.timestamp() - 1, midnight.timestamp() + 1
+
+
+def test_event_log_starts_a_new_file_at_midnight(tmp_path):
+    day = datetime.date(2026, 3, 14)
+    before, after = around_midnight(day)
+    now = [before]
+    log = event_log.EventLog(str(tmp_path), wall_clock=lambda: now[0])
+    log.log(event_log.EVENT_LASER, 1.)
+    now[0] = after
+    log.log(event_log.EVENT_LASER, 0.)
+    log.close()
+
+    first = event_log.load_events(str(tmp_path), day)
+    second = event_log.load_events(str(tmp_path), day + datetime.timedelta(days=1))
+    assert list(first['value']) == [1.]
+    assert list(first['wall_time']) == [before]
+    assert list(second['value']) == [0.]
+    assert list(second['wall_time']) == [after]
+
+
+def test_logic_finds_the_events_of_every_day_of_a_session(fiber_shooting):
+    modules = fiber_shooting()
+    logic = modules['logic']
+    # The log directory is not a daily directory of the SaveLogic
+    assert logic._event_log_path == os.path.join(modules['savelogic'].data_dir, 'FiberShooting',
+                                                 'EventLog')
+
+    day = datetime.date.today()
+    next_day = day + datetime.timedelta(days=1)
+    before, after = around_midnight(day)
+    now = [before]
+    logic._event_log.wall_clock = lambda: now[0]
+    logic.set_laser_status(True)
+    now[0] = after
+    logic.set_laser_status(False)
+
+    laser = event_log.EVENT_LASER
+    events = logic.get_events(day)
+    assert list(events['value'][events['event'] == laser]) == [1.]
+    events = logic.get_events(next_day)
+    assert list(events['value'][events['event'] == laser]) == [0.]
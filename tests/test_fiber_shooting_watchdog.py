@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+The safety watchdog trip and the emergency stop latch of the Arduino share one state: the duty
+cycle the hardware applies follows the logic again only after the trip is acknowledged.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import time
+
+import pytest
+
+from logic.fiber_shooting.safety_watchdog import SafetyWatchdog
+
+
+def wait_for(condition, timeout=5.):
+    """ Wait until condition() is true, False after the timeout. """
+    end = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_trip_stays_latched_when_armed_again():
+    now = [0.]
+    stops = []
+    watchdog = SafetyWatchdog(lambda: stops.append(now[0]), power_timeout=0.5,
+                              heartbeat_timeout=0.5, clock=lambda: now[0])
+    watchdog.arm()
+    now[0] = 1.
+    assert watchdog.check()
+    assert stops == [1.]
+
+    watchdog.disarm()
+    watchdog.arm()
+    assert watchdog.tripped
+    # No second stop while tripped
+    now[0] = 2.
+    assert not watchdog.check()
+
+    watchdog.reset()
+    assert not watchdog.tripped
+    assert not watchdog.check()
+
+
+def test_applied_duty_cycle_follows_the_logic_after_acknowledge(fiber_shooting):
+    modules = fiber_shooting({'watchdog_power_timeout': 0.1,
+                              'watchdog_heartbeat_timeout': 0.1,
+                              'watchdog_deadline': 0.02,
+                              'calibration_settle_window': 0.05})
+    logic = modules['logic']
+    arduino = modules['arduino']
+    power_meter = modules['power_meter']
+
+    # Stall the power meter during the calibration sweep, the watchdog trips
+    power_meter._measurement_time = 0.5
+    logic.start_calibration(points=3)
+    assert wait_for(logic.is_watchdog_tripped)
+    assert wait_for(lambda: not logic.is_calibrating())
+    power_meter._measurement_time = 0
+    assert arduino.is_emergency_stopped()
+
+    # Switching the laser on does not acknowledge the trip, the hardware stays at zero
+    logic.set_laser_status(True)
+    logic.set_duty_cycle(0.2)
+    assert logic.is_watchdog_tripped()
+    assert arduino.is_emergency_stopped()
+    assert arduino.get_applied_duty_cycle() == 0
+
+    # Switching the laser off acknowledges the trip in the logic and in the hardware
+    logic.set_laser_status(False)
+    assert not logic.is_watchdog_tripped()
+    assert not arduino.is_emergency_stopped()
+    logic.set_laser_status(True)
+    logic.set_duty_cycle(0.2)
+    assert arduino.get_applied_duty_cycle() == pytest.approx(0.2, abs=1e-3)
+    logic.set_laser_status(False)
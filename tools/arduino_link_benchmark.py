@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput and latency benchmark of the Arduino link through the real pyserial path.
+
+ArduinoHardware is connected to the pseudo-terminal of the Arduino emulator
+(hardware/arduino_uno/arduino_emulator.py) and floods it with duty cycle updates, interleaved with
+shutter pulses. For every protocol/acknowledgement combination the benchmark reports the offered
+and the written command rate, the coalesced (dropped) updates, the bytes per second and, in
+acknowledgement mode, the round-trip latency. Linux only (pseudo-terminals). A pseudo-terminal is
+not limited to 115200 baud, use --delay to emulate the processing time of the board.
+
+    python tools/arduino_link_benchmark.py [--duration 5] [--rate 0] [--delay 0]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hardware.arduino_uno.arduino_emulator import ArduinoEmulator
+from hardware.arduino_uno.arduino_uno_hardware import ArduinoHardware
+
+
+def run_benchmark(protocol, ack_mode, duration, rate, delay, pulse_every=100):
+    """ Send duty cycle updates for the given duration and collect the link statistics.
+
+    @param str protocol: 'ascii' or 'binary'
+    @param bool ack_mode: request acknowledgements (enables the latency measurement)
+    @param float duration: benchmark duration (s)
+    @param float rate: offered duty cycle updates per second, 0 for as fast as possible
+    @param float delay: processing delay per command injected into the emulator (s)
+    @param int pulse_every: send a shutter pulse every pulse_every duty updates
+
+    @return dict: link health of ArduinoHardware, plus offered rate and emulator counts
+    """
+    emulator = ArduinoEmulator(delay=delay)
+    port = emulator.start()
+    arduino = ArduinoHardware(manager=None, name='arduino_benchmark',
+                              config={'port': port, 'protocol': protocol, 'ack_mode': ack_mode,
+                                      'negotiation_timeout': 1.})
+    if not arduino.module_state.activate():
+        emulator.stop()
+        raise RuntimeError('Could not connect to the emulator on {0}.'.format(port))
+    try:
+        offered = 0
+        start = time.perf_counter()
+        next_time = start
+        while time.perf_counter() - start < duration:
+            arduino.set_duty_cycle(0.001 * (offered % 500))
+            offered += 1
+            if offered % pulse_every == 0:
+                arduino.open_shutter_micro(1, 100)
+            if rate > 0:
+                next_time += 1. / rate
+                sleep_time = next_time - time.perf_counter()
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+        elapsed = time.perf_counter() - start
+        # Let the writer and the acknowledgements drain
+        time.sleep(0.5)
+        health = arduino.get_link_health()
+    finally:
+        arduino.module_state.deactivate()
+        emulator.stop()
+    health['offered_per_second'] = offered / elapsed
+    health['written_per_second'] = health['commands_written'] / elapsed
+    health['bytes_per_second'] = health['bytes_written'] / elapsed
+    health['emulator_executed'] = emulator.commands_executed
+    return health
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--duration', type=float, default=5., help='duration per run (s)')
+    parser.add_argument('--rate', type=float, default=0.,
+                        help='offered duty updates per second (0: as fast as possible)')
+    parser.add_argument('--delay', type=float, default=0.,
+                        help='processing delay per command in the emulator (s)')
+    args = parser.parse_args()
+
+    print('{0:>7} {1:>4} {2:>12} {3:>12} {4:>10} {5:>10} {6:>9} {7:>9} {8:>9} {9:>5}'.format(
+        'proto', 'ack', 'offered/s', 'written/s', 'dropped', 'bytes/s', 'p50 ms', 'p99 ms',
+        'max ms', 'lost'))
+    for protocol in ('ascii', 'binary'):
+        for ack_mode in (False, True):
+            h = run_benchmark(protocol, ack_mode, args.duration, args.rate, args.delay)
+            latency = [1e3 * h.get(key, float('nan'))
+                       for key in ('latency_median', 'latency_p99', 'latency_max')]
+            print('{0:>7} {1:>4} {2:12.0f} {3:12.0f} {4:10d} {5:10.0f} {6:9.3f} {7:9.3f} {8:9.3f} '
+                  '{9:>5}'.format(protocol, 'yes' if ack_mode else 'no', h['offered_per_second'],
+                                  h['written_per_second'], h['dropped_updates'],
+                                  h['bytes_per_second'], *latency, h.get('lost', '-')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Scripting API for headless qudi: the manager with hardware and logic modules only, driven by a
+Python script instead of the GUI.
+
+    from headless_session import HeadlessSession
+
+    with HeadlessSession('config/config_file_fiber_shooting_dummy.cfg') as session:
+        logic = session.start('fiber_shooting_logic')
+        logic.set_setpoint(2.)
+        logic.set_pid_status(True)
+        logic.set_laser_status(True)
+        logic.set_power()
+        session.wait(10)        # runs the Qt event loop, so the control loop keeps going
+        logic.set_laser_status(False)
+
+The control loop of the logic runs on the Qt event loop, so a script has to give control back
+with wait() or wait_until() instead of time.sleep(). For interactive control of a running
+headless qudi (start.py --headless) use the remote module server of the config and the qudi
+Jupyter kernel (core/qudikernel.py) instead.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qtpy import QtCore
+
+
+class HeadlessSession:
+    """ A qudi manager in the current process, without Qt widgets unless gui is True. """
+
+    def __init__(self, config_file, gui=False):
+        """
+        @param str config_file: qudi configuration file
+        @param bool gui: load GUI modules as well (QApplication instead of QCoreApplication)
+        """
+        if gui:
+            from qtpy import QtWidgets
+            self.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+        else:
+            self.app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+        from core.logger import initialize_logger
+        initialize_logger()
+        from core.manager import Manager
+        self.manager = Manager(args=argparse.Namespace(no_gui=not gui,
+                                                       config=os.path.abspath(config_file)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self, name):
+        """ Load and activate a module and the modules it depends on.
+
+        @param str name: module name of the config
+
+        @return object: the module, None if it could not be started
+        """
+        base = self.manager.findBase(name)
+        if self.manager.startModule(base, name) < 0:
+            return None
+        return self.module(name)
+
+    def module(self, name):
+        """ Get a loaded module by name (None if it is not loaded). """
+        for base in ('hardware', 'logic', 'gui'):
+            if name in self.manager.tree['loaded'][base]:
+                return self.manager.tree['loaded'][base][name]
+        return None
+
+    def wait(self, seconds):
+        """ Run the Qt event loop for the given time. """
+        loop = QtCore.QEventLoop()
+        QtCore.QTimer.singleShot(int(seconds * 1000), loop.quit)
+        loop.exec_()
+
+    def wait_until(self, condition, timeout=None, interval=0.05):
+        """ Run the Qt event loop until condition() is true.
+
+        @param callable condition: checked every interval seconds
+        @param float timeout: maximum time (s), None for no limit
+        @param float interval: time (s) between the checks
+
+        @return bool: whether the condition was met
+        """
+        start = time.monotonic()
+        while not condition():
+            if timeout is not None and time.monotonic() - start > timeout:
+                return False
+            self.wait(interval)
+        return True
+
+    def close(self):
+        """ Deactivate all modules. """
+        self.manager.realQuit()
+        self.app.processEvents()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Control loop jitter of the fiber shooting logic with and without the GUI stack.
+
+Both modes load the same configuration through the qudi manager (tools/headless_session.py) and
+run the PID on the simulated laser plant, each in its own process:
+
+    headless: QCoreApplication, hardware and logic modules only (start.py --headless)
+    gui:      QApplication with the startup GUI modules of the config (manager GUI, tray icon)
+              and the fiber shooting GUI, redrawing the plots as in normal operation
+
+The cycle times of the control loop are taken from the session history of the logic.
+
+    python tools/loop_jitter_benchmark.py [--config config/config_file_fiber_shooting_dummy.cfg]
+                                          [--duration 30] [--setpoint 2]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(TOOLS_DIR)
+
+MODES = ('headless', 'gui')
+
+
+def loop_statistics(times):
+    """ Statistics of the cycle times of the control loop.
+
+    @param array times: start times of the cycles (s)
+
+    @return dict: number of cycles and mean, standard deviation, median, 99th percentile and
+                  maximum of the cycle time (ms)
+    """
+    period = np.diff(times) * 1e3
+    return {'cycles': len(period), 'mean': period.mean(), 'std': period.std(),
+            'median': np.median(period), 'p99': np.percentile(period, 99),
+            'max': period.max()}
+
+
+def run_mode(mode, config, duration, setpoint):
+    """ Run the control loop in this process and return its statistics. """
+    from headless_session import HeadlessSession
+    session = HeadlessSession(config, gui=mode == 'gui')
+    try:
+        logic = session.start('fiber_shooting_logic')
+        if logic is None:
+            raise RuntimeError('fiber_shooting_logic could not be started.')
+        gui_modules = []
+        if mode == 'gui':
+            startup = session.manager.tree['global'].get('startup', [])
+            for name in list(startup) + ['fiber_shooting_GUI']:
+                if name not in session.manager.tree['defined']['gui']:
+                    continue
+                if session.start(name) is None:
+                    print('GUI module {0} could not be started.'.format(name), file=sys.stderr)
+                else:
+                    gui_modules.append(name)
+        logic.clear_session_history()
+        logic.set_setpoint(setpoint)
+        logic.set_pid_status(True)
+        logic.set_laser_status(True)
+        logic.set_power()
+        session.wait(duration)
+        logic.set_laser_status(False)
+        session.wait(0.1)
+        result = loop_statistics(logic.get_session_history()['time'])
+        result['gui_modules'] = gui_modules
+        return result
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(TOOLS_DIR), 'config',
+                                                         'config_file_fiber_shooting_dummy.cfg'))
+    parser.add_argument('--duration', type=float, default=30., help='run time per mode (s)')
+    parser.add_argument('--setpoint', type=float, default=2., help='power setpoint (W)')
+    parser.add_argument('--mode', choices=MODES, help='run a single mode in this process')
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        result = run_mode(args.mode, args.config, args.duration, args.setpoint)
+        # Last line of the output, read by the parent process
+        print(json.dumps(result))
+        return
+
+    print('{0:>9} {1:>7} {2:>9} {3:>9} {4:>9} {5:>9} {6:>9}'.format(
+        'mode', 'cycles', 'mean ms', 'std ms', 'median ms', 'p99 ms', 'max ms'))
+    for mode in MODES:
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode,
+                                  '--config', args.config, '--duration', str(args.duration),
+                                  '--setpoint', str(args.setpoint)],
+                                 stdout=subprocess.PIPE, universal_newlines=True)
+        lines = process.stdout.strip().splitlines()
+        try:
+            result = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            print('{0:>9} failed (exit code {1})'.format(mode, process.returncode))
+            continue
+        print('{0:>9} {cycles:7d} {mean:9.3f} {std:9.3f} {median:9.3f} {p99:9.3f} '
+              '{max:9.3f}'.format(mode, **result))
+        if mode == 'gui':
+            print('GUI modules loaded: {0}'.format(', '.join(result['gui_modules']) or 'none'))
+
+
+if __name__ == '__main__':
+    main()
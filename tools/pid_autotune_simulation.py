@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Headless relay autotuning of the fiber shooting PID against the simulated laser plant.
+
+The relay experiment of logic/fiber_shooting/pid_autotune.py runs against LaserPlantModel
+(hardware/fiber_shooting_dummy/laser_plant_dummy.py) on a simulated clock, so it takes a fraction
+of a second. The ultimate gain and period are printed, and for every tuning rule a closed-loop
+setpoint step is simulated with the proposed gains.
+
+    python tools/pid_autotune_simulation.py [--setpoint 3] [--gain 10] [--time-constant 0.3]
+                                            [--dead-time 0.02] [--noise 1e-3]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hardware.fiber_shooting_dummy.laser_plant_dummy import LaserPlantModel
+from logic.fiber_shooting.pid_autotune import TUNING_RULES, autotune
+from logic.fiber_shooting.pid_controller import PIDController
+
+
+class SimulatedClock:
+    """ Clock that only advances when sleep() is called. """
+
+    def __init__(self):
+        self.t = 0.
+
+    def now(self):
+        return self.t
+
+    def sleep(self, duration):
+        self.t += duration
+
+
+def simulate_step(plant, clock, kp, ki, kd, setpoint, duration=5., sample_time=0.01,
+                  measurement_time=3e-3, max_output=0.5):
+    """ Closed-loop setpoint step from zero with the PIDController of the logic.
+
+    @return (float, float): overshoot (W) and 2 % settling time (s), nan if not settled
+    """
+    plant.reset(clock.now())
+    pid = PIDController(kp, ki, kd, output_max=max_output)
+    start = clock.now()
+    times, powers = [], []
+    while clock.now() - start < duration:
+        clock.sleep(measurement_time)
+        power = plant.get_output()
+        plant.set_input(pid.update(setpoint, power, sample_time))
+        times.append(clock.now() - start)
+        powers.append(power)
+        clock.sleep(sample_time - measurement_time)
+    times, powers = np.array(times), np.array(powers)
+    outside = np.flatnonzero(np.abs(powers - setpoint) > 0.02 * setpoint)
+    settling_time = times[outside[-1]] if len(outside) and outside[-1] < len(times) - 1 else 0.
+    if len(outside) and outside[-1] == len(times) - 1:
+        settling_time = float('nan')
+    return powers.max() - setpoint, settling_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--setpoint', type=float, default=3., help='power setpoint (W)')
+    parser.add_argument('--gain', type=float, default=10., help='plant gain (W per duty cycle)')
+    parser.add_argument('--time-constant', type=float, default=0.3, help='thermal lag (s)')
+    parser.add_argument('--dead-time', type=float, default=0.02, help='dead time (s)')
+    parser.add_argument('--noise', type=float, default=1e-3, help='power noise (W)')
+    args = parser.parse_args()
+
+    clock = SimulatedClock()
+    plant = LaserPlantModel(gain=args.gain, time_constant=args.time_constant,
+                            dead_time=args.dead_time, noise=args.noise, seed=0, clock=clock.now)
+    measurement_time = 3e-3
+
+    def read_power():
+        clock.sleep(measurement_time)
+        return plant.get_output()
+
+    center = args.setpoint / args.gain
+    result = autotune(plant.set_input, read_power, args.setpoint, center, amplitude=0.3 * center,
+                      hysteresis=5 * args.noise, clock=clock.now, sleep=clock.sleep)
+    if result is None:
+        print('No oscillation found.')
+        return
+    print('Ultimate gain Ku = {0:.4f} (duty cycle / W), ultimate period Pu = {1:.4f} s '
+          '(+- {2:.4f} s over {3:d} periods)'.format(result['ultimate_gain'],
+                                                     result['ultimate_period'],
+                                                     result['period_std'], result['periods']))
+    print('{0:>20} {1:>9} {2:>9} {3:>9} {4:>11} {5:>11}'.format(
+        'rule', 'kp', 'ki', 'kd', 'overshoot', 'settling'))
+    for rule in TUNING_RULES:
+        kp, ki, kd = result['gains'][rule]
+        overshoot, settling_time = simulate_step(plant, clock, kp, ki, kd, args.setpoint)
+        print('{0:>20} {1:9.4f} {2:9.4f} {3:9.5f} {4:9.3f} W {5:9.3f} s'.format(
+            rule, kp, ki, kd, overshoot, settling_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Per-call overhead of SaveLogic.save_data for many small datasets.
+
+A standalone SaveLogic saves small text files into a temporary data directory. Besides the whole
+save_data call, the benchmark times the two parts that do not depend on the amount of data: the
+lookup of the calling module and the data directory of the module (get_path_for_module). The calls
+are made from the given call stack depths, since the cost of a stack inspection grows with the
+depth and a save from a GUI callback or a logic thread runs deep inside Qt and qudi.
+
+    python tools/save_data_benchmark.py [--calls 1000] [--depths 1 50]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qtpy import QtCore
+
+from logic.save_logic import SaveLogic
+
+
+def at_depth(depth, function, *args, **kwargs):
+    """ Call function with depth additional frames on the call stack. """
+    if depth <= 0:
+        return function(*args, **kwargs)
+    return at_depth(depth - 1, function, *args, **kwargs)
+
+
+def time_calls(calls, function, *args, **kwargs):
+    """ Mean time (µs) of a call of function. """
+    start = time.perf_counter()
+    for _ in range(calls):
+        function(*args, **kwargs)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def run_benchmark(save_logic, calls, depth):
+    """ Time save_data and its fixed parts at a call stack depth.
+
+    @return dict: mean time per call (µs) of 'save_data', 'caller' and 'path'
+    """
+    data = {'Time (s)': np.arange(10.), 'Power (W)': np.ones(10)}
+    # Each call gets its own file, as in a real series of saves
+    counter = iter(range(calls))
+    return {
+        'save_data': at_depth(depth, time_calls, calls, lambda: save_logic.save_data(
+            data, filename='small_{0:06d}.dat'.format(next(counter)))),
+        # _get_caller_module_name looks at the caller of its caller, as in save_data
+        'caller': at_depth(depth, time_calls, calls,
+                           lambda: save_logic._get_caller_module_name()),
+        'path': at_depth(depth, time_calls, calls, save_logic.get_path_for_module, 'benchmark'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--calls', type=int, default=1000, help='calls per measurement')
+    parser.add_argument('--depths', type=int, nargs='+', default=[1, 50],
+                        help='additional call stack depths')
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+    logging.disable(logging.INFO)
+    data_dir = tempfile.mkdtemp(prefix='qudi_save_benchmark_')
+    save_logic = SaveLogic(manager=None, name='save_benchmark',
+                           config={'unix_data_directory': data_dir,
+                                   'win_data_directory': data_dir,
+                                   'log_into_daily_directory': False})
+    try:
+        if not save_logic.module_state.activate():
+            raise RuntimeError('Could not activate the SaveLogic.')
+        print('{0:>6} {1:>14} {2:>14} {3:>14}'.format('depth', 'save_data µs', 'caller µs',
+                                                      'path µs'))
+        for depth in args.depths:
+            result = run_benchmark(save_logic, args.calls, depth)
+            print('{0:6d} {save_data:14.1f} {caller:14.1f} {path:14.1f}'.format(depth, **result))
+        save_logic.module_state.deactivate()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
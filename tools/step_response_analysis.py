@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Step response identification of the fiber shooting control loop from logged data.
+
+Reads a session history stored as numpy .npz file with the arrays 'time', 'power' and 'setpoint'
+(closed loop) or 'duty_cycle' (open loop, --open-loop), optionally 'pid' to select the samples
+with the PID on or off, e.g. the file written by FiberShootingLogic.export_session() (File >
+Export session in the GUI).
+Every step is fitted with a first-order-plus-dead-time model, and rise time, settling time,
+overshoot and steady-state error are printed per target.
+
+    python tools/step_response_analysis.py session.npz [--min-step 0.05] [--open-loop]
+    python tools/step_response_analysis.py --simulate [--kp 0.1] [--ki 0.5] [--kd 0.003]
+
+--simulate runs setpoint steps against the simulated laser plant with the PID controller of the
+logic instead of reading a file, to compare gains headless.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hardware.fiber_shooting_dummy.laser_plant_dummy import LaserPlantModel
+from logic.fiber_shooting.pid_controller import PIDController
+from logic.fiber_shooting import step_response
+
+
+def simulate_session(kp, ki, kd, setpoints=(1., 3., 2., 4., 1., 2., 3.), hold=2.,
+                     sample_time=0.013, max_output=0.5):
+    """ Closed-loop setpoint steps against the simulated laser plant on a simulated clock.
+
+    @return dict: arrays 'time', 'power', 'setpoint'
+    """
+    clock = [0.]
+    plant = LaserPlantModel(seed=0, clock=lambda: clock[0])
+    plant.reset(0.)
+    pid = PIDController(kp, ki, kd, output_max=max_output)
+    times, powers, references = [], [], []
+    for setpoint in setpoints:
+        for _ in range(int(hold / sample_time)):
+            clock[0] += sample_time
+            power = plant.get_output()
+            plant.set_input(pid.update(setpoint, power, sample_time))
+            times.append(clock[0])
+            powers.append(power)
+            references.append(setpoint)
+    return {'time': np.array(times), 'power': np.array(powers), 'setpoint': np.array(references)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('file', nargs='?', help='session history (.npz)')
+    parser.add_argument('--min-step', type=float, default=0.05,
+                        help='minimum reference change of a step (W or duty cycle)')
+    parser.add_argument('--open-loop', action='store_true',
+                        help='analyze duty cycle steps with the PID off')
+    parser.add_argument('--simulate', action='store_true', help='simulate a session instead')
+    parser.add_argument('--kp', type=float, default=0.1)
+    parser.add_argument('--ki', type=float, default=0.5)
+    parser.add_argument('--kd', type=float, default=0.003, help='derivative gain (s)')
+    args = parser.parse_args()
+
+    if args.simulate:
+        data = simulate_session(args.kp, args.ki, args.kd)
+    elif args.file:
+        with np.load(args.file) as file:
+            data = {name: file[name] for name in file.files}
+    else:
+        parser.error('give a session file or --simulate')
+        return
+    times, power = data['time'], data['power']
+    reference = data['duty_cycle'] if args.open_loop else data['setpoint']
+    if 'pid' in data:
+        selected = data['pid'] == (0 if args.open_loop else 1)
+        times, power, reference = times[selected], power[selected], reference[selected]
+    result = step_response.analyze_steps(times, power, reference, args.min_step,
+                                         closed_loop=not args.open_loop)
+    if not len(result['time']):
+        print('No steps found.')
+        return
+    print(step_response.format_summary(step_response.summarize_by_target(result)))
+
+
+if __name__ == '__main__':
+    main()
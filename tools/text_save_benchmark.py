@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Text export of a large array with numpy.savetxt and with the vectorized writer of
+core/util/text_export.py, which SaveLogic.save_array_as_text uses with fast=True.
+
+Both write the same random array (by default 10^6 x 4, normally distributed values with magnitudes
+between 1e-30 and 1e30) with the same format into a temporary file. The benchmark reports the time
+and the write rate of each and checks that the files are byte-identical.
+
+    python tools/text_save_benchmark.py [--rows 1000000] [--columns 4] [--fmt %.15e]
+                                        [--chunk-rows 65536]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import filecmp
+import functools
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.util import text_export
+
+
+def time_write(writer, path, data, fmt):
+    """ Write data with writer (a savetxt) to path.
+
+    @return float: time (s)
+    """
+    start = time.perf_counter()
+    with open(path, 'wb') as file:
+        writer(file, data, fmt=fmt, delimiter='\t', header='Benchmark', comments='#')
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--columns', type=int, default=4)
+    parser.add_argument('--fmt', default='%.15e', help='format specifier of every column')
+    parser.add_argument('--chunk-rows', type=int, default=65536,
+                        help='rows formatted at once by the vectorized writer')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((args.rows, args.columns))
+    data *= 10. ** rng.integers(-30, 31, data.shape)
+
+    writers = (('numpy.savetxt', np.savetxt),
+               ('text_export', functools.partial(text_export.savetxt,
+                                                 chunk_rows=args.chunk_rows)))
+    directory = tempfile.mkdtemp(prefix='qudi_text_benchmark_')
+    paths = [os.path.join(directory, name + '.dat') for name, _ in writers]
+    try:
+        print('{0} x {1} array, format {2}'.format(args.rows, args.columns, args.fmt))
+        print('{0:>14} {1:>9} {2:>9} {3:>9}'.format('writer', 'time s', 'MB/s', 'speedup'))
+        reference = None
+        for (name, writer), path in zip(writers, paths):
+            elapsed = time_write(writer, path, data, args.fmt)
+            reference = elapsed if reference is None else reference
+            print('{0:>14} {1:9.2f} {2:9.1f} {3:9.1f}'.format(
+                name, elapsed, os.path.getsize(path) / elapsed / 1e6, reference / elapsed))
+        identical = filecmp.cmp(paths[0], paths[1], shallow=False)
+        print('Files byte-identical: {0}'.format('yes' if identical else 'NO'))
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()